@@ -0,0 +1,300 @@
+"""
+checkpoint.py
+
+This module checkpoints round-robin tournaments pairing by pairing, so an
+interrupted tournament resumes without replaying the pairings it finished.
+
+A checkpoint is an append-only JSON Lines file shared by any number of
+runs. Each run is identified by a key built from its strategies, the game
+rules and its TournamentConfig (except checkpoint and workers, which do not
+change results), plus an optional label. Records are:
+- start: a run began, seeded with the recorded SeedSequence entropy
+- pairing: one finished pairing, with its strategies, seed spawn key,
+  averages (see tournament.summarize_games) and either its per-game
+  summaries or, for exact pairings, its expected results
+- complete: the run finished and its results were saved by the caller
+  (see TournamentResult.complete_checkpoint); its other records are
+  compacted away
+Every record carries the time it was written.
+
+A resumed run reuses the recorded entropy, so the pairings it still has to
+play get the seeds they would have had, and its matrices match an
+uninterrupted run exactly. A truncated last line (from a crash mid-write)
+is ignored.
+
+A run is owned by one tournament at a time: resume() takes an exclusive
+lock on <path>.<key>.lock and raises CheckpointInUse if a live run (in
+any thread or process) holds it. The lock is released when the run
+completes or stops, and by the operating system if its process dies, so
+only runs that are really interrupted can be resumed. Callers that must
+never adopt an earlier run give each run a unique label.
+
+Runs that are never resumed would otherwise stay in the file for good:
+whenever complete() rewrites the file it also drops every run not written
+to for max_age seconds (default 30 days) whose lock is not held, finished
+or not.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Serializes checkpoint file access between threads of this process; a
+# lock on <path>.lock does the same between processes
+_file_lock = threading.Lock()
+
+# Seconds after its last record that a run no longer live is dropped from the file
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+# TournamentConfig fields that do not affect a tournament's results
+_UNKEYED_FIELDS = ('checkpoint', 'workers')
+
+
+class CheckpointInUse(RuntimeError):
+    """Raised by TournamentCheckpoint.resume when another live tournament owns the run."""
+
+
+def run_key(strategies: List, game, config, label: str = '') -> str:
+    """
+    Identifier of one tournament run in a checkpoint file.
+
+    Args:
+        strategies: Participating strategies, in tournament order
+        game: PrisonersDilemma the tournament is played under
+        config: TournamentConfig of the run
+        label: Distinguishes runs that are otherwise identical, e.g. the
+            tournaments of an unseeded cli.py sweep
+    """
+    settings = {name: value for name, value in asdict(config).items() if name not in _UNKEYED_FIELDS}
+    payoffs = sorted((list(choices), list(payoff)) for choices, payoff in game.payoff_matrix.items())
+    description = json.dumps([
+        [[s.name, s.fingerprint()] for s in strategies],
+        payoffs,
+        game.END_PROBABILITY,
+        game.MAX_ITERATIONS,
+        settings,
+        label
+    ], sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+
+class TournamentCheckpoint:
+    def __init__(self, path: str, key: str, max_age: float = DEFAULT_MAX_AGE):
+        """
+        Args:
+            path: JSON Lines checkpoint file; created on first write
+            key: run_key of the tournament
+            max_age: Seconds after which complete() drops other runs that
+                are not live from the file
+        """
+        self.path = path
+        self.key = key
+        self.max_age = max_age
+        self.entropy = None
+        self._owner = None  # Locked file held while this instance owns the run
+
+    @classmethod
+    def for_run(cls, path: str, strategies: List, game, config,
+                label: str = '') -> 'TournamentCheckpoint':
+        return cls(path, run_key(strategies, game, config, label))
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the checkpoint file for this thread."""
+        with _file_lock, open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _read(self) -> List[Dict]:
+        """This run's records, in file order."""
+        records = []
+        try:
+            with open(self.path) as checkpoint_file:
+                for line in checkpoint_file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get('run') == self.key:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _append(self, record: Dict):
+        with open(self.path, 'a+b') as checkpoint_file:
+            # Start a fresh line after a record cut short by a crash
+            if checkpoint_file.tell() > 0:
+                checkpoint_file.seek(-1, os.SEEK_END)
+                if checkpoint_file.read(1) != b'\n':
+                    checkpoint_file.write(b'\n')
+            checkpoint_file.write((json.dumps(record) + '\n').encode())
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+    def completed(self) -> bool:
+        """Whether the last run with this key finished."""
+        with self._locked():
+            markers = [r['type'] for r in self._read() if r['type'] in ('start', 'complete')]
+        return bool(markers) and markers[-1] == 'complete'
+
+    @property
+    def lock_path(self) -> str:
+        return self._lock_path(self.key)
+
+    def _lock_path(self, key: str) -> str:
+        return f"{self.path}.{key}.lock"
+
+    def _drop_if_idle(self, key: str) -> bool:
+        """Remove the lock file of a run no tournament owns; False if the run is live."""
+        try:
+            owner = open(self._lock_path(key), 'r')
+        except FileNotFoundError:
+            return True
+        with owner:
+            try:
+                fcntl.flock(owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                os.remove(self._lock_path(key))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def _claim(self):
+        """Take the run's lock, or raise CheckpointInUse if a live run holds it."""
+        while self._owner is None:
+            owner = open(self.lock_path, 'a')
+            try:
+                fcntl.flock(owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                owner.close()
+                raise CheckpointInUse(f"tournament run {self.key} in {self.path} is still running")
+            try:
+                current = os.stat(self.lock_path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(owner.fileno()).st_ino:
+                self._owner = owner
+            else:
+                owner.close()  # Locked a file its previous owner had just removed; retry
+
+    def release(self):
+        """Give up ownership of the run, so that it can be resumed."""
+        if self._owner is None:
+            return
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+        self._owner.close()
+        self._owner = None
+
+    def resume(self, entropy: int) -> Tuple[int, Dict[int, Dict]]:
+        """
+        Take ownership of the run and continue it if it is unfinished, or
+        start it. The run stays owned until complete() or release().
+
+        Args:
+            entropy: SeedSequence entropy to record if a new run is started
+
+        Returns:
+            Tuple: The entropy to seed the run with, and the pairing records
+                already finished, keyed by pairing index
+
+        Raises:
+            CheckpointInUse: Another tournament is running with this key
+        """
+        self._claim()
+        try:
+            with self._locked():
+                current = None
+                finished = {}
+                for record in self._read():
+                    if record['type'] == 'start':
+                        current, finished = record['entropy'], {}
+                    elif record['type'] == 'complete':
+                        current, finished = None, {}
+                    elif record['type'] == 'pairing' and current is not None \
+                            and record['entropy'] == current:
+                        finished[record['pair_index']] = record
+                if current is None:
+                    current = entropy
+                    self._append({'run': self.key, 'type': 'start', 'entropy': entropy,
+                                  'time': time.time()})
+        except BaseException:
+            self.release()
+            raise
+        self.entropy = current
+        return current, finished
+
+    def add(self, pair_index: int, strategy1_name: str, strategy2_name: str,
+            seed: np.random.SeedSequence, averages: Dict[str, float],
+            games: Optional[np.ndarray] = None, expected: Optional[Dict[str, float]] = None):
+        """Record a finished pairing of the run started or resumed by resume()."""
+        record = {
+            'run': self.key,
+            'type': 'pairing',
+            'entropy': self.entropy,
+            'pair_index': pair_index,
+            'strategy1': strategy1_name,
+            'strategy2': strategy2_name,
+            'spawn_key': list(seed.spawn_key),
+            'averages': averages,
+            'time': time.time()
+        }
+        if expected is not None:
+            record['expected'] = expected
+        else:
+            record['games'] = games.tolist()
+        with self._locked():
+            self._append(record)
+
+    def complete(self):
+        """
+        Mark the run finished, once its results are saved, and compact the
+        file: drop this run's start and pairing records and every stale run.
+
+        Raises:
+            CheckpointInUse: Another tournament has taken the run over
+        """
+        self._claim()
+        try:
+            with self._locked():
+                lines = {}
+                newest = {}
+                try:
+                    with open(self.path) as checkpoint_file:
+                        for line in checkpoint_file:
+                            try:
+                                record = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            key = record.get('run')
+                            if key == self.key:
+                                continue
+                            lines.setdefault(key, []).append(line if line.endswith('\n') else line + '\n')
+                            newest[key] = max(newest.get(key, 0), record.get('time', 0))
+                except FileNotFoundError:
+                    pass
+                cutoff = time.time() - self.max_age
+                kept = [line for key, run_lines in lines.items()
+                        if newest[key] >= cutoff or not self._drop_if_idle(key)
+                        for line in run_lines]
+                kept.append(json.dumps({'run': self.key, 'type': 'complete', 'time': time.time()}) + '\n')
+                with open(self.path + '.tmp', 'w') as checkpoint_file:
+                    checkpoint_file.writelines(kept)
+                    checkpoint_file.flush()
+                    os.fsync(checkpoint_file.fileno())
+                os.replace(self.path + '.tmp', self.path)
+        finally:
+            self.release()
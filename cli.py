@@ -0,0 +1,213 @@
+"""
+cli.py
+
+This module runs tournaments from the command line, without Streamlit, for
+long sweeps (e.g. under cron) and for benchmarking the engine.
+
+Usage:
+    python cli.py sweep.json [--output results.jsonl] [--no-stats] [--checkpoint sweep.ckpt]
+
+The config file is a JSON object:
+    {
+        "strategies": ["Tit for Tat", "Always Defect", "Random"],
+        "custom_strategies": [
+            {"name": "Grudger", "description": "...", "logic": "tit for tat"}
+        ],
+        "num_games": 100,
+        "seed": 42,
+        "workers": 4,
+        "tournaments": 10,
+        "output": "results.jsonl"
+    }
+
+"strategies" selects built-in and custom strategies by name and defaults to
+all of them. Any other TournamentConfig field (adaptive, ci_half_width,
+exact_memory_one, common_random_numbers, ...) may be given as well. With a
+seed, tournament k uses seed + k.
+
+With a checkpoint file (--checkpoint or "checkpoint"), every finished
+pairing is recorded as it completes. A tournament is marked finished once
+its results are written. Rerunning the same command after an interruption
+skips the finished tournaments and resumes the interrupted one from its
+last finished pairing; rerunning it while the first run is still going
+fails instead. Runs are forgotten after checkpoint.DEFAULT_MAX_AGE (30
+days). Delete the checkpoint file to run the sweep again from scratch.
+
+After each tournament, one JSON line per ordered pairing is appended to the
+output file, the games are recorded through StrategyStats unless --no-stats
+is given, and the throughput is printed.
+"""
+
+import argparse
+import json
+import time
+from dataclasses import fields
+from typing import Dict, List
+
+from checkpoint import CheckpointInUse, TournamentCheckpoint
+from game_logic import PrisonersDilemma
+from models import init_db
+from strategies import Strategy, add_custom_strategy, get_all_strategies
+from strategy_stats import StrategyStats
+from tournament import (ROUNDS, SCORE1, SCORE2, COOP1, COOP2, TournamentConfig, TournamentResult,
+                        default_workers, iter_game_results, run_round_robin)
+
+DEFAULT_OUTPUT = 'tournament_results.jsonl'
+
+_CONFIG_FIELDS = {f.name for f in fields(TournamentConfig)}
+
+
+def load_config(path: str) -> Dict:
+    with open(path) as config_file:
+        config = json.load(config_file)
+    if not isinstance(config, dict):
+        raise ValueError("config must be a JSON object")
+    unknown = set(config) - _CONFIG_FIELDS - {'strategies', 'custom_strategies', 'tournaments', 'output'}
+    if unknown:
+        raise ValueError(f"unknown config keys: {', '.join(sorted(unknown))}")
+    return config
+
+
+def select_strategies(config: Dict) -> List[Strategy]:
+    """Register the config's custom strategies and pick the participants by name."""
+    for custom in config.get('custom_strategies', []):
+        add_custom_strategy(custom['name'], custom.get('description', custom['logic']),
+                            custom['logic'])
+    available = {s.name: s for s in get_all_strategies()}
+    names = config.get('strategies') or list(available)
+    missing = [name for name in names if name not in available]
+    if missing:
+        raise ValueError(f"unknown strategies: {', '.join(missing)}")
+    return [available[name] for name in names]
+
+
+def pairing_records(tournament: TournamentResult, index: int, seed) -> List[Dict]:
+    """One JSON-serializable summary per ordered pairing."""
+    records = []
+    for (s1, s2), pair_games in tournament.games.items():
+        sampling = tournament.sampling[(s1, s2)]
+        records.append({
+            'tournament': index,
+            'seed': seed,
+            'strategy1': s1,
+            'strategy2': s2,
+            'exact': False,
+            'games': len(pair_games),
+            'mean_score1': float(pair_games[:, SCORE1].mean()),
+            'mean_score2': float(pair_games[:, SCORE2].mean()),
+            'cooperation_rate1': float(pair_games[:, COOP1].mean()),
+            'cooperation_rate2': float(pair_games[:, COOP2].mean()),
+            'mean_rounds': float(pair_games[:, ROUNDS].mean()),
+            'ci_half_width': sampling['ci_half_width']
+        })
+    for (s1, s2), expected in tournament.expected.items():
+        records.append({
+            'tournament': index,
+            'seed': seed,
+            'strategy1': s1,
+            'strategy2': s2,
+            'exact': True,
+            'games': 0,
+            'mean_score1': expected['final_score1'],
+            'mean_score2': expected['final_score2'],
+            'cooperation_rate1': expected['cooperation_rate1'],
+            'cooperation_rate2': expected['cooperation_rate2'],
+            'mean_rounds': expected['total_rounds'],
+            'ci_half_width': 0.0
+        })
+    return records
+
+
+def run(config: Dict, output: str, record_stats: bool = True) -> Dict[str, float]:
+    """
+    Runs the configured tournaments, appending results to `output`.
+
+    Returns:
+        Dict: Totals over all tournaments: games, rounds, seconds, games_per_sec
+    """
+    strategies = select_strategies(config)
+    game = PrisonersDilemma()
+    base = {name: value for name, value in config.items() if name in _CONFIG_FIELDS}
+    base.setdefault('workers', default_workers())
+    stats = StrategyStats(write_behind=True) if record_stats else None
+
+    totals = {'games': 0, 'rounds': 0, 'seconds': 0.0}
+    with open(output, 'a') as results_file:
+        for index in range(config.get('tournaments', 1)):
+            seed = base.get('seed')
+            tournament_config = TournamentConfig(**dict(base, seed=None if seed is None else seed + index))
+            label = f"tournament {index}"
+            if tournament_config.checkpoint and TournamentCheckpoint.for_run(
+                    tournament_config.checkpoint, strategies, game, tournament_config, label).completed():
+                print(f"tournament {index + 1}: already completed in {tournament_config.checkpoint}, skipped",
+                      flush=True)
+                continue
+
+            started = time.perf_counter()
+            tournament = run_round_robin(strategies, game, tournament_config, checkpoint_label=label)
+            elapsed = time.perf_counter() - started
+
+            for record in pairing_records(tournament, index, tournament_config.seed):
+                results_file.write(json.dumps(record) + '\n')
+            results_file.flush()
+            if stats is not None:
+                for (s1, s2), summaries in tournament.games.items():
+                    stats.record_games(s1, s2, iter_game_results(summaries))
+                stats.flush()
+            # Only now that the results are saved may a rerun skip this tournament
+            tournament.complete_checkpoint()
+
+            # Mirrored orientations share their games, so count each played game once
+            games = rounds = 0
+            counted = set()
+            for (s1, s2), summaries in tournament.games.items():
+                if tournament_config.symmetric and (s2, s1) in counted:
+                    continue
+                counted.add((s1, s2))
+                games += len(summaries)
+                rounds += int(summaries[:, ROUNDS].sum())
+            totals['games'] += games
+            totals['rounds'] += rounds
+            totals['seconds'] += elapsed
+            resumed = f", {tournament.resumed} pairings resumed from checkpoint" if tournament.resumed else ""
+            print(
+                f"tournament {index + 1}: {len(tournament.strategy_names)} strategies, "
+                f"{games} games, {rounds} rounds in {elapsed:.2f} s "
+                f"({games / elapsed if elapsed else 0:,.0f} games/s, "
+                f"{rounds / elapsed if elapsed else 0:,.0f} rounds/s){resumed}",
+                flush=True
+            )
+
+    totals['games_per_sec'] = totals['games'] / totals['seconds'] if totals['seconds'] else 0.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Prisoner's Dilemma tournaments without the UI")
+    parser.add_argument("config", help="JSON tournament config file")
+    parser.add_argument("--output", help=f"JSON Lines file to append pairing results to "
+                                         f"(default: config 'output' or {DEFAULT_OUTPUT})")
+    parser.add_argument("--no-stats", action="store_true",
+                        help="Do not record games in the statistics database")
+    parser.add_argument("--checkpoint",
+                        help="JSON Lines file to checkpoint finished pairings to and resume from "
+                             "(default: config 'checkpoint', if any)")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+        if args.checkpoint:
+            config['checkpoint'] = args.checkpoint
+        output = args.output or config.get('output', DEFAULT_OUTPUT)
+        if not args.no_stats:
+            init_db()
+        totals = run(config, output, record_stats=not args.no_stats)
+    except (OSError, ValueError, TypeError, CheckpointInUse) as e:
+        parser.exit(1, f"error: {e}\n")
+
+    print(f"total: {totals['games']} games in {totals['seconds']:.2f} s "
+          f"({totals['games_per_sec']:,.0f} games/s); results in {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,16 +10,94 @@ It handles:
 
 The PrisonersDilemma class provides methods for:
 - Running individual game rounds
-- Managing multi-round tournaments
+- Managing multi-round tournaments, with optional summary-only and
+  per-round streaming modes
+- Playing batches of independent games as NumPy arrays
+- Scoring deterministic pairs in closed form once their play cycles
 - Calculating and tracking scores
 - Recording player cooperation rates
 """
 
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Iterator, Optional, Callable, NamedTuple
+import math
 import numpy as np
 import random
+import time
+import profiling
+from matchup_cache import default_cache, matchup_key
 from strategies import Strategy
 
+class RoundEvent(NamedTuple):
+    """One played round, as passed to run_tournament's on_round callback."""
+    round_index: int
+    choice1: bool
+    choice2: bool
+    score1: int
+    score2: int
+    cumulative1: int
+    cumulative2: int
+
+class GameCycle:
+    """
+    Moves of a deterministic pairing up to the point its joint state repeats.
+
+    Rounds [0, start) are the transient, rounds [start, start + period) then
+    repeat forever, so totals for any game length follow arithmetically.
+    """
+
+    def __init__(self, payoffs1: List[int], payoffs2: List[int], moves1: List[bool],
+                 moves2: List[bool], start: int, period: int):
+        # Prefix sums with a leading zero: totals of the first n rounds at [n]
+        self.score1 = np.concatenate(([0], np.cumsum(payoffs1)))
+        self.score2 = np.concatenate(([0], np.cumsum(payoffs2)))
+        self.cooperations1 = np.concatenate(([0], np.cumsum(moves1)))
+        self.cooperations2 = np.concatenate(([0], np.cumsum(moves2)))
+        self.start = start
+        self.period = period
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable form, for the matchup cache."""
+        return {
+            'payoffs1': np.diff(self.score1).tolist(),
+            'payoffs2': np.diff(self.score2).tolist(),
+            'moves1': np.diff(self.cooperations1).astype(bool).tolist(),
+            'moves2': np.diff(self.cooperations2).astype(bool).tolist(),
+            'start': self.start,
+            'period': self.period
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GameCycle':
+        return cls(**data)
+
+    def _total(self, prefix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        played = len(prefix) - 1
+        if self.period == 0:
+            return prefix[lengths]
+        cycles, remainder = np.divmod(np.maximum(lengths - played, 0), self.period)
+        cycle_total = prefix[played] - prefix[self.start]
+        extended = (prefix[played] + cycles * cycle_total
+                    + prefix[self.start + remainder] - prefix[self.start])
+        return np.where(lengths <= played, prefix[np.minimum(lengths, played)], extended)
+
+    def totals(self, lengths: np.ndarray) -> Dict:
+        """
+        Per-game totals for games of the given lengths.
+
+        Returns:
+            Dict: final_score1/final_score2, cooperation_rate1/cooperation_rate2
+                and total_rounds arrays, as in a summary-only run_batch result
+        """
+        lengths = np.asarray(lengths)
+        rounds = np.maximum(lengths, 1)
+        return {
+            'final_score1': self._total(self.score1, lengths),
+            'final_score2': self._total(self.score2, lengths),
+            'cooperation_rate1': self._total(self.cooperations1, lengths) / rounds,
+            'cooperation_rate2': self._total(self.cooperations2, lengths) / rounds,
+            'total_rounds': lengths
+        }
+
 class PrisonersDilemma:
     def __init__(self):
         # Payoff matrix: (row_player_payoff, col_player_payoff)
@@ -30,6 +108,8 @@ class PrisonersDilemma:
             (False, False): (1, 1)   # Both defect
         }
         self.MAX_ITERATIONS = 1000  # Safety limit
+        self.END_PROBABILITY = 0.003  # Chance of the game ending after each move
+        self.cache_matchups = True  # Reuse cycles of deterministic pairs across batches
 
     def play_round(self, strategy1: Strategy, strategy2: Strategy) -> Tuple[int, int]:
         choice1 = strategy1.make_choice()
@@ -40,32 +120,347 @@ class PrisonersDilemma:
 
         return self.payoff_matrix[(choice1, choice2)]
 
-    def run_tournament(self, strategy1: Strategy, strategy2: Strategy) -> Dict:
+    def _play_round_profiled(self, strategy1: Strategy, strategy2: Strategy,
+                             profiler: profiling.Profiler) -> Tuple[int, int]:
+        """play_round with make_choice and whole-round timings recorded."""
+        round_started = time.perf_counter()
+        choice1 = strategy1.make_choice()
+        choice_done = time.perf_counter()
+        profiler.record('make_choice', choice_done - round_started)
+        choice2 = strategy2.make_choice()
+        profiler.record('make_choice', time.perf_counter() - choice_done)
+
+        strategy1.update_history(choice1, choice2)
+        strategy2.update_history(choice2, choice1)
+
+        payoffs = self.payoff_matrix[(choice1, choice2)]
+        profiler.record('play_round', time.perf_counter() - round_started)
+        return payoffs
+
+    def sample_game_length(self) -> int:
+        """
+        Draw one game length from the module-level generator.
+
+        Equivalent to ending with END_PROBABILITY after every move, capped at
+        MAX_ITERATIONS, but costs one random draw per game instead of per round.
+        """
+        length = 1 + int(math.log(1.0 - random.random()) / math.log(1.0 - self.END_PROBABILITY))
+        return min(length, self.MAX_ITERATIONS)
+
+    def iter_rounds(self, strategy1: Strategy, strategy2: Strategy,
+                    num_rounds: Optional[int] = None) -> Iterator[RoundEvent]:
+        """
+        Plays one game and yields a RoundEvent after every round.
+
+        The game lasts num_rounds rounds, or a length drawn with
+        sample_game_length; stopping the iteration early abandons the game.
+        """
+        cumulative1 = 0
+        cumulative2 = 0
+        if num_rounds is None:
+            num_rounds = self.sample_game_length()
+
+        for iterations in range(num_rounds):
+            choice1 = strategy1.make_choice()
+            choice2 = strategy2.make_choice()
+            strategy1.update_history(choice1, choice2)
+            strategy2.update_history(choice2, choice1)
+            score1, score2 = self.payoff_matrix[(choice1, choice2)]
+            cumulative1 += score1
+            cumulative2 += score2
+            yield RoundEvent(iterations, choice1, choice2, score1, score2, cumulative1, cumulative2)
+
+    def find_cycle(self, strategy1: Strategy, strategy2: Strategy,
+                   max_rounds: int) -> Optional[GameCycle]:
+        """
+        Plays rounds until the pair's joint state repeats.
+
+        Args:
+            strategy1: Strategy playing the row side
+            strategy2: Strategy playing the column side
+            max_rounds: Rounds to play at most; if no state repeats within
+                them, the returned cycle only covers these rounds
+
+        Returns:
+            Optional[GameCycle]: The played rounds and the detected cycle, or
+                None (with nothing played) if either strategy exposes no state
+        """
+        if strategy1.state() is None or strategy2.state() is None:
+            return None
+
+        payoffs1, payoffs2, moves1, moves2 = [], [], [], []
+        seen = {}
+        for round_index in range(max_rounds):
+            joint_state = (strategy1.state(), strategy2.state())
+            start = seen.get(joint_state)
+            if start is not None:
+                return GameCycle(payoffs1, payoffs2, moves1, moves2, start, round_index - start)
+            seen[joint_state] = round_index
+
+            choice1 = strategy1.make_choice()
+            choice2 = strategy2.make_choice()
+            strategy1.update_history(choice1, choice2)
+            strategy2.update_history(choice2, choice1)
+            score1, score2 = self.payoff_matrix[(choice1, choice2)]
+            payoffs1.append(score1)
+            payoffs2.append(score2)
+            moves1.append(choice1)
+            moves2.append(choice2)
+        return GameCycle(payoffs1, payoffs2, moves1, moves2, max_rounds, 0)
+
+    def run_tournament(self, strategy1: Strategy, strategy2: Strategy, summary_only: bool = False,
+                       on_round: Optional[Callable[[RoundEvent], None]] = None,
+                       num_rounds: Optional[int] = None) -> Dict:
+        """
+        Plays one game between two strategies.
+
+        Args:
+            strategy1: Strategy playing the row side
+            strategy2: Strategy playing the column side
+            summary_only: Skip building the per-round cumulative score lists;
+                the result then has no 'scores1'/'scores2' keys. Deterministic
+                pairs are then played only until their joint state repeats and
+                the rest of the game is scored arithmetically, so the
+                strategies' histories end at that point
+            on_round: Optional callback receiving a RoundEvent after every round
+            num_rounds: Game length; drawn with sample_game_length when omitted,
+                so the game still ends with 0.3% chance after each move
+
+        Returns:
+            Dict: Final scores, cooperation rates and total rounds, plus the
+                cumulative score lists unless summary_only is set
+        """
+        if num_rounds is None:
+            num_rounds = self.sample_game_length()
+        if on_round is not None:
+            return self._run_streaming(strategy1, strategy2, summary_only, on_round, num_rounds)
+        if summary_only:
+            cycle = self.find_cycle(strategy1, strategy2, num_rounds)
+            if cycle is not None:
+                profiling.count('games')
+                profiling.count('cycle_games')
+                totals = cycle.totals(np.array([num_rounds]))
+                return {name: values[0].item() for name, values in totals.items()}
+
         scores1 = []
         scores2 = []
         cumulative1 = 0
         cumulative2 = 0
-        iterations = 0
+        profiler = profiling.active()
 
-        # Continue until random end condition or max iterations
-        while iterations < self.MAX_ITERATIONS:
-            score1, score2 = self.play_round(strategy1, strategy2)
+        for _ in range(num_rounds):
+            if profiler is None:
+                score1, score2 = self.play_round(strategy1, strategy2)
+            else:
+                score1, score2 = self._play_round_profiled(strategy1, strategy2, profiler)
             cumulative1 += score1
             cumulative2 += score2
-            scores1.append(cumulative1)
-            scores2.append(cumulative2)
-            iterations += 1
+            if not summary_only:
+                scores1.append(cumulative1)
+                scores2.append(cumulative2)
 
-            # 0.3% chance of ending after each move
-            if random.random() < 0.003:
-                break
+        if profiler is not None:
+            profiler.count('games')
+        return self._game_result(strategy1, strategy2, cumulative1, cumulative2, num_rounds,
+                                 None if summary_only else (scores1, scores2))
 
-        return {
-            'scores1': scores1,
-            'scores2': scores2,
-            'final_score1': cumulative1,
-            'final_score2': cumulative2,
-            'cooperation_rate1': sum(strategy1.history) / len(strategy1.history),
-            'cooperation_rate2': sum(strategy2.history) / len(strategy2.history),
-            'total_rounds': iterations
-        }
\ No newline at end of file
+    def _run_streaming(self, strategy1: Strategy, strategy2: Strategy, summary_only: bool,
+                       on_round: Callable[[RoundEvent], None], num_rounds: int) -> Dict:
+        scores1 = []
+        scores2 = []
+        cumulative1 = 0
+        cumulative2 = 0
+        for event in self.iter_rounds(strategy1, strategy2, num_rounds):
+            on_round(event)
+            cumulative1, cumulative2 = event.cumulative1, event.cumulative2
+            if not summary_only:
+                scores1.append(cumulative1)
+                scores2.append(cumulative2)
+        profiling.count('games')
+        return self._game_result(strategy1, strategy2, cumulative1, cumulative2, num_rounds,
+                                 None if summary_only else (scores1, scores2))
+
+    def _game_result(self, strategy1: Strategy, strategy2: Strategy, final_score1: int,
+                     final_score2: int, total_rounds: int,
+                     score_lists: Optional[Tuple[List[int], List[int]]]) -> Dict:
+        results = {
+            'final_score1': final_score1,
+            'final_score2': final_score2,
+            'cooperation_rate1': strategy1.history.cooperation_rate(),
+            'cooperation_rate2': strategy2.history.cooperation_rate(),
+            'total_rounds': total_rounds
+        }
+        if score_lists is not None:
+            results['scores1'], results['scores2'] = score_lists
+        return results
+
+    def sample_game_lengths(self, num_games: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw game lengths with the same distribution as sample_game_length."""
+        lengths = rng.geometric(self.END_PROBABILITY, size=num_games)
+        return np.minimum(lengths, self.MAX_ITERATIONS)
+
+    def run_batch(self, strategy1: Strategy, strategy2: Strategy, num_games: int,
+                  rng: Optional[np.random.Generator] = None, summary_only: bool = False) -> Dict:
+        """
+        Plays num_games independent games of one pairing at once.
+
+        Every round is played for all games in a single vectorized step; games
+        that have already ended keep playing but their moves are masked out of
+        the scores. Strategies without a batch_choice implementation fall back
+        to playing each game round by round with play_round.
+
+        Args:
+            strategy1: Strategy playing the row side
+            strategy2: Strategy playing the column side
+            num_games: Number of independent games to play
+            rng: Optional NumPy generator, for reproducible batches
+            summary_only: Return only the per-game summary arrays (final
+                scores, cooperation rates, total rounds). Deterministic pairs
+                are then played once until their joint state repeats and
+                every game is scored arithmetically from the cycle, which is
+                kept in the matchup cache unless cache_matchups is off
+
+        Returns:
+            Dict: Same keys as run_tournament, holding one entry per game:
+                - scores1/scores2: (num_games, rounds) cumulative scores, held
+                  at the final score once a game has ended
+                - final_score1/final_score2, cooperation_rate1/cooperation_rate2,
+                  total_rounds: (num_games,) arrays
+                - moves1/moves2, payoffs1/payoffs2: (num_games, rounds) arrays,
+                  zeroed past each game's end
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        if summary_only:
+            lengths = self.sample_game_lengths(num_games, rng)
+            cycle = self._pair_cycle(strategy1, strategy2, int(lengths.max()))
+            if cycle is not None:
+                profiling.count('games', num_games)
+                profiling.count('cycle_games', num_games)
+                return cycle.totals(lengths)
+            # Not deterministic: play normally with the same length schedule
+            return self._run_batch_games(strategy1, strategy2, lengths, rng, summary_only)
+        return self._run_batch_games(strategy1, strategy2, self.sample_game_lengths(num_games, rng),
+                                     rng, summary_only)
+
+    def _pair_cycle(self, strategy1: Strategy, strategy2: Strategy,
+                    max_rounds: int) -> Optional[GameCycle]:
+        """find_cycle on fresh instances, through the matchup cache when enabled."""
+        player1, player2 = type(strategy1)(), type(strategy2)()
+        if not self.cache_matchups:
+            return self.find_cycle(player1, player2, max_rounds)
+        if player1.state() is None or player2.state() is None:
+            return None
+
+        # Cached cycles cover every length up to the cap, not just this batch's
+        cache = default_cache()
+        key = matchup_key(player1.fingerprint(), player2.fingerprint(),
+                          self.MAX_ITERATIONS, self.payoff_matrix)
+        cached = cache.get(key)
+        if cached is not None:
+            return GameCycle.from_dict(cached)
+        cycle = self.find_cycle(player1, player2, self.MAX_ITERATIONS)
+        cache.put(key, cycle.to_dict())
+        return cycle
+
+    def _run_batch_games(self, strategy1: Strategy, strategy2: Strategy, lengths: np.ndarray,
+                         rng: np.random.Generator, summary_only: bool) -> Dict:
+        if not (supports_batch(strategy1) and supports_batch(strategy2)):
+            return self._run_batch_fallback(strategy1, strategy2, lengths, summary_only)
+
+        num_games = len(lengths)
+        rounds = int(lengths.max())
+        profiler = profiling.active()
+
+        moves1 = np.zeros((num_games, rounds), dtype=bool)
+        moves2 = np.zeros((num_games, rounds), dtype=bool)
+        for round_index in range(rounds):
+            if profiler is not None:
+                round_started = time.perf_counter()
+            choice1 = strategy1.batch_choice(round_index, moves1, moves2, rng)
+            choice2 = strategy2.batch_choice(round_index, moves2, moves1, rng)
+            moves1[:, round_index] = choice1
+            moves2[:, round_index] = choice2
+            if profiler is not None:
+                profiler.record('batch_round', time.perf_counter() - round_started)
+
+        if profiler is None:
+            return self._batch_results(moves1, moves2, lengths, summary_only)
+        with profiler.phase('batch_scoring'):
+            results = self._batch_results(moves1, moves2, lengths, summary_only)
+        profiler.count('games', num_games)
+        return results
+
+    def _payoff_tables(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Payoff matrix as two 2x2 arrays indexed by [choice1, choice2]."""
+        table1 = np.zeros((2, 2))
+        table2 = np.zeros((2, 2))
+        for (choice1, choice2), (payoff1, payoff2) in self.payoff_matrix.items():
+            table1[int(choice1), int(choice2)] = payoff1
+            table2[int(choice1), int(choice2)] = payoff2
+        return table1, table2
+
+    def _batch_results(self, moves1: np.ndarray, moves2: np.ndarray, lengths: np.ndarray,
+                       summary_only: bool = False) -> Dict:
+        active = np.arange(moves1.shape[1]) < lengths[:, None]
+        moves1 &= active
+        moves2 &= active
+
+        table1, table2 = self._payoff_tables()
+        index1 = moves1.astype(np.intp)
+        index2 = moves2.astype(np.intp)
+        payoffs1 = table1[index1, index2] * active
+        payoffs2 = table2[index1, index2] * active
+
+        results = {
+            'cooperation_rate1': moves1.sum(axis=1) / lengths,
+            'cooperation_rate2': moves2.sum(axis=1) / lengths,
+            'total_rounds': lengths
+        }
+        if summary_only:
+            results['final_score1'] = payoffs1.sum(axis=1)
+            results['final_score2'] = payoffs2.sum(axis=1)
+        else:
+            results['scores1'] = np.cumsum(payoffs1, axis=1)
+            results['scores2'] = np.cumsum(payoffs2, axis=1)
+            results['final_score1'] = results['scores1'][:, -1]
+            results['final_score2'] = results['scores2'][:, -1]
+            results.update(moves1=moves1, moves2=moves2, payoffs1=payoffs1, payoffs2=payoffs2)
+        return results
+
+    def _run_batch_fallback(self, strategy1: Strategy, strategy2: Strategy, lengths: np.ndarray,
+                            summary_only: bool = False) -> Dict:
+        rounds = int(lengths.max())
+        moves1 = np.zeros((len(lengths), rounds), dtype=bool)
+        moves2 = np.zeros((len(lengths), rounds), dtype=bool)
+        for i, length in enumerate(lengths):
+            player1, player2 = type(strategy1)(), type(strategy2)()
+            for round_index in range(length):
+                self.play_round(player1, player2)
+                moves1[i, round_index] = player1.history.last
+                moves2[i, round_index] = player2.history.last
+        return self._batch_results(moves1, moves2, lengths, summary_only)
+
+    def iter_batch_games(self, batch: Dict) -> Iterator[Dict]:
+        """
+        Split a run_batch result into per-game dicts shaped like run_tournament's.
+
+        Batches played with summary_only yield summary-only dicts.
+        """
+        for i, rounds in enumerate(batch['total_rounds']):
+            rounds = int(rounds)
+            results = {
+                'final_score1': float(batch['final_score1'][i]),
+                'final_score2': float(batch['final_score2'][i]),
+                'cooperation_rate1': float(batch['cooperation_rate1'][i]),
+                'cooperation_rate2': float(batch['cooperation_rate2'][i]),
+                'total_rounds': rounds
+            }
+            if 'scores1' in batch:
+                results['scores1'] = batch['scores1'][i, :rounds].tolist()
+                results['scores2'] = batch['scores2'][i, :rounds].tolist()
+            yield results
+
+
+def supports_batch(strategy: Strategy) -> bool:
+    """True if the strategy's class provides a vectorized batch_choice."""
+    return type(strategy).batch_choice is not Strategy.batch_choice
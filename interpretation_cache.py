@@ -0,0 +1,131 @@
+"""
+interpretation_cache.py
+
+This module provides a persistent, size-bounded cache for strategy
+interpretations, so equivalent strategy texts are only sent to the language
+model once across process restarts.
+
+Key features:
+- SQLite-backed storage that survives restarts and redeploys, with an
+  in-memory front layer, least-recently-used eviction and time-to-live
+  expiry (see sqlite_cache.SQLiteLRUCache)
+- Canonicalized keys, so "cooperate ten rounds, then defect ten rounds" and
+  "cooperate 10 moves then defect 10 moves" share one entry
+- Hit/miss counters
+
+The cache file defaults to strategy_cache.db and can be moved with the
+STRATEGY_CACHE_PATH environment variable.
+"""
+
+import os
+import re
+from typing import Dict, Optional
+
+from sqlite_cache import SQLiteLRUCache
+
+DEFAULT_CACHE_PATH = 'strategy_cache.db'
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+_UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19
+}
+_TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90
+}
+
+# Version of canonicalize(); entries keyed by an older version are discarded
+_KEY_VERSION = 3
+
+# Words that mean the same thing in a strategy description, mapped to one form.
+# Only words that keep both the meaning and the order of events may be mapped:
+# "cooperate after defecting" must not share a key with "cooperate then defect".
+_SYNONYMS = {
+    'move': 'moves', 'round': 'moves', 'rounds': 'moves', 'turn': 'moves',
+    'turns': 'moves', 'time': 'moves', 'times': 'moves', 'step': 'moves',
+    'steps': 'moves',
+    'cooperates': 'cooperate', 'cooperating': 'cooperate', 'cooperation': 'cooperate',
+    'cooperated': 'cooperate', 'collaborate': 'cooperate',
+    'defects': 'defect', 'defecting': 'defect', 'defected': 'defect',
+    'betray': 'defect', 'betrays': 'defect',
+    'copies': 'copy', 'copying': 'copy', 'mirror': 'copy', 'mirrors': 'copy',
+    'imitate': 'copy', 'imitates': 'copy',
+    'opponents': 'opponent', 'opponent\'s': 'opponent', 'opponents\'': 'opponent',
+    'randomly': 'random'
+}
+
+# Filler words that never change the meaning of a strategy description.
+# Possessives are not filler: "copy my last move" repeats the strategy's own
+# move, "copy their last move" the opponent's.
+_FILLER = {'the', 'a', 'an', 'for', 'and', 'that', 'of'}
+
+
+def _merge_number_words(words):
+    """Replace runs of number words ("twenty five", "one hundred") with digits."""
+    merged = []
+    value = None
+    for word in words:
+        if word in _UNITS or word in _TENS or (word == 'hundred' and value is not None):
+            if word == 'hundred':
+                value *= 100
+            else:
+                value = (value or 0) + _UNITS.get(word, _TENS.get(word))
+            continue
+        if value is not None:
+            merged.append(str(value))
+            value = None
+        merged.append(word)
+    if value is not None:
+        merged.append(str(value))
+    return merged
+
+
+def canonicalize(strategy_text: str) -> str:
+    """
+    Normalize a strategy description into its cache key.
+
+    Lowercases the text, drops punctuation and filler words, rewrites number
+    words as digits and maps synonyms onto one form.
+
+    Args:
+        strategy_text: Natural language strategy description
+
+    Returns:
+        str: Canonical form of the description
+    """
+    text = strategy_text.lower().replace('’', "'")
+    text = re.sub(r"[^\w\s']", ' ', text)
+    words = [_SYNONYMS.get(word, word) for word in text.split()]
+    words = [word.strip("'") for word in words]
+    words = [word for word in _merge_number_words(words) if word and word not in _FILLER]
+    return ' '.join(words)
+
+
+class InterpretationCache(SQLiteLRUCache):
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """
+        Args:
+            path: SQLite file to store entries in; defaults to STRATEGY_CACHE_PATH
+                or strategy_cache.db. ":memory:" keeps the cache in-process only.
+            max_entries: Entries kept before least-recently-used ones are evicted
+            ttl_seconds: Age after which an entry is treated as missing
+        """
+        path = path or os.getenv('STRATEGY_CACHE_PATH', DEFAULT_CACHE_PATH)
+        super().__init__('interpretations', path, max_entries, ttl_seconds, version=_KEY_VERSION)
+
+    def get(self, strategy_text: str) -> Optional[Dict]:
+        """Return the cached interpretation for a strategy text, if fresh."""
+        return super().get(canonicalize(strategy_text))
+
+    def peek(self, strategy_text: str) -> Optional[Dict]:
+        """get() without counting a hit or miss."""
+        return super().peek(canonicalize(strategy_text))
+
+    def put(self, strategy_text: str, interpretation: Dict):
+        """Store an interpretation and evict least-recently-used entries over the limit."""
+        super().put(canonicalize(strategy_text), interpretation)
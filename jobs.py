@@ -0,0 +1,405 @@
+"""
+jobs.py
+
+This module runs tournaments as background jobs, so a long tournament does
+not tie up the Streamlit session that started it, survives the browser
+disconnecting, and can be cancelled.
+
+Key features:
+- A local queue drained by worker threads; each tournament still plays its
+  pairings on its own process pool (TournamentConfig.workers)
+- Job IDs, with progress and partial score/cooperation matrices updated as
+  pairings finish, for the UI to poll; progress is also written to the
+  job's file (at most every PROGRESS_SAVE_SECONDS), so other server
+  processes sharing TOURNAMENT_JOBS_PATH can follow it
+- Cancellation of queued jobs, and of running ones between pairings
+- Finished jobs recorded through StrategyStats and persisted as JSON under
+  TOURNAMENT_JOBS_PATH (default tournament_jobs), so their results outlive
+  the process; once persisted they are dropped from memory and served from
+  that file. A running job holds a lock on <id>.lock, so a job saved as
+  running whose lock is free was cut short by a restart and is reported
+  as interrupted
+- Each job checkpoints under its own label (its ID), so jobs never share a
+  run; with TournamentConfig.checkpoint set, resume(job_id) resubmits a
+  cancelled, failed or interrupted job under its label, and it continues
+  from the pairings it finished
+
+One JobRunner is shared by every session of a server process (see
+main.get_job_runner). Job state is handed out as JSON-serializable dicts
+(TournamentJob.to_dict), never as the live objects.
+"""
+
+import fcntl
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from game_logic import PrisonersDilemma
+from strategies import Strategy
+from strategy_stats import StrategyStats
+from tournament import (TournamentCancelled, TournamentConfig, iter_game_results, mirror_results,
+                        run_round_robin)
+
+DEFAULT_JOBS_PATH = 'tournament_jobs'
+# Minimum seconds between progress writes to a running job's file
+PROGRESS_SAVE_SECONDS = 1.0
+# Job IDs as handed out by JobRunner.submit; nothing else names a job file
+_JOB_ID = re.compile(r'[0-9a-f]{12}')
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+INTERRUPTED = 'interrupted'  # Saved as running by a process that has since stopped
+FINISHED = (COMPLETED, CANCELLED, FAILED, INTERRUPTED)
+RESUMABLE = (CANCELLED, FAILED, INTERRUPTED)
+
+
+@dataclass
+class TournamentJob:
+    id: str
+    strategies: List[Strategy]
+    config: TournamentConfig
+    record_stats: bool = True  # Record the games through the runner's StrategyStats
+    checkpoint_label: str = ''  # Run label in config.checkpoint (see checkpoint.run_key)
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pairings_done: int = 0
+    pairings_total: int = 0
+    last_pairing: Optional[List[str]] = None
+    # Average score and cooperation rate (%) matrices, filled in as pairings finish
+    score_matrix: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    coop_matrix: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    # Games and CI half-width per simulated pairing, and the [strategy1,
+    # strategy2] pairings evaluated exactly, once the job completes
+    sampling: List[Dict] = field(default_factory=list)
+    exact: List[List[str]] = field(default_factory=list)
+    games_recorded: int = 0
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def strategy_names(self) -> List[str]:
+        return [s.name for s in self.strategies]
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable snapshot of the job, without its strategies or per-game results."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'strategy_names': self.strategy_names,
+            'config': asdict(self.config),
+            'record_stats': self.record_stats,
+            'checkpoint_label': self.checkpoint_label,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'pairings_done': self.pairings_done,
+            'pairings_total': self.pairings_total,
+            'last_pairing': self.last_pairing,
+            'score_matrix': {s1: dict(row) for s1, row in self.score_matrix.items()},
+            'coop_matrix': {s1: dict(row) for s1, row in self.coop_matrix.items()},
+            'sampling': list(self.sampling),
+            'exact': list(self.exact),
+            'games_recorded': self.games_recorded,
+            'error': self.error
+        }
+
+
+class JobRunner:
+    def __init__(self, game: Optional[PrisonersDilemma] = None,
+                 stats_manager: Optional[StrategyStats] = None, workers: int = 1,
+                 path: Optional[str] = None):
+        """
+        Args:
+            game: Rules tournaments are played under; defaults to PrisonersDilemma()
+            stats_manager: Where finished jobs record their games; None records nothing
+            workers: Jobs run at the same time; further jobs wait in the queue
+            path: Directory finished jobs are persisted in; defaults to
+                TOURNAMENT_JOBS_PATH or tournament_jobs
+        """
+        self.game = game or PrisonersDilemma()
+        self.stats_manager = stats_manager
+        self.workers = workers
+        self.path = path or os.getenv('TOURNAMENT_JOBS_PATH', DEFAULT_JOBS_PATH)
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._jobs: Dict[str, TournamentJob] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Notified when a job finishes
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, strategies: List[Strategy], config: Optional[TournamentConfig] = None,
+               record_stats: bool = True, checkpoint_label: Optional[str] = None) -> str:
+        """
+        Queue a round-robin tournament.
+
+        Args:
+            checkpoint_label: Checkpoint run to continue (see resume); defaults
+                to the new job's ID, so the job starts a run of its own
+
+        Returns:
+            str: The job ID
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = TournamentJob(job_id, list(strategies), config or TournamentConfig(), record_stats,
+                            checkpoint_label=checkpoint_label or job_id)
+        count = len(job.strategies)
+        job.pairings_total = count * (count + 1) // 2 if job.config.symmetric else count * count
+        with self._lock:
+            self._jobs[job.id] = job
+            self._start_workers()
+        self._queue.put(job.id)
+        return job.id
+
+    def resume(self, job_id: str, strategies: List[Strategy]) -> str:
+        """
+        Resubmit a cancelled, failed or interrupted job with its settings and
+        checkpoint label, so that with config.checkpoint set it skips the
+        pairings it finished.
+
+        Args:
+            strategies: Strategies to find the job's participants in, by name
+
+        Returns:
+            str: The ID of the new job
+
+        Raises:
+            ValueError: The job is unknown or cannot be resumed, or one of its
+                strategies is missing
+        """
+        if not _JOB_ID.fullmatch(job_id):
+            raise ValueError(f"{job_id!r} is not a tournament job ID")
+        state = self.get(job_id)
+        if state is None:
+            raise ValueError(f"unknown tournament job {job_id}")
+        if state['status'] not in RESUMABLE:
+            raise ValueError(f"tournament job {job_id} is {state['status']} and cannot be resumed")
+        by_name = {s.name: s for s in strategies}
+        missing = [name for name in state['strategy_names'] if name not in by_name]
+        if missing:
+            raise ValueError(f"strategies of job {job_id} not found: {', '.join(missing)}")
+        return self.submit([by_name[name] for name in state['strategy_names']],
+                           TournamentConfig(**state['config']), state.get('record_stats', True),
+                           checkpoint_label=state.get('checkpoint_label') or job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued job, or stop a running one after its current pairings.
+
+        Returns:
+            bool: False if the job is unknown or already finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job.cancel_event.set()
+            if job.status != QUEUED:
+                return True
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        self._persist(job)
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Current state of a job, falling back to its persisted state (e.g. after a restart)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        return self.load(job_id)
+
+    def jobs(self) -> List[Dict]:
+        """State of every queued or running job of this runner, newest first."""
+        with self._lock:
+            snapshots = [job.to_dict() for job in self._jobs.values()]
+        return sorted(snapshots, key=lambda job: job['submitted_at'], reverse=True)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Block until a job finishes or timeout seconds pass, then return its state."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].status in FINISHED, timeout
+            )
+        return self.get(job_id)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        """
+        Persisted state of a job, if there is one. A job saved while running
+        that no runner (in any process) is running any more is reported as
+        interrupted.
+        """
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(self._job_path(job_id)) as job_file:
+                state = json.load(job_file)
+        except FileNotFoundError:
+            return None
+        if state['status'] not in FINISHED and not self._is_running(job_id):
+            state['status'] = INTERRUPTED
+        return state
+
+    def _is_running(self, job_id: str) -> bool:
+        """Whether a runner holds the job's lock."""
+        with self._lock:
+            if job_id in self._jobs:
+                return True
+        try:
+            lock_file = open(self._job_path(job_id, '.lock'))
+        except FileNotFoundError:
+            return False
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+        return False
+
+    @contextmanager
+    def _running(self, job: TournamentJob):
+        """Hold the job's lock while it runs, for _is_running in other processes."""
+        path = self._job_path(job.id, '.lock')
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            lock_file = open(path, 'a')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except OSError:
+            lock_file = None  # Other processes will take the job for interrupted
+        try:
+            yield
+        finally:
+            if lock_file is not None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                lock_file.close()
+
+    def _job_path(self, job_id: str, suffix: str = '.json') -> str:
+        if not _JOB_ID.fullmatch(job_id):
+            raise ValueError(f"{job_id!r} is not a tournament job ID")
+        return os.path.join(self.path, job_id + suffix)
+
+    def _start_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name='tournament-jobs', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status != QUEUED:  # Cancelled while queued
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+            with self._running(job):
+                self._try_save(job)  # Left behind as an interrupted job if the process dies
+                self._run(job)
+                self._try_save(job)  # Finished before the lock is freed
+            self._persist(job)
+
+    def _run(self, job: TournamentJob):
+        last_saved = time.monotonic()
+
+        def on_pairing(strategy1_name, strategy2_name, averages):
+            nonlocal last_saved
+            with self._lock:
+                job.pairings_done += 1
+                job.last_pairing = [strategy1_name, strategy2_name]
+                orientations = [(strategy1_name, strategy2_name, averages)]
+                if job.config.symmetric and strategy1_name != strategy2_name:
+                    orientations.append((strategy2_name, strategy1_name, mirror_results(averages)))
+                for s1, s2, results in orientations:
+                    job.score_matrix.setdefault(s1, {})[s2] = results['final_score1']
+                    job.coop_matrix.setdefault(s1, {})[s2] = results['cooperation_rate1'] * 100
+            if time.monotonic() - last_saved >= PROGRESS_SAVE_SECONDS:
+                last_saved = time.monotonic()
+                self._try_save(job)
+
+        result = None
+        recorded = 0
+        try:
+            result = run_round_robin(job.strategies, self.game, job.config,
+                                     pairing_callback=on_pairing, cancel_event=job.cancel_event,
+                                     checkpoint_label=job.checkpoint_label)
+            if job.record_stats and self.stats_manager is not None:
+                for (strategy1_name, strategy2_name), summaries in result.games.items():
+                    recorded += self.stats_manager.record_games(strategy1_name, strategy2_name,
+                                                                iter_game_results(summaries))
+                self.stats_manager.flush()
+            status, error = COMPLETED, None
+        except TournamentCancelled:
+            status, error = CANCELLED, None
+        except Exception as e:
+            status, error = FAILED, f"{type(e).__name__}: {e}"
+        if status == COMPLETED:
+            try:
+                # The games are recorded, so resuming must not play (and record) them again
+                result.complete_checkpoint()
+            except Exception as e:
+                error = f"checkpoint not completed: {type(e).__name__}: {e}"
+
+        with self._lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            job.games_recorded = recorded
+            if status == COMPLETED:
+                job.score_matrix = result.score_matrix
+                job.coop_matrix = result.coop_matrix
+                job.sampling = [
+                    dict(info, strategy1=s1, strategy2=s2)
+                    for (s1, s2), info in result.sampling.items()
+                ]
+                job.exact = [[s1, s2] for s1, s2 in result.expected]
+
+    def _persist(self, job: TournamentJob):
+        """
+        Write a finished job's state to its JSON file and drop the job from
+        memory, then wake anyone waiting on it. A job that could not be saved
+        stays in memory, so its state is not lost.
+        """
+        try:
+            self._save(job)
+            saved = True
+        except OSError as e:
+            saved = False
+            with self._lock:
+                job.error = f"results not saved: {e}"
+        with self._lock:
+            if saved:
+                del self._jobs[job.id]
+            self._changed.notify_all()
+
+    def _try_save(self, job: TournamentJob):
+        """_save for a job still held in memory, where this runner serves its state anyway."""
+        try:
+            self._save(job)
+        except OSError:
+            pass
+
+    def _save(self, job: TournamentJob):
+        """Write a job's current state to its JSON file."""
+        with self._lock:
+            snapshot = job.to_dict()
+        path = self._job_path(job.id)
+        os.makedirs(self.path, exist_ok=True)
+        with open(path + '.tmp', 'w') as job_file:
+            json.dump(snapshot, job_file)
+        os.replace(path + '.tmp', path)
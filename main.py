@@ -25,15 +25,32 @@ The application allows users to:
 import streamlit as st
 import pandas as pd
 import random
-from strategies import get_all_strategies, add_custom_strategy, remove_custom_strategy
+import os
+import uuid
+from strategies import get_all_strategies, add_custom_strategy, remove_custom_strategy, CustomStrategy
 from game_logic import PrisonersDilemma
-from visualizations import create_score_plot, create_cooperation_plot, create_historical_performance_plot
-from strategy_stats import StrategyStats
+from visualizations import (
+    create_score_plot,
+    create_cooperation_plot,
+    create_historical_performance_plot,
+    create_tournament_heatmap
+)
+from strategy_stats import StrategyStats, data_version
 from models import init_db
 from strategy_templates import get_all_templates, get_template_by_name
+from tournament import TournamentConfig, run_round_robin, iter_game_results, default_workers
+from jobs import JobRunner, FINISHED, RESUMABLE, COMPLETED, FAILED
+from checkpoint import CheckpointInUse
+import profiling
 
-# Initialize database
-init_db()
+# Seconds before cached historical aggregates are re-read even without a local
+# write, so results recorded by other processes (e.g. cli.py) still show up
+HISTORY_CACHE_TTL = 60
+# Seconds between refreshes of the background jobs panel while a job is active
+JOB_POLL_SECONDS = 1.0
+# Tournaments checkpoint finished pairings here, each run under its own
+# label; an interrupted run or job can be resumed instead of starting over
+TOURNAMENT_CHECKPOINT = os.getenv('TOURNAMENT_CHECKPOINT_PATH', 'tournament_checkpoint.jsonl')
 
 st.set_page_config(
     page_title="Prisoner's Dilemma Simulator",
@@ -41,6 +58,60 @@ st.set_page_config(
     layout="wide"
 )
 
+# Streamlit reruns this script on every interaction; the resources below are
+# created once per server process and shared by all sessions.
+
+@st.cache_resource
+def get_database():
+    """Create any missing tables and indexes, once."""
+    init_db()
+    return True
+
+@st.cache_resource
+def get_interpreter():
+    """
+    The shared strategy interpreter, with the strategy templates interpreted
+    in the background so that using one does not wait on the model.
+    """
+    interpreter = CustomStrategy.interpreter
+    interpreter.prewarm_in_background([t.logic for t in get_all_templates()])
+    return interpreter
+
+@st.cache_resource
+def get_game():
+    return PrisonersDilemma()
+
+@st.cache_resource
+def get_stats_manager():
+    return StrategyStats(write_behind=True)
+
+@st.cache_resource
+def get_job_runner():
+    """Background tournament queue shared by all sessions."""
+    return JobRunner(get_game(), get_stats_manager())
+
+@st.cache_data(ttl=HISTORY_CACHE_TTL, show_spinner=False)
+def _load_pairwise_matrix(_stats_manager, strategy_names, version):
+    return _stats_manager.get_pairwise_matrix(list(strategy_names))
+
+@st.cache_data(ttl=HISTORY_CACHE_TTL, show_spinner=False)
+def _load_average_scores(_stats_manager, version):
+    return _stats_manager.get_average_scores()
+
+def load_pairwise_matrix(stats_manager, strategy_names):
+    """stats_manager.get_pairwise_matrix, cached until the next recorded write."""
+    # Flush first so queued games are part of the version the result is cached under
+    stats_manager.flush()
+    return _load_pairwise_matrix(stats_manager, tuple(strategy_names), data_version())
+
+def load_average_scores(stats_manager):
+    """stats_manager.get_average_scores, cached until the next recorded write."""
+    stats_manager.flush()
+    return _load_average_scores(stats_manager, data_version())
+
+get_database()
+get_interpreter()
+
 def main():
     st.title("🎮 Prisoner's Dilemma Simulator")
 
@@ -101,6 +172,12 @@ def main():
         else:
             st.sidebar.error("Please fill in all fields")
 
+    cache_stats = get_interpreter().cache_stats()
+    st.sidebar.caption(
+        f"Interpretation cache: {cache_stats['size']} entries, "
+        f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+    )
+
     strategies = get_all_strategies()
     
     # Add strategy selection to sidebar
@@ -127,7 +204,89 @@ def main():
     
     strategy_dict = {s.name: type(s) for s in active_strategies}
 
-    stats_manager = StrategyStats()
+    st.sidebar.markdown("## ⚙️ Tournament Settings")
+    tournament_workers = st.sidebar.number_input(
+        "Worker Processes",
+        min_value=1,
+        max_value=max(os.cpu_count() or 1, default_workers()),
+        value=default_workers(),
+        help="Number of processes used to play tournament pairings in parallel"
+    )
+    common_random_numbers = st.sidebar.checkbox(
+        "Common Random Numbers",
+        value=False,
+        help="Play every pairing with the same game lengths and random stream, "
+             "so matrix differences reflect the strategies rather than luck"
+    )
+    exact_memory_one = st.sidebar.checkbox(
+        "Exact Memory-One Payoffs",
+        value=False,
+        help="Compute pairings of memory-one strategies (e.g. Tit for Tat, Random) "
+             "exactly instead of playing games; those pairings add no games to the history"
+    )
+    adaptive_sampling = st.sidebar.checkbox(
+        "Adaptive Sampling",
+        value=False,
+        help="Play each pairing until its average score per round is known to "
+             "a target precision, instead of a fixed 100 games"
+    )
+    ci_half_width = 0.05
+    max_games = 1000
+    if adaptive_sampling:
+        ci_half_width = st.sidebar.number_input(
+            "Target CI Half-Width (points per round)",
+            min_value=0.001,
+            max_value=1.0,
+            value=0.05,
+            step=0.01,
+            format="%.3f",
+            help="Stop a pairing once the 95% confidence interval of both players' "
+                 "score per round is this narrow"
+        )
+        max_games = st.sidebar.number_input(
+            "Max Games per Pairing",
+            min_value=20,
+            max_value=100000,
+            value=1000,
+            step=100
+        )
+    profile_tournament = st.sidebar.checkbox(
+        "Profile Tournament",
+        value=False,
+        help="Time each phase of the tournament and show a report"
+    )
+    run_in_background = st.sidebar.checkbox(
+        "Run in Background",
+        value=False,
+        help="Queue tournaments as background jobs: the page stays usable, "
+             "progress updates below, and jobs can be cancelled"
+    )
+    resume_job_id = st.sidebar.text_input(
+        "Resume Background Job",
+        placeholder="Job ID",
+        help="Continue a cancelled, failed or interrupted background tournament "
+             "from the pairings it finished"
+    ).strip()
+    if resume_job_id and st.sidebar.button("Resume Job"):
+        try:
+            job_id = get_job_runner().resume(resume_job_id, strategies)
+        except ValueError as e:
+            st.sidebar.error(f"Cannot resume job {resume_job_id}: {e}")
+        else:
+            st.session_state.setdefault('job_ids', []).append(job_id)
+            st.sidebar.success(f"Resumed as job {job_id}")
+    tournament_config = TournamentConfig(
+        num_games=100,
+        workers=tournament_workers,
+        common_random_numbers=common_random_numbers,
+        exact_memory_one=exact_memory_one,
+        adaptive=adaptive_sampling,
+        ci_half_width=ci_half_width,
+        max_games=int(max_games),
+        checkpoint=TOURNAMENT_CHECKPOINT
+    )
+
+    stats_manager = get_stats_manager()
 
     st.subheader("Select Your Strategy")
     selected_strategy = st.selectbox(
@@ -154,7 +313,14 @@ def main():
             st.success("Historical data cleared successfully!")
             st.rerun()
 
-    game = PrisonersDilemma()
+    # The last foreground tournament of this session, until it completes
+    unfinished_run = st.session_state.get('unfinished_run')
+    resume_run = unfinished_run is not None and st.button(
+        "Resume Interrupted Tournament",
+        help="Continue the last tournament of this session from its finished pairings"
+    )
+
+    game = get_game()
 
     if single_game:
         player_strategy = strategy_dict[selected_strategy]()
@@ -173,6 +339,7 @@ def main():
             results['cooperation_rate2']
         )
         stats_manager.record_game(results, selected_strategy, opponent.name)
+        stats_manager.flush()
         st.subheader("Opponent's Strategy")
         st.info(f"You played against: {opponent.name}\n\n{opponent.description}")
         col1, col2, col3, col4 = st.columns(4)
@@ -222,20 +389,46 @@ def main():
 
         st.table(analysis_df)
 
-    elif multi_game:
+    elif multi_game and run_in_background:
+        job_id = get_job_runner().submit(active_strategies, tournament_config)
+        st.session_state.setdefault('job_ids', []).append(job_id)
+        st.success(f"Queued tournament job {job_id}")
+    elif multi_game or resume_run:
+        if resume_run:
+            by_name = {s.name: s for s in strategies}
+            tournament_strategies = [by_name[name] for name in unfinished_run['strategy_names']
+                                     if name in by_name]
+            tournament_config = unfinished_run['config']
+            label = unfinished_run['label']
+        else:
+            tournament_strategies = active_strategies
+            label = uuid.uuid4().hex
+            st.session_state.unfinished_run = {
+                'label': label,
+                'strategy_names': [s.name for s in active_strategies],
+                'config': tournament_config
+            }
         st.subheader("Running Multiple Games")
-        avg_scores = run_tournament(
-            selected_strategy,
-            strategy_dict,
-            active_strategies,
-            game,
-            stats_manager
-        )
-        st.subheader("Updated Historical Performance")
-        st.plotly_chart(
-            create_historical_performance_plot(avg_scores),
-            use_container_width=True
-        )
+        try:
+            avg_scores = run_tournament(
+                selected_strategy,
+                strategy_dict,
+                tournament_strategies,
+                game,
+                stats_manager,
+                config=tournament_config,
+                profile=profile_tournament,
+                checkpoint_label=label
+            )
+        except CheckpointInUse:
+            st.warning("This tournament is still running in another tab; wait for it to finish")
+        else:
+            st.session_state.pop('unfinished_run', None)
+            st.subheader("Updated Historical Performance")
+            st.plotly_chart(
+                create_historical_performance_plot(avg_scores),
+                use_container_width=True
+            )
     elif show_stats:
         st.subheader("Historical Tournament Results")
         
@@ -243,7 +436,7 @@ def main():
         fig_tournament = create_tournament_plots(active_strategies, stats_manager)
         st.plotly_chart(fig_tournament, use_container_width=True)
         
-        avg_scores = stats_manager.get_average_scores()
+        avg_scores = load_average_scores(stats_manager)
         if avg_scores:  # Only show if there are recorded scores
             st.subheader("Average Strategy Performance")
             fig_performance = create_historical_performance_plot(avg_scores)
@@ -251,130 +444,168 @@ def main():
         else:
             st.info("No historical performance data available yet. Run some games to see statistics!")
 
-def run_tournament(selected_strategy, strategy_dict, strategies, game, stats_manager):
+    if st.session_state.get('job_ids'):
+        runner = get_job_runner()
+        active = any((runner.get(job_id) or {}).get('status') not in FINISHED
+                     for job_id in st.session_state.job_ids)
+        # Poll only while something can still change
+        st.fragment(show_background_jobs, run_every=JOB_POLL_SECONDS if active else None)(runner)
+
+def show_background_jobs(runner):
+    """Progress, partial matrices and controls for this session's background jobs."""
+    st.subheader("Background Tournaments")
+    for job_id in reversed(st.session_state.job_ids):
+        job = runner.get(job_id)
+        if job is None:
+            continue
+        with st.container(border=True):
+            st.markdown(f"**Job {job_id}**: {len(job['strategy_names'])} strategies, {job['status']}")
+            if job['status'] not in FINISHED:
+                done, total = job['pairings_done'], job['pairings_total']
+                last = f" (last: {' vs '.join(job['last_pairing'])})" if job['last_pairing'] else ""
+                st.progress(done / total if total else 0.0, text=f"{done}/{total} pairings{last}")
+                if st.button("Cancel", key=f"cancel_{job_id}"):
+                    runner.cancel(job_id)
+            elif job['status'] == FAILED:
+                st.error(f"Tournament failed: {job['error']}")
+            elif job['status'] == COMPLETED:
+                st.caption(f"Recorded {job['games_recorded']} games")
+            if job['status'] in RESUMABLE and st.button("Resume", key=f"resume_{job_id}"):
+                try:
+                    resumed_id = runner.resume(job_id, get_all_strategies())
+                except ValueError as e:
+                    st.error(f"Cannot resume job {job_id}: {e}")
+                else:
+                    st.session_state.job_ids.append(resumed_id)
+                    st.rerun()
+
+            if job['score_matrix'] and job['status'] != FAILED:
+                names = job['strategy_names']
+                # Pairings that have not finished yet show as 0
+                score_matrix = {s1: {s2: job['score_matrix'].get(s1, {}).get(s2, 0) for s2 in names}
+                                for s1 in names}
+                coop_matrix = {s1: {s2: job['coop_matrix'].get(s1, {}).get(s2, 0) for s2 in names}
+                               for s1 in names}
+                st.plotly_chart(
+                    create_tournament_heatmap(names, score_matrix, coop_matrix,
+                                              'Strategy Performance Matrix'),
+                    use_container_width=True,
+                    key=f"job_heatmap_{job_id}"
+                )
+            if job['status'] == COMPLETED:
+                show_sampling_table(
+                    job['strategy_names'],
+                    {(pairing['strategy1'], pairing['strategy2']): pairing for pairing in job['sampling']},
+                    job.get('exact', []),
+                    TournamentConfig(**job['config'])
+                )
+
+def run_tournament(selected_strategy, strategy_dict, strategies, game, stats_manager, config=None,
+                   profile=False, checkpoint_label=''):
     """
-    Runs a tournament of 100 games between all possible combinations of strategies.
+    Runs a tournament between all possible combinations of strategies: 100 games
+    per pairing, or as many as adaptive sampling needs.
+
+    `config` (a TournamentConfig) sets the worker processes, seeding, exact
+    memory-one evaluation and adaptive sampling; the resulting matrices are
+    the same for serial and parallel runs. Pairings computed exactly are not
+    recorded. With `profile` set, per-phase timings are collected and shown
+    below the results. `checkpoint_label` names the run in config.checkpoint;
+    reusing the label of an interrupted run resumes it.
     """
     progress_bar = st.progress(0)
     status_text = st.empty()
-    
-    # Initialize performance matrices
-    strategy_names = [s.name for s in strategies]
-    score_matrix = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
-    coop_matrix = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
-    
-    total_combinations = len(strategies) * len(strategies)
-    games_completed = 0
-    
-    # Run games between all possible strategy combinations
-    for strategy1 in strategies:
-        for strategy2 in strategies:
-            status_text.text(f"Playing: {strategy1.name} vs {strategy2.name}...")
-            
-            total_score1 = 0
-            total_score2 = 0
-            total_coop1 = 0
-            num_games = 100
-            
-            for game_num in range(num_games):
-                if game_num % 10 == 0:
-                    status_text.text(
-                        f"Playing {strategy1.name} vs {strategy2.name} - Game {game_num + 1}/{num_games}"
-                    )
-                
-                player1 = type(strategy1)()
-                player2 = type(strategy2)()
-                results = game.run_tournament(player1, player2)
-                
-                total_score1 += results['final_score1']
-                total_score2 += results['final_score2']
-                total_coop1 += results['cooperation_rate1']
-                
-                stats_manager.update_stats(
-                    strategy1.name, 
-                    results['final_score1'], 
-                    results['total_rounds'],
-                    results['cooperation_rate1']
-                )
-                stats_manager.update_stats(
-                    strategy2.name, 
-                    results['final_score2'], 
-                    results['total_rounds'],
-                    results['cooperation_rate2']
-                )
-                stats_manager.record_game(results, strategy1.name, strategy2.name)
-            
-            # Store average scores and cooperation rates in matrices
-            score_matrix[strategy1.name][strategy2.name] = total_score1 / num_games
-            coop_matrix[strategy1.name][strategy2.name] = (total_coop1 / num_games) * 100
-            
-            games_completed += 1
-            progress_bar.progress(games_completed / total_combinations)
-
-    status_text.text("Tournament completed! All strategy combinations tested.")
-    
-    # Create heatmaps using plotly
-    import plotly.graph_objects as go
-    from plotly.subplots import make_subplots
-    import numpy as np
-    
-    score_data = np.array([[score_matrix[s1][s2] for s2 in strategy_names] for s1 in strategy_names])
-    coop_data = np.array([[coop_matrix[s1][s2] for s2 in strategy_names] for s1 in strategy_names])
-    
-    fig = make_subplots(
-        rows=1, cols=2,
-        subplot_titles=('Average Scores', 'Cooperation Rates (%)'),
-        horizontal_spacing=0.15
-    )
-    
-    # Add score heatmap
-    fig.add_trace(
-        go.Heatmap(
-            z=score_data,
-            x=strategy_names,
-            y=strategy_names,
-            hoverongaps=False,
-            text=np.round(score_data, 1),
-            texttemplate='%{text}',
-            textfont={"size": 10},
-            colorscale='RdYlGn',
-            colorbar=dict(title='Score', x=0.45),
-            name='Scores'
-        ),
-        row=1, col=1
-    )
-    
-    # Add cooperation rate heatmap
-    fig.add_trace(
-        go.Heatmap(
-            z=coop_data,
-            x=strategy_names,
-            y=strategy_names,
-            hoverongaps=False,
-            text=np.round(coop_data, 1),
-            texttemplate='%{text}%',
-            textfont={"size": 10},
-            colorscale='Blues',
-            colorbar=dict(title='Cooperation %', x=1.0),
-            name='Cooperation'
-        ),
-        row=1, col=2
+
+    def on_pairing_done(done, total, strategy1_name, strategy2_name):
+        status_text.text(f"Finished: {strategy1_name} vs {strategy2_name} ({done}/{total})")
+        progress_bar.progress(done / total)
+
+    with profiling.profile_tournament(profile) as profiler:
+        # Run games between all possible strategy combinations
+        tournament = run_round_robin(
+            strategies,
+            game,
+            config or TournamentConfig(num_games=100),
+            progress_callback=on_pairing_done,
+            checkpoint_label=checkpoint_label
+        )
+
+        status_text.text("Recording results...")
+        for (strategy1_name, strategy2_name), summaries in tournament.games.items():
+            stats_manager.record_games(strategy1_name, strategy2_name, iter_game_results(summaries))
+        stats_manager.flush()
+        tournament.complete_checkpoint()
+
+        status_text.text("Tournament completed! All strategy combinations tested.")
+        write_stats = stats_manager.write_behind_stats()
+        st.caption(
+            f"Saved {write_stats['games_flushed']} games in {write_stats['flushes']} batches "
+            f"(avg flush {write_stats['avg_flush_ms']:.1f} ms, max {write_stats['max_flush_ms']:.1f} ms, "
+            f"{write_stats['queue_depth']} queued)"
+        )
+        if tournament.resumed:
+            st.caption(f"Resumed {tournament.resumed} finished pairings from an interrupted run")
+        if tournament.expected:
+            st.caption(
+                f"{len(tournament.expected)} of {len(tournament.strategy_names) ** 2} pairings "
+                "computed exactly as memory-one Markov chains (not added to the history)"
+            )
+
+        with profiling.phase('plots'):
+            fig = create_tournament_heatmap(
+                tournament.strategy_names,
+                tournament.score_matrix,
+                tournament.coop_matrix,
+                'Strategy Performance Matrix'
+            )
+        st.plotly_chart(fig, use_container_width=True)
+        show_sampling_table(tournament.strategy_names, tournament.sampling, tournament.expected, config)
+
+    if profiler:
+        show_profile_report(profiler)
+
+    return load_average_scores(stats_manager)
+
+def show_sampling_table(names, sampling, exact, config=None):
+    """
+    Displays the games played per pairing and the confidence interval they achieved.
+
+    `sampling` maps (strategy1, strategy2) to its games and ci_half_width, as
+    TournamentResult.sampling does; `exact` holds the pairings evaluated exactly.
+    """
+    config = config or TournamentConfig()
+    cells = {s1: {s2: "" for s2 in names} for s1 in names}
+    for (s1, s2), pairing in sampling.items():
+        cells[s1][s2] = f"{pairing['games']} games, ±{pairing['ci_half_width']:.3f}"
+    for s1, s2 in exact:
+        cells[s1][s2] = "exact"
+    st.caption(
+        f"Games played per pairing and {config.confidence:.0%} confidence-interval "
+        "half-width of the row strategy's score per round"
     )
-    
-    fig.update_layout(
-        title='Strategy Performance Matrix',
-        width=1200,
-        height=600,
+    st.dataframe(pd.DataFrame(cells).T.loc[names, names], use_container_width=True)
+
+def show_profile_report(profiler):
+    """Displays a tournament profile: throughput metrics, per-phase table and JSON download."""
+    report = profiler.report()
+    st.subheader("Tournament Profile")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Wall Time", f"{report['wall_time_s']:.2f} s")
+    with col2:
+        st.metric("Games", report['games'])
+    with col3:
+        st.metric("Games / sec", f"{report['games_per_sec']:,.0f}")
+
+    phases_df = pd.DataFrame.from_dict(report['phases'], orient='index')
+    phases_df.index.name = 'Phase'
+    st.dataframe(phases_df.round(4), use_container_width=True)
+    st.download_button(
+        "Download Profile (JSON)",
+        data=profiler.to_json(),
+        file_name="tournament_profile.json",
+        mime="application/json"
     )
-    
-    # Update axes for both subplots
-    for i in [1, 2]:
-        fig.update_xaxes(title='Opponent Strategy', side='bottom', tickangle=45, row=1, col=i)
-        fig.update_yaxes(title='Player Strategy' if i == 1 else None, row=1, col=i)
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    return stats_manager.get_average_scores()
 
 def create_tournament_plots(strategies, stats_manager):
     """
@@ -385,90 +616,21 @@ def create_tournament_plots(strategies, stats_manager):
         stats_manager: StrategyStats instance containing historical game data
     """
     strategy_names = [s.name for s in strategies]
-    score_matrix = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
-    coop_matrix = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
-    
-    # Get existing data from stats_manager
-    stats = stats_manager.get_all_games()
-    game_counts = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
-    
-    # Aggregate existing data
-    for game in stats:
-        player1 = game['player1']
-        player2 = game['player2']
-        if player1 in strategy_names and player2 in strategy_names:
-            score_matrix[player1][player2] += game['score1']
-            coop_matrix[player1][player2] += game['cooperation_rate1'] * 100
-            game_counts[player1][player2] += 1
-    
-    # Calculate averages
-    for s1 in strategy_names:
-        for s2 in strategy_names:
-            count = game_counts[s1][s2]
-            if count > 0:
-                score_matrix[s1][s2] /= count
-                coop_matrix[s1][s2] /= count
-    
-    # Create visualization
-    import plotly.graph_objects as go
-    from plotly.subplots import make_subplots
-    import numpy as np
-    
-    score_data = np.array([[score_matrix[s1][s2] for s2 in strategy_names] for s1 in strategy_names])
-    coop_data = np.array([[coop_matrix[s1][s2] for s2 in strategy_names] for s1 in strategy_names])
-    
-    fig = make_subplots(
-        rows=1, cols=2,
-        subplot_titles=('Average Scores', 'Cooperation Rates (%)'),
-        horizontal_spacing=0.15
-    )
-    
-    # Add score heatmap
-    fig.add_trace(
-        go.Heatmap(
-            z=score_data,
-            x=strategy_names,
-            y=strategy_names,
-            hoverongaps=False,
-            text=np.round(score_data, 1),
-            texttemplate='%{text}',
-            textfont={"size": 10},
-            colorscale='RdYlGn',
-            colorbar=dict(title='Score', x=0.45),
-            name='Scores'
-        ),
-        row=1, col=1
-    )
-    
-    # Add cooperation rate heatmap
-    fig.add_trace(
-        go.Heatmap(
-            z=coop_data,
-            x=strategy_names,
-            y=strategy_names,
-            hoverongaps=False,
-            text=np.round(coop_data, 1),
-            texttemplate='%{text}%',
-            textfont={"size": 10},
-            colorscale='Blues',
-            colorbar=dict(title='Cooperation %', x=1.0),
-            name='Cooperation'
-        ),
-        row=1, col=2
-    )
+
+    # Aggregate existing data per pairing in the database
+    matrices = load_pairwise_matrix(stats_manager, strategy_names)
+    score_matrix = matrices['score']
+    coop_matrix = {
+        s1: {s2: rate * 100 for s2, rate in row.items()}
+        for s1, row in matrices['cooperation'].items()
+    }
     
-    fig.update_layout(
-        title='Historical Strategy Performance Matrix',
-        width=1200,
-        height=600,
+    return create_tournament_heatmap(
+        strategy_names,
+        score_matrix,
+        coop_matrix,
+        'Historical Strategy Performance Matrix'
     )
-    
-    # Update axes for both subplots
-    for i in [1, 2]:
-        fig.update_xaxes(title='Opponent Strategy', side='bottom', tickangle=45, row=1, col=i)
-        fig.update_yaxes(title='Player Strategy' if i == 1 else None, row=1, col=i)
-    
-    return fig
 
 if __name__ == "__main__":
     if 'custom_name' not in st.session_state:
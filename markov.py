@@ -0,0 +1,110 @@
+"""
+markov.py
+
+This module computes exact expected game outcomes for pairs of memory-one
+strategies, without simulating any games.
+
+A memory-one strategy cooperates in the first round with a fixed probability,
+and afterwards with a probability that depends only on the previous round's
+outcome (its own move and the opponent's). Two such strategies form a Markov
+chain over the four joint states CC, CD, DC and DD. Propagating the state
+distribution round by round gives the expected payoff and cooperation
+probability of every round. Those are then weighted by the game-length
+distribution the simulator uses: geometric with END_PROBABILITY, capped at
+MAX_ITERATIONS.
+
+Results match the mean of infinitely many simulated games: final scores
+are expected totals, and cooperation rates are the expected per-game rate
+(cooperations / rounds), as StrategyStats and the tournament matrices
+average them.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Joint states as (row move, column move), True for cooperate
+STATES = ((True, True), (True, False), (False, True), (False, False))
+# Index of each state as seen from the column player's side
+_SWAPPED = [STATES.index((column, row)) for row, column in STATES]
+
+
+@dataclass(frozen=True)
+class MemoryOne:
+    first: float  # Probability of cooperating in the first round
+    # Probability of cooperating after each (own move, opponent move) outcome,
+    # in STATES order: CC, CD, DC, DD
+    after: Tuple[float, float, float, float]
+
+    def __post_init__(self):
+        if len(self.after) != len(STATES):
+            raise ValueError("a memory-one strategy needs one probability per joint state")
+        if not all(0.0 <= p <= 1.0 for p in (self.first, *self.after)):
+            raise ValueError("memory-one probabilities must lie in [0, 1]")
+
+
+def _moves_distribution(p1: float, p2: float) -> np.ndarray:
+    """Joint state distribution of one round for independent cooperation probabilities."""
+    return np.outer([p1, 1.0 - p1], [p2, 1.0 - p2]).ravel()
+
+
+def transition_matrix(strategy1: MemoryOne, strategy2: MemoryOne) -> np.ndarray:
+    """4x4 matrix of P(next joint state | current joint state), rows in STATES order."""
+    after2 = np.asarray(strategy2.after)[_SWAPPED]
+    return np.array([
+        _moves_distribution(p1, p2) for p1, p2 in zip(strategy1.after, after2)
+    ])
+
+
+def length_distribution(end_probability: float, max_rounds: int) -> np.ndarray:
+    """P(game lasts exactly n rounds) for n = 1..max_rounds, as the simulator samples it."""
+    survival = (1.0 - end_probability) ** np.arange(max_rounds)
+    probabilities = survival * end_probability
+    probabilities[-1] = survival[-1]  # Games reaching the cap stop there
+    return probabilities
+
+
+def expected_game(game, strategy1: MemoryOne, strategy2: MemoryOne) -> Dict[str, float]:
+    """
+    Expected outcome of one game between two memory-one strategies.
+
+    Args:
+        game: PrisonersDilemma supplying the payoff matrix, END_PROBABILITY
+            and MAX_ITERATIONS
+        strategy1: Row player's description
+        strategy2: Column player's description
+
+    Returns:
+        Dict: Expected final_score1/final_score2, cooperation_rate1/
+            cooperation_rate2 and total_rounds, keyed like a game result
+    """
+    max_rounds = game.MAX_ITERATIONS
+    transitions = transition_matrix(strategy1, strategy2)
+
+    # Joint state distribution of every round
+    distributions = np.empty((max_rounds, len(STATES)))
+    distributions[0] = _moves_distribution(strategy1.first, strategy2.first)
+    for round_index in range(1, max_rounds):
+        distributions[round_index] = distributions[round_index - 1] @ transitions
+
+    payoffs1 = np.array([game.payoff_matrix[state][0] for state in STATES], dtype=float)
+    payoffs2 = np.array([game.payoff_matrix[state][1] for state in STATES], dtype=float)
+    cooperates1 = np.array([row for row, _ in STATES], dtype=float)
+    cooperates2 = np.array([column for _, column in STATES], dtype=float)
+
+    # Expected totals after n rounds, n = 1..max_rounds
+    score1 = np.cumsum(distributions @ payoffs1)
+    score2 = np.cumsum(distributions @ payoffs2)
+    cooperation1 = np.cumsum(distributions @ cooperates1)
+    cooperation2 = np.cumsum(distributions @ cooperates2)
+
+    lengths = np.arange(1, max_rounds + 1)
+    weights = length_distribution(game.END_PROBABILITY, max_rounds)
+    return {
+        'final_score1': float(weights @ score1),
+        'final_score2': float(weights @ score2),
+        'cooperation_rate1': float(weights @ (cooperation1 / lengths)),
+        'cooperation_rate2': float(weights @ (cooperation2 / lengths)),
+        'total_rounds': float(weights @ lengths)
+    }
@@ -0,0 +1,63 @@
+"""
+matchup_cache.py
+
+This module provides a size-bounded cache of per-pairing results, so
+deterministic pairings are only simulated once across tournaments.
+
+Key features:
+- Keys built from strategy fingerprints, the game-length cap and the payoff
+  matrix, so renamed or re-created strategies with the same behaviour share
+  entries
+- Least-recently-used eviction beyond a maximum entry count, hit/miss
+  counters and optional SQLite backing that survives restarts and is
+  shared between tournament worker processes (see sqlite_cache.SQLiteLRUCache)
+- Safe to use in forked tournament workers, which open their own
+  connection rather than sharing the parent's
+
+Entries are JSON-serializable dicts (see GameCycle.to_dict). The cache is
+in-memory only unless a path is given or MATCHUP_CACHE_PATH is set.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+from sqlite_cache import SQLiteLRUCache
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def matchup_key(fingerprint1: str, fingerprint2: str, max_rounds: int,
+                payoff_matrix: Dict) -> str:
+    """
+    Cache key of one ordered pairing under a set of game rules.
+
+    Args:
+        fingerprint1: Strategy.fingerprint of the row strategy
+        fingerprint2: Strategy.fingerprint of the column strategy
+        max_rounds: Game-length cap the cached result covers
+        payoff_matrix: PrisonersDilemma.payoff_matrix
+    """
+    payoffs = sorted((list(choices), list(payoff)) for choices, payoff in payoff_matrix.items())
+    return json.dumps([fingerprint1, fingerprint2, max_rounds, payoffs])
+
+
+class MatchupCache(SQLiteLRUCache):
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Entries kept before least-recently-used ones are evicted
+            path: Optional SQLite file to back the cache with
+        """
+        super().__init__('matchups', path, max_entries)
+
+
+_default_cache: Optional[MatchupCache] = None
+
+
+def default_cache() -> MatchupCache:
+    """Process-wide cache, backed by MATCHUP_CACHE_PATH when that is set."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MatchupCache(path=os.getenv('MATCHUP_CACHE_PATH'))
+    return _default_cache
@@ -7,11 +7,23 @@
 # Dependencies:
 # - SQLAlchemy: For ORM and database management.
 # - other necessary modules for database configuration.
+#
+# Connection settings come from the environment:
+# - DATABASE_URL: SQLAlchemy URL (default sqlite:///game_data.db)
+# - DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE: connection
+#   pool sizing for server databases such as Postgres
+# - SQLITE_BUSY_TIMEOUT_MS: how long a SQLite writer waits for a lock
+#
+# SQLite connections run in WAL mode with synchronous=NORMAL, so history can be
+# read while a tournament is writing.
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import create_engine, event, insert, select, Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship
+from sqlalchemy import func
 import os
+import threading
 from datetime import datetime
 from contextlib import contextmanager
 
@@ -30,6 +42,11 @@ class Game(Base):
     cooperation_rate2 = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    # Serves the per-pairing GROUP BY behind the historical tournament matrix
+    __table_args__ = (
+        Index('ix_games_strategy_pair', 'strategy1_name', 'strategy2_name'),
+    )
+
 class StrategyPerformance(Base):
     __tablename__ = 'strategy_performance'
     
@@ -41,29 +58,185 @@ class StrategyPerformance(Base):
     avg_cooperation_rate = Column(Float, default=0.0)
     last_updated = Column(DateTime, default=datetime.utcnow)
 
+    # One row per strategy; also the conflict target of the stats upsert
+    __table_args__ = (
+        Index('uq_strategy_performance_name', 'strategy_name', unique=True),
+    )
+
+class MatchupSummary(Base):
+    """
+    Running totals of every game recorded for one (strategy1, strategy2) pairing.
+
+    Kept up to date in the same transaction as the games it summarizes, so
+    historical matrices and averages read N² rows instead of every game.
+    Sums of squares allow variances to be derived from the totals.
+    """
+    __tablename__ = 'matchup_summary'
+
+    id = Column(Integer, primary_key=True)
+    strategy1_name = Column(String, nullable=False)
+    strategy2_name = Column(String, nullable=False)
+    game_count = Column(Integer, nullable=False, default=0)
+    round_count = Column(Integer, nullable=False, default=0)
+    score1_sum = Column(Float, nullable=False, default=0.0)
+    score1_sq_sum = Column(Float, nullable=False, default=0.0)
+    score2_sum = Column(Float, nullable=False, default=0.0)
+    score2_sq_sum = Column(Float, nullable=False, default=0.0)
+    # Scores normalized to 100 rounds, as used by StrategyPerformance
+    normalized_score1_sum = Column(Float, nullable=False, default=0.0)
+    normalized_score2_sum = Column(Float, nullable=False, default=0.0)
+    cooperation1_sum = Column(Float, nullable=False, default=0.0)
+    cooperation1_sq_sum = Column(Float, nullable=False, default=0.0)
+    cooperation2_sum = Column(Float, nullable=False, default=0.0)
+    cooperation2_sq_sum = Column(Float, nullable=False, default=0.0)
+    last_updated = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('strategy1_name', 'strategy2_name', name='uq_matchup_summary_pair'),
+    )
+
 # Database connection
-engine = create_engine(os.getenv('DATABASE_URL', 'sqlite:///game_data.db'))
-SessionLocal = sessionmaker(bind=engine)
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///game_data.db')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+def _engine_options(url):
+    """create_engine keyword arguments for the configured database."""
+    if url.get_backend_name() == 'sqlite':
+        # Sessions move between Streamlit script threads; SQLite itself serializes writers
+        return {'connect_args': {'check_same_thread': False,
+                                 'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True
+    }
+
+engine = create_engine(DATABASE_URL, **_engine_options(make_url(DATABASE_URL)))
+
+@event.listens_for(engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if engine.dialect.name != 'sqlite':
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a writer holds the lock (in-memory databases ignore it)
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+# Forked children (tournament workers) must not reuse the parent's pooled connections
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+# Loaded rows stay readable after their unit of work has committed and closed
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+# One session per thread, handed out by db_session()
+Session = scoped_session(SessionLocal)
+_scope = threading.local()
 
 def init_db():
     Base.metadata.create_all(engine)
+    # create_all skips existing tables, so add indexes introduced since they were created
+    for index in Game.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    _merge_duplicate_performance()
+    for index in StrategyPerformance.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    # Databases from before matchup_summary existed get it filled from their games
+    with db_session() as session:
+        if (session.query(MatchupSummary.id).first() is None
+                and session.query(Game.id).first() is not None):
+            rebuild_matchup_summary(session)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def rebuild_matchup_summary(session):
+    """
+    Replace matchup_summary with totals aggregated from the games table,
+    in session's current transaction, in one INSERT ... SELECT pass.
+    """
+    normalized1 = Game.score1 / Game.total_rounds * 100
+    normalized2 = Game.score2 / Game.total_rounds * 100
+    aggregate = select(
+        Game.strategy1_name,
+        Game.strategy2_name,
+        func.count(),
+        func.sum(Game.total_rounds),
+        func.sum(Game.score1),
+        func.sum(Game.score1 * Game.score1),
+        func.sum(Game.score2),
+        func.sum(Game.score2 * Game.score2),
+        func.sum(normalized1),
+        func.sum(normalized2),
+        func.sum(Game.cooperation_rate1),
+        func.sum(Game.cooperation_rate1 * Game.cooperation_rate1),
+        func.sum(Game.cooperation_rate2),
+        func.sum(Game.cooperation_rate2 * Game.cooperation_rate2),
+        func.max(Game.timestamp)
+    ).group_by(Game.strategy1_name, Game.strategy2_name)
+    columns = [
+        'strategy1_name', 'strategy2_name', 'game_count', 'round_count',
+        'score1_sum', 'score1_sq_sum', 'score2_sum', 'score2_sq_sum',
+        'normalized_score1_sum', 'normalized_score2_sum',
+        'cooperation1_sum', 'cooperation1_sq_sum', 'cooperation2_sum', 'cooperation2_sq_sum',
+        'last_updated'
+    ]
+    session.query(MatchupSummary).delete()
+    session.execute(insert(MatchupSummary).from_select(columns, aggregate))
+
+def _merge_duplicate_performance():
+    """
+    Fold duplicate strategy_performance rows (possible before strategy_name
+    was unique) into one row per strategy, so the unique index can be built.
+    """
+    with db_session() as session:
+        duplicates = (
+            session.query(StrategyPerformance.strategy_name)
+            .group_by(StrategyPerformance.strategy_name)
+            .having(func.count() > 1)
+            .all()
+        )
+        for (strategy_name,) in duplicates:
+            rows = (
+                session.query(StrategyPerformance)
+                .filter(StrategyPerformance.strategy_name == strategy_name)
+                .order_by(StrategyPerformance.id)
+                .all()
+            )
+            kept = rows[0]
+            total_games = sum(row.total_games or 0 for row in rows)
+            total_score = sum(row.total_score or 0.0 for row in rows)
+            cooperation_total = sum((row.avg_cooperation_rate or 0.0) * (row.total_games or 0)
+                                    for row in rows)
+            kept.total_games = total_games
+            kept.total_score = total_score
+            kept.avg_score_per_round = total_score / total_games if total_games else 0.0
+            kept.avg_cooperation_rate = cooperation_total / total_games if total_games else 0.0
+            kept.last_updated = max(row.last_updated or datetime.min for row in rows)
+            for row in rows[1:]:
+                session.delete(row)
 
 @contextmanager
 def db_session():
-    """Provide a transactional scope around a series of operations."""
-    session = SessionLocal()
+    """
+    Provide a transactional scope around a series of operations.
+
+    Each thread gets its own session. A db_session() opened inside another
+    in the same thread joins the outer session, so the unit of work commits
+    (or rolls back) once, when the outermost scope exits.
+    """
+    depth = getattr(_scope, 'depth', 0)
+    session = Session()
+    _scope.depth = depth + 1
     try:
         yield session
-        session.commit()
+        if depth == 0:
+            session.commit()
     except:
-        session.rollback()
+        if depth == 0:
+            session.rollback()
         raise
     finally:
-        session.close()
+        _scope.depth = depth
+        if depth == 0:
+            Session.remove()
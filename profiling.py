@@ -0,0 +1,198 @@
+"""
+profiling.py
+
+This module provides opt-in instrumentation for finding where tournament time
+goes: strategy moves, round play, batch simulation, statistics writes and
+figure building.
+
+Key features:
+- Per-phase call counts, total time and p50/p99 latencies
+- Counters (e.g. games played) and games/sec throughput
+- A report that can be shown in the UI or dumped as JSON
+- Near-zero cost when disabled: hot loops call `active()` once and only
+  time themselves when a profiler is active
+- The active profiler is held in a context variable, so profiled runs on
+  other threads (Streamlit sessions, background jobs) neither see nor
+  replace it
+
+Usage:
+    with profile_tournament() as profiler:
+        ...
+    profiler.report()
+
+Code that runs once per game or less can use `with phase("name"):` or the
+@timed("name") decorator; per-round code should read `profiling.active()` once
+and time itself only if it is set.
+"""
+
+import functools
+import json
+import random
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+# Profiler collecting samples in the current context, or None when profiling is off
+_current: ContextVar[Optional['Profiler']] = ContextVar('profiler', default=None)
+
+_NULL_PHASE = nullcontext()
+
+
+class Profiler:
+    def __init__(self, max_samples: int = 100000):
+        """
+        Args:
+            max_samples: Latency samples kept per phase for percentiles; call
+                counts and totals stay exact beyond this (reservoir sampling)
+        """
+        self.max_samples = max_samples
+        self.started = time.perf_counter()
+        self.finished = None
+        self.calls: Dict[str, int] = {}
+        self.totals: Dict[str, float] = {}
+        self.samples: Dict[str, array] = {}
+        self.counters: Dict[str, int] = {}
+        self._rng = random.Random(0)
+
+    def record(self, name: str, seconds: float):
+        """Add one timed call of a phase."""
+        calls = self.calls.get(name, 0) + 1
+        self.calls[name] = calls
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = array('d')
+        if len(samples) < self.max_samples:
+            samples.append(seconds)
+        else:
+            slot = self._rng.randrange(calls)
+            if slot < self.max_samples:
+                samples[slot] = seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one call of a phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def snapshot(self) -> Dict:
+        """Picklable copy of the collected data, for sending back from workers."""
+        return {
+            'calls': dict(self.calls),
+            'totals': dict(self.totals),
+            'samples': {name: samples for name, samples in self.samples.items()},
+            'counters': dict(self.counters)
+        }
+
+    def merge(self, snapshot: Dict):
+        """Add data collected by another profiler (e.g. in a worker process)."""
+        for name, calls in snapshot['calls'].items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+            self.totals[name] = self.totals.get(name, 0.0) + snapshot['totals'][name]
+            samples = self.samples.setdefault(name, array('d'))
+            room = max(self.max_samples - len(samples), 0)
+            samples.extend(snapshot['samples'][name][:room])
+        for name, amount in snapshot['counters'].items():
+            self.count(name, amount)
+
+    def report(self) -> Dict:
+        """
+        Summarize the collected data.
+
+        Returns:
+            Dict: wall_time_s, games, games_per_sec, counters, and per phase:
+                calls, total_s, share (of wall time), mean_ms, p50_ms, p99_ms
+        """
+        wall_time = (self.finished or time.perf_counter()) - self.started
+        games = self.counters.get('games', 0)
+        phases = {}
+        for name in sorted(self.totals, key=self.totals.get, reverse=True):
+            samples = np.frombuffer(self.samples[name], dtype=np.float64) * 1000
+            phases[name] = {
+                'calls': self.calls[name],
+                'total_s': self.totals[name],
+                'share': self.totals[name] / wall_time if wall_time else 0.0,
+                'mean_ms': self.totals[name] * 1000 / self.calls[name],
+                'p50_ms': float(np.percentile(samples, 50)) if samples.size else 0.0,
+                'p99_ms': float(np.percentile(samples, 99)) if samples.size else 0.0
+            }
+        return {
+            'wall_time_s': wall_time,
+            'games': games,
+            'games_per_sec': games / wall_time if wall_time else 0.0,
+            'counters': dict(self.counters),
+            'phases': phases
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+
+def active() -> Optional[Profiler]:
+    """Profiler collecting samples for the calling thread's run, if any."""
+    return _current.get()
+
+
+def phase(name: str):
+    """Time a block under the active profiler; a shared no-op when disabled."""
+    profiler = _current.get()
+    if profiler is None:
+        return _NULL_PHASE
+    return profiler.phase(name)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as a phase while profiling."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _current.get()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, amount: int = 1):
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.count(name, amount)
+
+
+@contextmanager
+def profile_tournament(enabled: bool = True) -> Iterator[Optional[Profiler]]:
+    """
+    Collect samples for the enclosed block in a fresh Profiler.
+
+    Args:
+        enabled: When False, nothing is instrumented and None is yielded
+
+    Yields:
+        Optional[Profiler]: The active profiler, stopped when the block exits
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = Profiler()
+    token = _current.set(profiler)
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _current.reset(token)
@@ -0,0 +1,314 @@
+"""
+results_store.py
+
+This module provides an append-only columnar store for game results, as an
+alternative to one games-table row per game for large histories.
+
+Key features:
+- Arrow IPC files partitioned by day (root/date=YYYY-MM-DD/part-*.arrow),
+  one file per written batch
+- Compaction: once a partition holds compact_after files smaller than
+  batch_size rows, they are merged into one, so frequent small flushes do
+  not leave a file per flush behind
+- Dictionary-encoded strategy names, so a name is stored once per file
+- Memory-mapped, zero-copy reads of every partition
+- Vectorized scans for the pairwise matrix and per-strategy averages,
+  returning the same shapes as StrategyStats' SQL read paths
+
+Files are uncompressed Arrow IPC rather than Parquet, since Parquet pages
+must be decoded and cannot be memory-mapped without copying.
+
+Compaction writes the merged file and a manifest naming the files it
+replaces before deleting them, so readers skip replaced files that are
+still on disk and an interrupted compaction is finished by the next one.
+Processes sharing a store take an exclusive lock on the partition while
+compacting it.
+
+pyarrow is an optional dependency: it is only needed once a ResultsStore is
+created. StrategyStats uses one when RESULTS_BACKEND=arrow; the directory
+defaults to results_store and can be moved with RESULTS_STORE_PATH.
+"""
+
+import atexit
+import fcntl
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+    pc = None
+
+DEFAULT_STORE_PATH = 'results_store'
+DEFAULT_BATCH_SIZE = 50000
+DEFAULT_COMPACT_AFTER = 16
+
+# Game row keys (as built by StrategyStats) in column order
+COLUMNS = (
+    'strategy1_name',
+    'strategy2_name',
+    'score1',
+    'score2',
+    'total_rounds',
+    'cooperation_rate1',
+    'cooperation_rate2',
+    'timestamp'
+)
+
+
+# Stores whose buffered rows still need writing at interpreter shutdown
+_open_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_stores():
+    for store in list(_open_stores):
+        store.flush()
+
+
+def _schema():
+    names = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('strategy1_name', names),
+        ('strategy2_name', names),
+        ('score1', pa.float64()),
+        ('score2', pa.float64()),
+        ('total_rounds', pa.int32()),
+        ('cooperation_rate1', pa.float64()),
+        ('cooperation_rate2', pa.float64()),
+        ('timestamp', pa.timestamp('us'))
+    ])
+
+
+class ResultsStore:
+    def __init__(self, root: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 compact_after: int = DEFAULT_COMPACT_AFTER):
+        """
+        Args:
+            root: Directory holding the partitions; defaults to RESULTS_STORE_PATH
+                or results_store
+            batch_size: Buffered rows that trigger writing a file, and the
+                size below which files are merged by compaction
+            compact_after: Files under batch_size rows a partition may hold
+                before they are merged
+        """
+        if pa is None:
+            raise ImportError("the columnar results store requires pyarrow (pip install pyarrow)")
+        self.root = root or os.getenv('RESULTS_STORE_PATH', DEFAULT_STORE_PATH)
+        self.batch_size = batch_size
+        self.compact_after = compact_after
+        self.schema = _schema()
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        _open_stores.add(self)
+
+    def append(self, rows: List[Dict]):
+        """Buffer game rows, writing a file once batch_size rows are waiting."""
+        with self._lock:
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.batch_size:
+                self._write_buffer()
+
+    def flush(self):
+        """Write any buffered rows."""
+        with self._lock:
+            self._write_buffer()
+
+    def _write_buffer(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        columns = {name: [row[name] for row in rows] for name in COLUMNS}
+        for name in ('strategy1_name', 'strategy2_name'):
+            columns[name] = pa.array(columns[name], pa.string()).dictionary_encode()
+        table = pa.table(columns, schema=self.schema)
+
+        partition = os.path.join(self.root, f"date={datetime.utcnow():%Y-%m-%d}")
+        os.makedirs(partition, exist_ok=True)
+        self._write_file(self._new_file(partition), table)
+        if len(table) < self.batch_size:
+            self._compact_partition(partition)
+
+    def _new_file(self, partition: str) -> str:
+        return os.path.join(partition, f"part-{time.time_ns()}-{os.getpid()}.arrow")
+
+    def _write_file(self, path: str, table: 'pa.Table'):
+        # Write under a temporary name so readers never see a partial file
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, self.schema) as writer:
+                writer.write_table(table)
+        os.replace(path + '.tmp', path)
+
+    def compact(self):
+        """Merge the small files of every partition, whatever their number."""
+        with self._lock:
+            self._write_buffer()
+            for partition in glob.glob(os.path.join(self.root, 'date=*')):
+                self._compact_partition(partition, minimum=2)
+
+    def _compact_partition(self, partition: str, minimum: Optional[int] = None):
+        """
+        Merge the partition's files under batch_size rows into one, once
+        there are at least minimum (default compact_after) of them.
+        """
+        with open(os.path.join(partition, '.compact.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._finish_compactions(partition)
+            small = []
+            for path in sorted(glob.glob(os.path.join(partition, '*.arrow'))):
+                rows = pa.ipc.open_file(pa.memory_map(path)).read_all().num_rows
+                if rows < self.batch_size:
+                    small.append(path)
+            if len(small) < (minimum or self.compact_after):
+                return
+
+            tables = [pa.ipc.open_file(pa.memory_map(path)).read_all() for path in small]
+            merged = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+            # Record what the merged file replaces before it becomes visible
+            manifest = os.path.join(partition, f".compact-{time.time_ns()}-{os.getpid()}.json")
+            target = self._new_file(partition)
+            with open(manifest + '.tmp', 'w') as manifest_file:
+                json.dump({'merged': os.path.basename(target),
+                           'replaced': [os.path.basename(path) for path in small]}, manifest_file)
+            os.replace(manifest + '.tmp', manifest)
+            self._write_file(target, merged)
+            self._finish_compactions(partition)
+
+    def _finish_compactions(self, partition: str):
+        """Delete the files replaced by finished compactions, and abandon unfinished ones."""
+        for manifest in glob.glob(os.path.join(partition, '.compact-*.json')):
+            with open(manifest) as manifest_file:
+                record = json.load(manifest_file)
+            if os.path.exists(os.path.join(partition, record['merged'])):
+                for name in record['replaced']:
+                    try:
+                        os.remove(os.path.join(partition, name))
+                    except FileNotFoundError:
+                        pass
+            os.remove(manifest)
+
+    def files(self) -> List[str]:
+        """Data files, without those already replaced by a merged file."""
+        paths = set(glob.glob(os.path.join(self.root, 'date=*', '*.arrow')))
+        for manifest in glob.glob(os.path.join(self.root, 'date=*', '.compact-*.json')):
+            partition = os.path.dirname(manifest)
+            try:
+                with open(manifest) as manifest_file:
+                    record = json.load(manifest_file)
+            except FileNotFoundError:
+                continue
+            if os.path.join(partition, record['merged']) in paths:
+                paths.difference_update(os.path.join(partition, name) for name in record['replaced'])
+        return sorted(paths)
+
+    def read_table(self, columns: Optional[List[str]] = None) -> 'pa.Table':
+        """
+        All stored games as one table, memory-mapped without copying.
+
+        Args:
+            columns: Columns to return; None returns all of them
+        """
+        self.flush()
+        while True:
+            try:
+                tables = [pa.ipc.open_file(pa.memory_map(path)).read_all() for path in self.files()]
+                break
+            except FileNotFoundError:
+                continue  # Removed by a concurrent compaction; list the files again
+        if columns:
+            tables = [table.select(columns) for table in tables]
+        if not tables:
+            schema = self.schema
+            if columns:
+                schema = pa.schema([schema.field(name) for name in columns])
+            return schema.empty_table()
+        # Each file has its own name dictionary; grouping needs a shared one
+        return pa.concat_tables(tables).unify_dictionaries()
+
+    def pairwise_matrix(self, strategy_names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Per-pairing aggregates of all stored games, shaped like
+        StrategyStats.get_pairwise_matrix (score, score_std, cooperation, count).
+        """
+        table = self.read_table(['strategy1_name', 'strategy2_name', 'score1', 'cooperation_rate1'])
+        grouped = table.group_by(['strategy1_name', 'strategy2_name']).aggregate([
+            ('score1', 'mean'),
+            ('score1', 'stddev', pc.VarianceOptions(ddof=0)),
+            ('cooperation_rate1', 'mean'),
+            ('score1', 'count')
+        ]).to_pylist()
+
+        if strategy_names is None:
+            strategy_names = sorted({name for row in grouped
+                                     for name in (row['strategy1_name'], row['strategy2_name'])})
+        matrices = {
+            key: {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
+            for key in ('score', 'score_std', 'cooperation', 'count')
+        }
+        for row in grouped:
+            s1, s2 = row['strategy1_name'], row['strategy2_name']
+            if s1 not in matrices['count'] or s2 not in matrices['count']:
+                continue
+            matrices['score'][s1][s2] = row['score1_mean']
+            matrices['score_std'][s1][s2] = row['score1_stddev']
+            matrices['cooperation'][s1][s2] = row['cooperation_rate1_mean']
+            matrices['count'][s1][s2] = row['score1_count']
+        return matrices
+
+    def strategy_averages(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-strategy averages over both sides of every stored game, shaped
+        like StrategyStats.get_matchup_averages.
+        """
+        table = self.read_table()
+        totals = {}
+        for side in ('1', '2'):
+            normalized = pc.multiply(pc.divide(table['score' + side],
+                                               pc.cast(table['total_rounds'], pa.float64())), 100)
+            scan = pa.table({
+                'name': table['strategy' + side + '_name'],
+                'normalized': normalized,
+                'cooperation': table['cooperation_rate' + side]
+            })
+            for row in scan.group_by('name').aggregate([
+                ('normalized', 'sum'), ('cooperation', 'sum'), ('normalized', 'count')
+            ]).to_pylist():
+                total = totals.setdefault(row['name'], [0, 0.0, 0.0])
+                total[0] += row['normalized_count']
+                total[1] += row['normalized_sum']
+                total[2] += row['cooperation_sum']
+        return {
+            name: {
+                'avg_score_per_round': score_sum / games,
+                'avg_cooperation_rate': cooperation_sum / games,
+                'total_games': games
+            }
+            for name, (games, score_sum, cooperation_sum) in totals.items() if games
+        }
+
+    def game_count(self) -> int:
+        return self.read_table(['score1']).num_rows
+
+    def clear(self):
+        """Delete every stored game and any buffered rows."""
+        with self._lock:
+            self._buffer = []
+            for partition in glob.glob(os.path.join(self.root, 'date=*')):
+                shutil.rmtree(partition)
+
+
+def default_results_store() -> Optional[ResultsStore]:
+    """A ResultsStore when RESULTS_BACKEND=arrow, else None (games go to the games table)."""
+    if os.getenv('RESULTS_BACKEND', 'sql').lower() != 'arrow':
+        return None
+    return ResultsStore()
@@ -0,0 +1,208 @@
+"""
+sqlite_cache.py
+
+This module provides the size-bounded key/value cache shared by
+InterpretationCache and MatchupCache: an in-memory least-recently-used layer
+in front of an optional SQLite table.
+
+Key features:
+- Least-recently-used eviction beyond a maximum entry count, in memory and
+  on disk
+- Optional time-to-live expiry
+- A version number: a table written under an older version, or with an
+  older column layout, is dropped and recreated (its entries are only a
+  cache)
+- Hit/miss counters
+- Fork safety: a forked child (e.g. a tournament worker) gets a fresh lock
+  and opens its own connection instead of using the parent's
+
+Values are JSON-serializable dicts.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+_COLUMNS = ['key', 'value', 'created_at', 'last_used']
+
+# Caches whose connection and lock must be replaced in forked children
+_open_caches = weakref.WeakSet()
+# Connections inherited from a parent process: never used, and never closed,
+# since closing them could disturb the parent's transactions
+_inherited_connections = []
+
+
+def _reset_after_fork():
+    for cache in list(_open_caches):
+        cache._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class SQLiteLRUCache:
+    def __init__(self, table: str, path: Optional[str] = None, max_entries: int = 4096,
+                 ttl_seconds: Optional[float] = None, version: int = 0):
+        """
+        Args:
+            table: SQLite table holding the entries
+            path: SQLite file to back the cache with; None keeps it in memory
+                only, ":memory:" in an in-process database
+            max_entries: Entries kept before least-recently-used ones are evicted
+            ttl_seconds: Age after which an entry is treated as missing; None
+                keeps entries until they are evicted
+            version: Format of the stored keys and values; a database written
+                under a lower version is emptied
+        """
+        self.table = table
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, Tuple[Dict, float]]' = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self._conn = self._connect() if path else None
+        _open_caches.add(self)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")]
+        stored_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if (columns and columns != _COLUMNS) or stored_version < self.version:
+            conn.execute(f"DROP TABLE IF EXISTS {self.table}")
+        if stored_version < self.version:
+            conn.execute(f"PRAGMA user_version = {self.version}")
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{self.table}_last_used ON {self.table} (last_used)")
+        conn.commit()
+        return conn
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """The cache's connection, opened again in a forked child; None without a path."""
+        if self._conn is None and self.path:
+            self._conn = self._connect()
+        return self._conn
+
+    def _after_fork(self):
+        # The parent's lock may have been held by another of its threads
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            _inherited_connections.append(self._conn)
+            self._conn = None
+
+    def _fresh(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is None or now - created_at <= self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached value for a key, if present and fresh."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def peek(self, key: str) -> Optional[Dict]:
+        """get() without counting a hit or miss, for re-checking a lookup already counted."""
+        with self._lock:
+            return self._lookup(key)
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None and self._fresh(entry[1], now):
+            self._memory.move_to_end(key)
+            return entry[0]
+
+        conn = self._connection()
+        if conn is not None:
+            row = conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._fresh(row[1], now):
+                # Recency is refreshed on disk when an entry is first loaded into a process
+                conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                return value
+            if row is not None:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                conn.commit()
+
+        self._memory.pop(key, None)
+        return None
+
+    def put(self, key: str, value: Dict):
+        """Store a value and evict least-recently-used entries over the limit."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now)
+                )
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                conn.commit()
+            self._remember(key, value, now)
+
+    def _remember(self, key: str, value: Dict, created_at: float):
+        """Add an entry to the in-memory layer, dropping the least recently used over the limit."""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                conn.execute(f"DELETE FROM {self.table}")
+                conn.commit()
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict: hits, misses, hit_rate and the current number of entries
+        """
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                size = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            else:
+                size = len(self._memory)
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': size
+        }
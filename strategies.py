@@ -6,34 +6,298 @@
 #
 # Dependencies:
 # - strategy_interpreter: For interpreting and executing strategies.
+# - markov: Memory-one descriptions for exact expected payoffs.
 # - typing: For type hinting and annotations.
 # - other necessary modules for strategy logic.
 
 from typing import List, Tuple, Optional, Callable, Union
 from strategy_interpreter import StrategyInterpreter
 import random
-from typing import List, Tuple, Optional, Callable
+from typing import List, Tuple, Optional, Callable, Dict, Hashable
 import re
+import json
+import numpy as np
 from strategy_interpreter import StrategyInterpreter
+from markov import MemoryOne
+
+HISTORY_CAPACITY = 1000  # Matches PrisonersDilemma.MAX_ITERATIONS; grows if exceeded
+
+class MoveHistory:
+    """
+    Compact record of one player's moves in a game.
+
+    Moves are stored one byte each in a preallocated bytearray. With a memory
+    depth, only the last `depth` moves are kept in a ring buffer. The move
+    count, cooperation count and last move are tracked for the whole game
+    either way, so cooperation statistics are O(1).
+
+    Supports len(), truthiness, indexing (negative indices count from the
+    latest move; only retained moves can be read) and iteration over the
+    retained moves, oldest first.
+    """
+    __slots__ = ('_moves', '_depth', '_length', 'cooperations', 'last')
+
+    def __init__(self, depth: Optional[int] = None, capacity: int = HISTORY_CAPACITY):
+        self._depth = depth
+        self._moves = bytearray(capacity if depth is None else depth)
+        self._length = 0
+        self.cooperations = 0
+        self.last: Optional[bool] = None  # Most recent move, None before the first
+
+    def append(self, move: bool):
+        length = self._length
+        depth = self._depth
+        if depth is None:
+            if length == len(self._moves):
+                self._moves.extend(bytes(length or 1))
+            self._moves[length] = move
+        elif depth > 1:
+            self._moves[length % depth] = move
+        # A depth of 0 or 1 is served by the counters and `last` alone
+        self._length = length + 1
+        self.cooperations += move
+        self.last = move
+
+    def cooperation_rate(self) -> float:
+        return self.cooperations / self._length if self._length else 0.0
+
+    def retained(self) -> int:
+        """Number of moves that can still be read back."""
+        return self._length if self._depth is None else min(self._length, self._depth)
+
+    def to_array(self) -> np.ndarray:
+        """Retained moves as a bool array, oldest first."""
+        return np.array(list(self), dtype=bool)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __getitem__(self, index: int) -> bool:
+        if index < 0:
+            index += self._length
+        if not self._length - self.retained() <= index < self._length:
+            raise IndexError("move not retained in history")
+        if self._depth == 1:
+            return self.last
+        return bool(self._moves[index if self._depth is None else index % self._depth])
+
+    def __iter__(self):
+        for index in range(self._length - self.retained(), self._length):
+            yield self[index]
 
 class Strategy:
+    # Number of past moves the strategy reads; None keeps the whole game.
+    # Memory-one strategies such as Tit for Tat only need a ring buffer of 1.
+    memory_depth: Optional[int] = None
+
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
-        self.history: List[bool] = []
-        self.opponent_history: List[bool] = []
+        self.history = MoveHistory(self.memory_depth)
+        self.opponent_history = MoveHistory(self.memory_depth)
+        # Bound once, as update_history runs twice per round
+        self._record_move = self.history.append
+        self._record_opponent_move = self.opponent_history.append
 
     def make_choice(self) -> bool:
         """Return True for cooperate, False for defect"""
         return True  # Default to cooperation as a safe default
 
     def update_history(self, my_choice: bool, opponent_choice: bool):
-        self.history.append(my_choice)
-        self.opponent_history.append(opponent_choice)
+        self._record_move(my_choice)
+        self._record_opponent_move(opponent_choice)
+
+    def state(self) -> Optional[Hashable]:
+        """
+        Internal state that, together with the opponent's, fixes all future moves.
+
+        Deterministic strategies return a hashable value such that two equal
+        states always lead to the same move sequence against the same
+        opponent state; the engine uses this to detect cycles. Random or
+        opaque strategies return None.
+        """
+        return None
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        """
+        Description of the strategy as a memory-one strategy, for exact
+        Markov-chain evaluation; None if its moves depend on more than the
+        previous round.
+        """
+        return None
+
+    def fingerprint(self) -> str:
+        """
+        Stable identifier of the strategy's behaviour, for caching results.
+
+        Strategies with equal fingerprints must play identically; the display
+        name is not part of it.
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
+    def batch_choice(self, round_index: int, my_moves: np.ndarray,
+                     opponent_moves: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """
+        Vectorized make_choice for many independent games at once.
+
+        Args:
+            round_index: Index of the round being played (0-based)
+            my_moves: (num_games, rounds) bool array of this strategy's moves;
+                only columns before round_index are filled in
+            opponent_moves: Same layout for the opponent's moves
+            rng: Random generator shared by the batch
+
+        Returns:
+            np.ndarray: (num_games,) bool array, True for cooperate
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no batch implementation")
+
+class CompiledPattern:
+    """
+    Move rule of an interpreted strategy pattern, built once per pattern.
+
+    compile_pattern turns the interpreter's dict into one of the subclasses
+    below, so choosing a move no longer inspects the dict or branches on
+    pattern type strings.
+    """
+
+    def choose(self, move_index: int, opponent_history: MoveHistory) -> bool:
+        """Return the move for the scalar engine."""
+        return True
+
+    def batch_choose(self, round_index: int, opponent_moves: np.ndarray,
+                     rng: np.random.Generator) -> np.ndarray:
+        """Return the moves of every game in a batch for one round."""
+        return np.ones(opponent_moves.shape[0], dtype=bool)
+
+    def state(self, move_index: int, opponent_history: MoveHistory) -> Optional[Hashable]:
+        """Strategy.state for the pattern; None if its moves are random."""
+        return ()
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        """Strategy.memory_one for the pattern."""
+        return MemoryOne(1.0, (1.0, 1.0, 1.0, 1.0))
+
+class PeriodicPattern(CompiledPattern):
+    """Sequence pattern: a fixed cooperate/defect cycle stored as a lookup table."""
+
+    def __init__(self, cooperate_count: int, defect_count: int):
+        self.moves = np.array([True] * cooperate_count + [False] * defect_count)
+        self.table = tuple(self.moves.tolist())
+        self.period = len(self.table)
+
+    def choose(self, move_index, opponent_history):
+        return self.table[move_index % self.period]
+
+    def batch_choose(self, round_index, opponent_moves, rng):
+        return np.full(opponent_moves.shape[0], self.table[round_index % self.period])
+
+    def state(self, move_index, opponent_history):
+        return move_index % self.period
+
+    def memory_one(self):
+        return None
+
+class ReactivePattern(CompiledPattern):
+    """Conditional pattern: cooperate for a fixed opening, then copy the opponent."""
+
+    def __init__(self, initial_cooperation: int):
+        self.initial_cooperation = max(initial_cooperation, 1)
+
+    def choose(self, move_index, opponent_history):
+        if move_index < self.initial_cooperation:
+            return True
+        return opponent_history.last
+
+    def batch_choose(self, round_index, opponent_moves, rng):
+        if round_index < self.initial_cooperation:
+            return np.ones(opponent_moves.shape[0], dtype=bool)
+        return opponent_moves[:, round_index - 1].copy()
+
+    def state(self, move_index, opponent_history):
+        if move_index < self.initial_cooperation:
+            return move_index, None
+        return self.initial_cooperation, opponent_history.last
+
+    def memory_one(self):
+        # Longer openings need a move counter, so only plain Tit for Tat qualifies
+        if self.initial_cooperation > 1:
+            return None
+        return MemoryOne(1.0, (1.0, 0.0, 1.0, 0.0))
+
+class ConstantPattern(CompiledPattern):
+    """Simple pattern that always plays the same move."""
+
+    def __init__(self, cooperate: bool):
+        self.cooperate = cooperate
+
+    def choose(self, move_index, opponent_history):
+        return self.cooperate
+
+    def batch_choose(self, round_index, opponent_moves, rng):
+        return np.full(opponent_moves.shape[0], self.cooperate)
+
+    def memory_one(self):
+        p = 1.0 if self.cooperate else 0.0
+        return MemoryOne(p, (p, p, p, p))
+
+class RandomPattern(CompiledPattern):
+    """Simple pattern that cooperates with probability one half."""
+
+    def choose(self, move_index, opponent_history):
+        return random.random() < 0.5
+
+    def batch_choose(self, round_index, opponent_moves, rng):
+        return rng.random(opponent_moves.shape[0]) < 0.5
+
+    def state(self, move_index, opponent_history):
+        return None
+
+    def memory_one(self):
+        return MemoryOne(0.5, (0.5, 0.5, 0.5, 0.5))
+
+_compiled_patterns: Dict[str, CompiledPattern] = {}
+
+def compile_pattern(strategy_pattern: Dict) -> CompiledPattern:
+    """
+    Compile an interpreted strategy pattern, reusing earlier compilations.
+
+    Args:
+        strategy_pattern: Dict in the format returned by StrategyInterpreter
+
+    Returns:
+        CompiledPattern: Shared, stateless move rule for the pattern
+    """
+    key = json.dumps(strategy_pattern, sort_keys=True)
+    compiled = _compiled_patterns.get(key)
+    if compiled is not None:
+        return compiled
+
+    pattern_type = strategy_pattern.get('type')
+    pattern = strategy_pattern.get('pattern', {})
+    compiled = ConstantPattern(True)  # Default to cooperation
+
+    if pattern_type == "sequence":
+        compiled = PeriodicPattern(pattern['cooperate_count'], pattern['defect_count'])
+    elif pattern_type == "conditional":
+        if pattern.get('condition') == "last_opponent_move":
+            compiled = ReactivePattern(pattern.get('initial_cooperation', 0))
+    elif pattern_type == "simple":
+        if pattern.get('action') == "defect":
+            compiled = ConstantPattern(False)
+        elif pattern.get('action') == "random":
+            compiled = RandomPattern()
+
+    _compiled_patterns[key] = compiled
+    return compiled
 
 class CustomStrategy(Strategy):
     instances = {}  # Class variable to store instance parameters
     interpreter = StrategyInterpreter()
+    memory_depth = 1  # Compiled patterns read at most the opponent's last move
 
     def __init__(self, name: str = None, description: str = None, logic: str = None):
         # Get class-level attributes if they exist
@@ -51,60 +315,38 @@ class CustomStrategy(Strategy):
         self.move_counter = 0
 
         # Check if strategy interpretation is already cached
-        cached_pattern = self.interpreter.get_cached_interpretation(self.logic)
+        cached_pattern = (getattr(self, 'strategy_pattern', None)
+                          or self.interpreter.get_cached_interpretation(self.logic))
         if cached_pattern:
-            print(f"[{self.name}] Using cached strategy pattern")
             self.strategy_pattern = cached_pattern
         else:
             # Use AI to interpret the strategy and cache it
             print(f"[{self.name}] Interpreting new strategy: '{self.logic}'")
             self.strategy_pattern = self.interpreter.interpret_strategy(self.logic)
+        self.compiled = compile_pattern(self.strategy_pattern)
 
     def make_choice(self) -> bool:
-        pattern_type = self.strategy_pattern['type']
-        pattern = self.strategy_pattern['pattern']
-        choice = True  # Default to cooperation
-
-        print(f"\n[{self.name}] Making choice for move {self.move_counter + 1}")
-        print(f"[{self.name}] Using pattern type: {pattern_type}")
-
-        if pattern_type == "sequence":
-            total_sequence = pattern['cooperate_count'] + pattern['defect_count']
-            current_sequence_position = self.move_counter % total_sequence
-            should_cooperate = current_sequence_position < pattern['cooperate_count']
-
-            print(f"[{self.name}] Sequence details:")
-            print(f"  - Total sequence length: {total_sequence}")
-            print(f"  - Current position in sequence: {current_sequence_position}")
-            print(f"  - Cooperate count: {pattern['cooperate_count']}")
-            print(f"  - Should cooperate: {should_cooperate}")
-
-            choice = should_cooperate
-
-        elif pattern_type == "conditional":
-            initial_cooperation = pattern.get('initial_cooperation', 0)
-
-            if self.move_counter < initial_cooperation:
-                choice = True
-                print(f"[{self.name}] In initial cooperation phase: move {self.move_counter + 1} of {initial_cooperation}")
-            else:
-                if pattern['condition'] == "last_opponent_move":
-                    choice = self.opponent_history[-1] if self.opponent_history else True
-                    print(f"[{self.name}] Copying opponent's last move: {choice}")
-
-        elif pattern_type == "simple":
-            if pattern['action'] == "cooperate":
-                choice = True
-            elif pattern['action'] == "defect":
-                choice = False
-            elif pattern['action'] == "random":
-                choice = random.choice([True, False])
-            print(f"[{self.name}] Simple action '{pattern['action']}' resulted in: {choice}")
-
+        choice = self.compiled.choose(self.move_counter, self.opponent_history)
         self.move_counter += 1
         return choice
 
+    def batch_choice(self, round_index: int, my_moves: np.ndarray,
+                     opponent_moves: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        return self.compiled.batch_choose(round_index, opponent_moves, rng)
+
+    def state(self) -> Optional[Hashable]:
+        return self.compiled.state(self.move_counter, self.opponent_history)
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        return self.compiled.memory_one()
+
+    def fingerprint(self) -> str:
+        # Custom classes are created per strategy; behaviour is the pattern alone
+        return f"CustomStrategy:{json.dumps(self.strategy_pattern, sort_keys=True)}"
+
 class TitForTat(Strategy):
+    memory_depth = 1
+
     def __init__(self):
         super().__init__(
             "Tit for Tat",
@@ -112,11 +354,24 @@ class TitForTat(Strategy):
         )
 
     def make_choice(self) -> bool:
-        if not self.opponent_history:
-            return True
-        return self.opponent_history[-1]
+        last = self.opponent_history.last
+        return True if last is None else last
+
+    def batch_choice(self, round_index, my_moves, opponent_moves, rng) -> np.ndarray:
+        if round_index == 0:
+            return np.ones(my_moves.shape[0], dtype=bool)
+        return opponent_moves[:, round_index - 1].copy()
+
+    def state(self) -> Optional[Hashable]:
+        # The next move: cooperate at the start or after an opponent cooperation
+        return self.opponent_history.last is not False
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        return MemoryOne(1.0, (1.0, 0.0, 1.0, 0.0))
 
 class AlwaysCooperate(Strategy):
+    memory_depth = 0
+
     def __init__(self):
         super().__init__(
             "Always Cooperate",
@@ -126,7 +381,18 @@ class AlwaysCooperate(Strategy):
     def make_choice(self) -> bool:
         return True
 
+    def batch_choice(self, round_index, my_moves, opponent_moves, rng) -> np.ndarray:
+        return np.ones(my_moves.shape[0], dtype=bool)
+
+    def state(self) -> Optional[Hashable]:
+        return ()
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        return MemoryOne(1.0, (1.0, 1.0, 1.0, 1.0))
+
 class AlwaysDefect(Strategy):
+    memory_depth = 0
+
     def __init__(self):
         super().__init__(
             "Always Defect",
@@ -136,7 +402,18 @@ class AlwaysDefect(Strategy):
     def make_choice(self) -> bool:
         return False
 
+    def batch_choice(self, round_index, my_moves, opponent_moves, rng) -> np.ndarray:
+        return np.zeros(my_moves.shape[0], dtype=bool)
+
+    def state(self) -> Optional[Hashable]:
+        return ()
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        return MemoryOne(0.0, (0.0, 0.0, 0.0, 0.0))
+
 class RandomStrategy(Strategy):
+    memory_depth = 0
+
     def __init__(self):
         super().__init__(
             "Random",
@@ -146,6 +423,12 @@ class RandomStrategy(Strategy):
     def make_choice(self) -> bool:
         return random.choice([True, False])
 
+    def batch_choice(self, round_index, my_moves, opponent_moves, rng) -> np.ndarray:
+        return rng.random(my_moves.shape[0]) < 0.5
+
+    def memory_one(self) -> Optional[MemoryOne]:
+        return MemoryOne(0.5, (0.5, 0.5, 0.5, 0.5))
+
 _custom_strategies: List[CustomStrategy] = []
 
 def add_custom_strategy(name: str, description: str, logic: str) -> CustomStrategy:
@@ -159,17 +442,53 @@ def add_custom_strategy(name: str, description: str, logic: str) -> CustomStrate
         }
     )
     strategy = strategy_class(name=name, description=description, logic=logic)
+    # Later instances of this class reuse the interpretation without a lookup
+    strategy_class.strategy_pattern = strategy.strategy_pattern
     _custom_strategies.append(strategy)
     return strategy
 
+def strategy_spec(strategy: Strategy) -> Tuple:
+    """
+    Picklable description of a strategy, for rebuilding it in another process.
+
+    Custom strategy classes are created at runtime and cannot be pickled by
+    reference, so they are described by their name, logic and interpreted
+    pattern instead.
+    """
+    if isinstance(strategy, CustomStrategy):
+        return ('custom', strategy.name, strategy.description, strategy.logic,
+                strategy.strategy_pattern)
+    return ('builtin', type(strategy))
+
+def build_strategy(spec: Tuple) -> Strategy:
+    """Rebuild a strategy from strategy_spec without re-interpreting its logic."""
+    if spec[0] == 'custom':
+        _, name, description, logic, strategy_pattern = spec
+        strategy_class = type(
+            "CustomStrategy_spec",
+            (CustomStrategy,),
+            {
+                'name': name,
+                'description': description,
+                'logic': logic,
+                'strategy_pattern': strategy_pattern
+            }
+        )
+        return strategy_class()
+    return spec[1]()
+
+# Built-in strategy instances, created once per process; players are built from their types
+_base_strategies: List[Strategy] = []
+
 def get_all_strategies() -> List[Strategy]:
-    base_strategies = [
-        TitForTat(),
-        AlwaysCooperate(),
-        AlwaysDefect(),
-        RandomStrategy()
-    ]
-    return base_strategies + _custom_strategies
+    if not _base_strategies:
+        _base_strategies.extend([
+            TitForTat(),
+            AlwaysCooperate(),
+            AlwaysDefect(),
+            RandomStrategy()
+        ])
+    return _base_strategies + _custom_strategies
 
 def remove_custom_strategy(strategy_name):
     """
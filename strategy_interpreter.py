@@ -2,33 +2,48 @@
 strategy_interpreter.py
 
 This module provides AI-powered interpretation of natural language strategy descriptions
-for the Prisoner's Dilemma game. It uses OpenAI's GPT model to convert human-readable
-strategy descriptions into structured game logic.
+for the Prisoner's Dilemma game. Common phrasings are handled by the offline parser in
+strategy_parser; everything else is converted by OpenAI's GPT model into structured game
+logic.
 
 Key features:
 - Natural language processing of strategy descriptions
+- Offline rule-based fast path that needs no network access
 - Conversion to structured game patterns
 - Strategy validation and error handling
-- Caching of interpreted strategies for performance
+- Persistent caching of interpreted strategies, keyed on canonicalized text
+- Concurrent prewarming of template interpretations, with identical
+  in-flight requests merged into one model call
 - Fallback mechanisms for handling interpretation errors
 
 The StrategyInterpreter class supports three types of patterns:
 1. Sequence patterns (e.g., "cooperate 5 moves then defect 5 moves")
 2. Conditional patterns (e.g., "copy opponent's last move")
 3. Simple patterns (e.g., "always cooperate", "always defect", "random")
+
+The model endpoint follows the OpenAI client's OPENAI_BASE_URL setting, so a local
+stand-in for the chat-completions API can be used in tests. OPENAI_TIMEOUT sets the
+per-request timeout in seconds.
 """
 
 import os
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from openai import OpenAI
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from interpretation_cache import InterpretationCache, canonicalize
+from strategy_parser import parse_strategy
 
 load_dotenv()
 
 class StrategyInterpreter:
     _instance = None
-    _cache = {}  # Class-level cache for interpreted strategies
+    _cache = None  # Shared InterpretationCache, opened with the first instance
+    _inflight: Dict[str, Future] = {}  # Canonical text -> interpretation in progress
+    _inflight_lock = threading.Lock()
+    _prewarm_started = set()  # Text sets already prewarmed in this process
 
     def __new__(cls):
         if cls._instance is None:
@@ -37,7 +52,10 @@ class StrategyInterpreter:
 
     def __init__(self):
         if not hasattr(self, 'initialized'):
-            self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+            self._client = None
+            self.request_timeout = float(os.getenv('OPENAI_TIMEOUT', 30))
+            if StrategyInterpreter._cache is None:
+                StrategyInterpreter._cache = InterpretationCache()
             self.initialized = True
             self.system_prompt = """
             You are a Prisoner's Dilemma strategy interpreter. Your task is to convert strategy descriptions
@@ -95,25 +113,120 @@ class StrategyInterpreter:
               Output: {"type": "simple", "pattern": {"action": "cooperate"}}
             """
 
+    @property
+    def client(self) -> OpenAI:
+        """OpenAI client, created on first use so offline parsing needs no API key."""
+        if self._client is None:
+            self._client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return self._client
+
     def get_cached_interpretation(self, strategy_text: str) -> Optional[Dict]:
         """Get cached interpretation if it exists."""
-        return self._cache.get(strategy_text.lower().strip())
+        return self._cache.get(strategy_text)
 
     def cache_interpretation(self, strategy_text: str, interpretation: Dict):
         """Cache the interpretation for future use."""
-        self._cache[strategy_text.lower().strip()] = interpretation
+        self._cache.put(strategy_text, interpretation)
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss counters and size of the interpretation cache."""
+        return self._cache.stats()
 
     def interpret_strategy(self, strategy_text: str) -> Dict:
-        try:
-            # Check cache first
-            cached = self.get_cached_interpretation(strategy_text)
-            if cached:
-                print(f"\n[Strategy Interpreter] Using cached interpretation for: '{strategy_text}'")
-                return cached
+        """
+        Interpret a strategy description, merging concurrent identical requests.
+
+        If another thread is already interpreting an equivalent text, this
+        waits for its result instead of making a second model call.
+        """
+        cached = self.get_cached_interpretation(strategy_text)
+        if cached:
+            print(f"\n[Strategy Interpreter] Using cached interpretation for: '{strategy_text}'")
+            return cached
+
+        key = canonicalize(strategy_text)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                # A leader may have cached its result and left since the check
+                # above, which already counted this request's cache lookup
+                cached = self._cache.peek(strategy_text)
+                if cached:
+                    return cached
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            print(f"\n[Strategy Interpreter] Joining in-flight interpretation of: '{strategy_text}'")
+            return future.result()
 
+        try:
+            interpretation = self._interpret_uncached(strategy_text)
+            future.set_result(interpretation)
+            return interpretation
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def prewarm(self, strategy_texts: List[str], max_workers: int = 4,
+                timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Interpret several strategy texts concurrently and fill the cache.
+
+        Args:
+            strategy_texts: Strategy descriptions to interpret
+            max_workers: Maximum number of concurrent interpretations
+            timeout: Seconds to wait for the whole batch; unfinished texts are
+                left running and omitted from the result
+
+        Returns:
+            Dict: strategy text -> interpretation, for texts that finished
+        """
+        texts = list(dict.fromkeys(strategy_texts))
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prewarm")
+        try:
+            futures = {pool.submit(self.interpret_strategy, text): text for text in texts}
+            done, _ = wait(futures, timeout=timeout)
+            return {futures[f]: f.result() for f in done}
+        finally:
+            pool.shutdown(wait=False)
+
+    def prewarm_in_background(self, strategy_texts: List[str], max_workers: int = 4) -> bool:
+        """
+        Start prewarm() on a daemon thread, once per process for a given set of texts.
+
+        Returns:
+            bool: True if a new prewarm was started
+        """
+        key = frozenset(strategy_texts)
+        with self._inflight_lock:
+            if key in self._prewarm_started:
+                return False
+            self._prewarm_started.add(key)
+        threading.Thread(
+            target=self.prewarm,
+            args=(list(strategy_texts), max_workers),
+            name="strategy-prewarm",
+            daemon=True
+        ).start()
+        return True
+
+    def _interpret_uncached(self, strategy_text: str) -> Dict:
+        try:
             # Clean and standardize input
             strategy_text = strategy_text.lower().strip()
 
+            # Try the offline grammar before calling the model
+            parsed = parse_strategy(strategy_text)
+            if parsed:
+                print(f"\n[Strategy Interpreter] Parsed locally: '{strategy_text}'")
+                self.cache_interpretation(strategy_text, parsed)
+                return parsed
+
             print(f"\n[Strategy Interpreter] Analyzing strategy: '{strategy_text}'")
             print("[Strategy Interpreter] Preparing OpenAI request...")
 
@@ -133,7 +246,8 @@ class StrategyInterpreter:
                 model="gpt-3.5-turbo",
                 messages=messages,
                 response_format={"type": "json_object"},
-                temperature=0.1  # Lower temperature for more consistent results
+                temperature=0.1,  # Lower temperature for more consistent results
+                timeout=self.request_timeout
             )
 
             print("\n[Strategy Interpreter] OpenAI Response:")
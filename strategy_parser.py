@@ -0,0 +1,88 @@
+"""
+strategy_parser.py
+
+This module provides a deterministic, offline parser for common strategy
+descriptions. It recognises the phrasings used by the strategy templates and
+most hand-written strategies and turns them into the same pattern structures
+the StrategyInterpreter produces, without a network round-trip.
+
+Supported forms (after canonicalization, so number words, synonyms and
+punctuation do not matter):
+1. Simple patterns: "always cooperate", "never defect", "always defect",
+   "random", "cooperate or defect randomly"
+2. Sequence patterns: "cooperate 10 moves then defect 10 moves",
+   "alternate between cooperating and defecting"
+3. Conditional patterns: "copy opponent", "tit for tat",
+   "cooperate first 3 moves then copy opponent's last move",
+   "choose what opponent chose most often"
+
+Anything else returns None and is left to the language model.
+"""
+
+import re
+from typing import Dict, Optional
+
+from interpretation_cache import canonicalize
+
+_OPENING = r'(?:(?:start (?:by |with )?)?cooperate (?:first |initial )?(?P<initial>\d+) moves then )?'
+_COPY = (
+    r'(?:copy opponent(?: last moves| previous moves| moves)?'
+    r'|tit (?:for )?tat'
+    r'|do what opponent did(?: last(?: moves)?| last moves| previous moves)?'
+    r'|(?:choose|play) what opponent (?:chose|played) most often)'
+)
+
+_RULES = [
+    (re.compile(r'^(?:always )?cooperate(?: always)?$|^never defect$'),
+     lambda m: _simple("cooperate")),
+    (re.compile(r'^(?:always )?defect(?: always)?$|^never cooperate$'),
+     lambda m: _simple("defect")),
+    (re.compile(r'^(?:always )?(?:play |choose |move )?random(?: moves| choice| choices)?$'
+                r'|^(?:cooperate or defect|defect or cooperate)(?: at)? random$'),
+     lambda m: _simple("random")),
+    (re.compile(r'^cooperate (?:first )?(?P<cooperate>\d+) moves then defect (?P<defect>\d+) moves$'),
+     lambda m: _sequence(int(m.group('cooperate')), int(m.group('defect')))),
+    (re.compile(r'^alternate(?: between)? cooperate(?: or)? defect$'),
+     lambda m: _sequence(1, 1)),
+    (re.compile(r'^(?:first )?' + _OPENING + _COPY + r'$'),
+     lambda m: _conditional(int(m.group('initial') or 0))),
+]
+
+
+def _simple(action: str) -> Dict:
+    return {"type": "simple", "pattern": {"action": action}}
+
+
+def _sequence(cooperate_count: int, defect_count: int) -> Optional[Dict]:
+    if cooperate_count < 1 or defect_count < 1:
+        return None
+    return {
+        "type": "sequence",
+        "pattern": {"cooperate_count": cooperate_count, "defect_count": defect_count}
+    }
+
+
+def _conditional(initial_cooperation: int) -> Dict:
+    return {
+        "type": "conditional",
+        "pattern": {"condition": "last_opponent_move", "initial_cooperation": initial_cooperation}
+    }
+
+
+def parse_strategy(strategy_text: str) -> Optional[Dict]:
+    """
+    Parse a strategy description with the local grammar.
+
+    Args:
+        strategy_text: Natural language strategy description
+
+    Returns:
+        Optional[Dict]: A validated sequence/conditional/simple pattern, or
+            None if the text is not covered by the grammar
+    """
+    text = canonicalize(strategy_text)
+    for pattern, build in _RULES:
+        match = pattern.match(text)
+        if match:
+            return build(match)
+    return None
@@ -5,37 +5,202 @@
 # strategy performance metrics, record game results, and manage database
 # interactions.
 #
+# In write-behind mode, games and stat updates are queued in memory and
+# written with bulk inserts, one transaction per flush_every games or per
+# flush_interval_ms, and on flush(), reads and interpreter shutdown.
+#
+# Every database read and write runs in its own unit of work (models.db_session),
+# on the calling thread's session, rather than on one long-lived session.
+#
+# With RESULTS_BACKEND=arrow (or an explicit results_store), games are
+# appended to the columnar ResultsStore instead of the games table, and the
+# pairwise matrix and averages are computed by vectorized scans over it.
+# Games are written to the store before the performance updates, by each
+# record_game/record_games call or, in write-behind mode, by each flush.
+#
+# Every game write to the games table also updates the running per-pairing
+# totals in matchup_summary within the same transaction, with an atomic upsert
+# increment. models.init_db fills an empty matchup_summary from existing games;
+# if the table is ever out of step with games, rebuild it with:
+#
+#     python strategy_stats.py rebuild-matchup-summary
+#
 # Dependencies:
-# - models: Contains the Game and StrategyPerformance models.
+# - models: Contains the Game, StrategyPerformance and MatchupSummary models.
 # - datetime: For handling date and time operations.
 # - typing: For type hinting and annotations.
 
-from typing import Dict
-from models import Game, StrategyPerformance, get_db, db_session
+import argparse
+import atexit
+import math
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Game, StrategyPerformance, MatchupSummary, db_session, init_db, rebuild_matchup_summary
+from profiling import timed
+from results_store import ResultsStore, default_results_store
 from datetime import datetime
 
+# Running totals kept per pairing in matchup_summary
+_SUMMARY_SUMS = (
+    'game_count',
+    'round_count',
+    'score1_sum',
+    'score1_sq_sum',
+    'score2_sum',
+    'score2_sq_sum',
+    'normalized_score1_sum',
+    'normalized_score2_sum',
+    'cooperation1_sum',
+    'cooperation1_sq_sum',
+    'cooperation2_sum',
+    'cooperation2_sq_sum'
+)
 
-class StrategyStats:
-    def __init__(self):
-        self._ensure_db_session()
+# Dialects whose insert() supports ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+# Write-behind instances that still need flushing at interpreter shutdown
+_write_behind_instances = weakref.WeakSet()
+
+# Count of committed writes in this process, for keying caches of historical aggregates
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+
+def data_version() -> int:
+    """Version of the recorded history, bumped after every committed write in this process."""
+    return _data_version
 
-    def _ensure_db_session(self):
-        db = next(get_db())
-        self.db = db
 
+def _bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
+
+@atexit.register
+def _flush_all_write_behind():
+    for stats in list(_write_behind_instances):
+        stats.flush()
+
+
+class StrategyStats:
+    def __init__(self, write_behind: bool = False, flush_every: int = 1000,
+                 flush_interval_ms: float = 1000.0, results_store: Optional[ResultsStore] = None):
+        """
+        Args:
+            write_behind: Queue writes in memory and flush them in batches
+            flush_every: Queued games that trigger a flush
+            flush_interval_ms: Maximum age of the oldest queued write before
+                the next write triggers a flush
+            results_store: Columnar store to keep games in instead of the
+                games table; defaults to default_results_store()
+        """
+        self.results_store = results_store if results_store is not None else default_results_store()
+        self.write_behind = write_behind
+        self.flush_every = flush_every
+        self.flush_interval_ms = flush_interval_ms
+        self._pending_games: List[Dict] = []
+        # strategy_name -> [games, normalized score sum, cooperation rate sum, rates seen]
+        self._pending_stats: Dict[str, List[float]] = {}
+        self._pending_since = None
+        self._flush_count = 0
+        self._games_flushed = 0
+        self._flush_latencies_ms = deque(maxlen=100)
+        # Guards the write-behind queue, which may be shared between Streamlit sessions
+        self._lock = threading.RLock()
+        if write_behind:
+            _write_behind_instances.add(self)
+
+    @timed('stats.update_stats')
     def update_stats(self, strategy_name: str, score: float, num_rounds: int, cooperation_rate: float = 0.0):
         """Update stats with normalized score (per 100 rounds)"""
         normalized_score = (score / num_rounds) * 100  # Normalize to 100 rounds
 
-        # Get or create strategy performance record
+        if self.write_behind:
+            with self._lock:
+                pending = self._pending_stats.setdefault(strategy_name, [0, 0.0, 0.0, 0])
+                pending[0] += 1
+                pending[1] += normalized_score
+                if cooperation_rate is not None:
+                    pending[2] += cooperation_rate
+                    pending[3] += 1
+                self._mark_pending()
+            return
+
+        with db_session() as db:
+            if cooperation_rate is None:
+                self._upsert_performance(db, strategy_name, 1, normalized_score, 0.0, 0)
+            else:
+                self._upsert_performance(db, strategy_name, 1, normalized_score, cooperation_rate, 1)
+        _bump_data_version()
+
+    def _upsert_performance(self, db, strategy_name: str, games: int, score_sum: float,
+                            coop_sum: float, coop_seen: int):
+        """
+        Add games to a strategy's performance row in db's current transaction.
+
+        On SQLite and PostgreSQL this is a single INSERT ... ON CONFLICT DO
+        UPDATE whose increments and averages are computed by the database
+        from the row's current values, so concurrent writers never lose
+        updates. Other dialects fall back to a read-modify-write.
+
+        Args:
+            strategy_name: Strategy to update
+            games: Number of games being added
+            score_sum: Sum of their normalized scores
+            coop_sum: Sum of their cooperation rates
+            coop_seen: How many of the games had a cooperation rate; games
+                without one leave the moving average unchanged
+        """
+        dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if dialect_insert is None:
+            self._update_performance_row(db, strategy_name, games, score_sum, coop_sum, coop_seen)
+            return
+
+        table = StrategyPerformance.__table__
+        now = datetime.utcnow()
+        statement = dialect_insert(table).values(
+            strategy_name=strategy_name,
+            total_games=games,
+            total_score=score_sum,
+            avg_score_per_round=score_sum / games,
+            avg_cooperation_rate=coop_sum / games,
+            last_updated=now
+        )
+        # Column references in SET read the row's values from before this update
+        total_games = table.c.total_games + games
+        total_score = table.c.total_score + score_sum
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.strategy_name],
+            set_={
+                'total_games': total_games,
+                'total_score': total_score,
+                'avg_score_per_round': total_score / total_games,
+                'avg_cooperation_rate': (table.c.avg_cooperation_rate * (table.c.total_games + games - coop_seen)
+                                         + coop_sum) / total_games,
+                'last_updated': now
+            }
+        )
+        db.execute(statement)
+
+    def _update_performance_row(self, db, strategy_name: str, games: int, score_sum: float,
+                                coop_sum: float, coop_seen: int):
+        """Get-or-create fallback of _upsert_performance for dialects without upserts."""
         performance = (
-            self.db.query(StrategyPerformance)
+            db.query(StrategyPerformance)
             .filter(StrategyPerformance.strategy_name == strategy_name)
             .first()
         )
-
         if not performance:
-            # Initialize a new performance record with default values
             performance = StrategyPerformance(
                 strategy_name=strategy_name,
                 total_games=0,
@@ -43,40 +208,218 @@ class StrategyStats:
                 avg_score_per_round=0.0,
                 avg_cooperation_rate=0.0
             )
-            self.db.add(performance)
-            self.db.commit()  # Commit to ensure the record exists
+            db.add(performance)
 
-        # Update performance metrics
-        performance.total_games += 1
-        performance.total_score += normalized_score
+        previous_games = performance.total_games
+        performance.total_games += games
+        performance.total_score += score_sum
         performance.avg_score_per_round = performance.total_score / performance.total_games
 
-        # Update cooperation rate as moving average
-        if cooperation_rate is not None:
-            current_total = performance.avg_cooperation_rate * (performance.total_games - 1)
-            performance.avg_cooperation_rate = (current_total + cooperation_rate) / performance.total_games
-
+        current_total = performance.avg_cooperation_rate * (previous_games + games - coop_seen)
+        performance.avg_cooperation_rate = (current_total + coop_sum) / performance.total_games
         performance.last_updated = datetime.utcnow()
-        self.db.commit()
 
     def get_average_scores(self) -> Dict[str, float]:
         """Get average normalized scores for each strategy"""
-        performances = self.db.query(StrategyPerformance).all()
-        return {p.strategy_name: p.avg_score_per_round for p in performances}
+        self.flush()
+        if self.results_store is not None:
+            return {name: averages['avg_score_per_round']
+                    for name, averages in self.results_store.strategy_averages().items()}
+        with db_session() as db:
+            performances = db.query(StrategyPerformance).all()
+            return {p.strategy_name: p.avg_score_per_round for p in performances}
 
+    @timed('stats.record_game')
     def record_game(self, results: Dict, strategy1_name: str, strategy2_name: str):
         """Record a complete game in the database"""
-        game = Game(
-            strategy1_name=strategy1_name,
-            strategy2_name=strategy2_name,
-            score1=results['final_score1'],
-            score2=results['final_score2'],
-            total_rounds=results['total_rounds'],
-            cooperation_rate1=results['cooperation_rate1'],
-            cooperation_rate2=results['cooperation_rate2']
+        if self.write_behind:
+            self._queue_game(results, strategy1_name, strategy2_name)
+            return
+
+        row = self._game_row(results, strategy1_name, strategy2_name)
+        if self.results_store is not None:
+            # Written at once, as the games' performance updates are committed at once
+            self.results_store.append([row])
+            self.results_store.flush()
+        else:
+            with db_session() as db:
+                db.add(Game(**row))
+                self._add_to_matchup_summary(db, [row])
+        _bump_data_version()
+
+    def record_games(self, strategy1_name: str, strategy2_name: str, games: Iterable[Dict]) -> int:
+        """
+        Record a series of games between two strategies, updating both
+        strategies' performance as well.
+
+        Args:
+            strategy1_name: Name of the row strategy
+            strategy2_name: Name of the column strategy
+            games: Game result dicts (final scores, cooperation rates, total rounds)
+
+        Returns:
+            int: Number of games recorded
+        """
+        if self.results_store is not None and not self.write_behind:
+            # One store file for the series rather than one per game, written
+            # before the performance updates so a crash cannot keep the counts
+            # of games that were lost
+            games = list(games)
+            self.results_store.append([self._game_row(results, strategy1_name, strategy2_name)
+                                       for results in games])
+            self.results_store.flush()
+            for results in games:
+                self.update_stats(strategy1_name, results['final_score1'], results['total_rounds'],
+                                  results['cooperation_rate1'])
+                self.update_stats(strategy2_name, results['final_score2'], results['total_rounds'],
+                                  results['cooperation_rate2'])
+            return len(games)
+
+        recorded = 0
+        for results in games:
+            self.update_stats(strategy1_name, results['final_score1'], results['total_rounds'],
+                              results['cooperation_rate1'])
+            self.update_stats(strategy2_name, results['final_score2'], results['total_rounds'],
+                              results['cooperation_rate2'])
+            self.record_game(results, strategy1_name, strategy2_name)
+            recorded += 1
+        return recorded
+
+    def _game_row(self, results: Dict, strategy1_name: str, strategy2_name: str) -> Dict:
+        return {
+            'strategy1_name': strategy1_name,
+            'strategy2_name': strategy2_name,
+            'score1': results['final_score1'],
+            'score2': results['final_score2'],
+            'total_rounds': results['total_rounds'],
+            'cooperation_rate1': results['cooperation_rate1'],
+            'cooperation_rate2': results['cooperation_rate2'],
+            'timestamp': datetime.utcnow()
+        }
+
+    def _queue_game(self, results: Dict, strategy1_name: str, strategy2_name: str):
+        with self._lock:
+            self._pending_games.append(self._game_row(results, strategy1_name, strategy2_name))
+            self._mark_pending()
+
+    def _add_to_matchup_summary(self, db, rows: List[Dict]):
+        """Add game rows to the running pairing totals in db's current transaction."""
+        totals = {}
+        for row in rows:
+            key = (row['strategy1_name'], row['strategy2_name'])
+            pair = totals.setdefault(key, dict.fromkeys(_SUMMARY_SUMS, 0))
+            score1, score2 = row['score1'], row['score2']
+            cooperation1, cooperation2 = row['cooperation_rate1'], row['cooperation_rate2']
+            pair['game_count'] += 1
+            pair['round_count'] += row['total_rounds']
+            pair['score1_sum'] += score1
+            pair['score1_sq_sum'] += score1 * score1
+            pair['score2_sum'] += score2
+            pair['score2_sq_sum'] += score2 * score2
+            pair['normalized_score1_sum'] += score1 / row['total_rounds'] * 100
+            pair['normalized_score2_sum'] += score2 / row['total_rounds'] * 100
+            pair['cooperation1_sum'] += cooperation1
+            pair['cooperation1_sq_sum'] += cooperation1 * cooperation1
+            pair['cooperation2_sum'] += cooperation2
+            pair['cooperation2_sq_sum'] += cooperation2 * cooperation2
+
+        dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        now = datetime.utcnow()
+        if dialect_insert is None:
+            for (strategy1_name, strategy2_name), pair in totals.items():
+                self._update_matchup_summary_row(db, strategy1_name, strategy2_name, pair, now)
+            return
+
+        # One upsert per pairing, whose increments the database adds to the row's current totals
+        table = MatchupSummary.__table__
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.strategy1_name, table.c.strategy2_name],
+            set_={
+                **{column: table.c[column] + statement.excluded[column] for column in _SUMMARY_SUMS},
+                'last_updated': statement.excluded.last_updated
+            }
         )
-        self.db.add(game)
-        self.db.commit()
+        db.execute(statement, [
+            dict(pair, strategy1_name=strategy1_name, strategy2_name=strategy2_name, last_updated=now)
+            for (strategy1_name, strategy2_name), pair in totals.items()
+        ])
+
+    def _update_matchup_summary_row(self, db, strategy1_name: str, strategy2_name: str,
+                                    pair: Dict[str, float], now: datetime):
+        """Get-or-create fallback of _add_to_matchup_summary for dialects without upserts."""
+        summary = (
+            db.query(MatchupSummary)
+            .filter(MatchupSummary.strategy1_name == strategy1_name,
+                    MatchupSummary.strategy2_name == strategy2_name)
+            .first()
+        )
+        if not summary:
+            summary = MatchupSummary(strategy1_name=strategy1_name, strategy2_name=strategy2_name,
+                                     **dict.fromkeys(_SUMMARY_SUMS, 0))
+            db.add(summary)
+        for column, value in pair.items():
+            setattr(summary, column, getattr(summary, column) + value)
+        summary.last_updated = now
+
+    def _mark_pending(self):
+        """Start the flush timer on the first queued write and flush when due."""
+        now = time.perf_counter()
+        if self._pending_since is None:
+            self._pending_since = now
+        if (len(self._pending_games) >= self.flush_every
+                or (now - self._pending_since) * 1000 >= self.flush_interval_ms):
+            self.flush()
+
+    @timed('stats.flush')
+    def flush(self):
+        """Write all queued games and stat updates in a single transaction."""
+        with self._lock:
+            if not self._pending_games and not self._pending_stats:
+                return
+
+            started = time.perf_counter()
+            flushed = len(self._pending_games)
+            if self._pending_games and self.results_store is not None:
+                # Stored before the performance updates, as in record_games; once
+                # stored the games leave the queue, so a failed update cannot
+                # store them twice, and a failed store leaves both queued
+                self.results_store.append(self._pending_games)
+                self.results_store.flush()
+                self._pending_games = []
+            with db_session() as db:
+                if self._pending_games:
+                    db.execute(insert(Game), self._pending_games)
+                    self._add_to_matchup_summary(db, self._pending_games)
+
+                for strategy_name, (games, score_sum, coop_sum, coop_seen) in self._pending_stats.items():
+                    self._upsert_performance(db, strategy_name, games, score_sum, coop_sum, coop_seen)
+
+            self._flush_latencies_ms.append((time.perf_counter() - started) * 1000)
+            self._flush_count += 1
+            self._games_flushed += flushed
+            self._pending_games = []
+            self._pending_stats = {}
+            self._pending_since = None
+        _bump_data_version()
+
+    def write_behind_stats(self) -> Dict[str, float]:
+        """
+        Report write-behind queue depth and flush latency.
+
+        Returns:
+            Dict: queue_depth (queued games), flushes, games_flushed, and
+                last/avg/max flush latency in milliseconds over recent flushes
+        """
+        latencies = self._flush_latencies_ms
+        return {
+            'queue_depth': len(self._pending_games),
+            'flushes': self._flush_count,
+            'games_flushed': self._games_flushed,
+            'last_flush_ms': latencies[-1] if latencies else 0.0,
+            'avg_flush_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+            'max_flush_ms': max(latencies) if latencies else 0.0
+        }
 
     def get_all_games(self) -> list:
         """
@@ -92,22 +435,150 @@ class StrategyStats:
                 - cooperation_rate2: Second player's cooperation rate
                 - total_rounds: Number of rounds played
         """
-        games = self.db.query(Game).all()
-        return [{
-            'player1': game.strategy1_name,
-            'player2': game.strategy2_name,
-            'score1': game.score1,
-            'score2': game.score2,
-            'cooperation_rate1': game.cooperation_rate1,
-            'cooperation_rate2': game.cooperation_rate2,
-            'total_rounds': game.total_rounds
-        } for game in games]
+        self.flush()
+        if self.results_store is not None:
+            return [{
+                'player1': row['strategy1_name'],
+                'player2': row['strategy2_name'],
+                'score1': row['score1'],
+                'score2': row['score2'],
+                'cooperation_rate1': row['cooperation_rate1'],
+                'cooperation_rate2': row['cooperation_rate2'],
+                'total_rounds': row['total_rounds']
+            } for row in self.results_store.read_table().to_pylist()]
+        with db_session() as db:
+            games = db.query(Game).all()
+            return [{
+                'player1': game.strategy1_name,
+                'player2': game.strategy2_name,
+                'score1': game.score1,
+                'score2': game.score2,
+                'cooperation_rate1': game.cooperation_rate1,
+                'cooperation_rate2': game.cooperation_rate2,
+                'total_rounds': game.total_rounds
+            } for game in games]
+
+    def get_pairwise_matrix(self, strategy_names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Per-pairing aggregates of all recorded games, read from matchup_summary
+        (or scanned from the results store).
+
+        Args:
+            strategy_names: Strategies to include; None includes every recorded one
+
+        Returns:
+            Dict: Nested matrices indexed as matrix[strategy1][strategy2]:
+                - score: Mean final score of strategy1
+                - score_std: Standard deviation of strategy1's final score
+                - cooperation: Mean cooperation rate of strategy1 (0-1)
+                - count: Number of recorded games
+                Pairings without games are 0 in every matrix.
+        """
+        self.flush()
+        if self.results_store is not None:
+            return self.results_store.pairwise_matrix(strategy_names)
+        with db_session() as db:
+            query = db.query(MatchupSummary)
+            if strategy_names is not None:
+                query = query.filter(
+                    MatchupSummary.strategy1_name.in_(strategy_names),
+                    MatchupSummary.strategy2_name.in_(strategy_names)
+                )
+            summaries = query.all()
+
+        if strategy_names is None:
+            strategy_names = sorted({name for summary in summaries
+                                     for name in (summary.strategy1_name, summary.strategy2_name)})
+        matrices = {
+            key: {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
+            for key in ('score', 'score_std', 'cooperation', 'count')
+        }
+        for summary in summaries:
+            if not summary.game_count:
+                continue
+            s1, s2, count = summary.strategy1_name, summary.strategy2_name, summary.game_count
+            mean_score = summary.score1_sum / count
+            variance = max(summary.score1_sq_sum / count - mean_score * mean_score, 0.0)
+            matrices['score'][s1][s2] = mean_score
+            matrices['score_std'][s1][s2] = math.sqrt(variance)
+            matrices['cooperation'][s1][s2] = summary.cooperation1_sum / count
+            matrices['count'][s1][s2] = count
+        return matrices
+
+    def get_matchup_averages(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per-strategy averages over every recorded game, read from matchup_summary
+        (or scanned from the results store).
+
+        Returns:
+            Dict: strategy_name -> {'avg_score_per_round' (normalized to 100
+                rounds), 'avg_cooperation_rate', 'total_games'}
+        """
+        self.flush()
+        if self.results_store is not None:
+            return self.results_store.strategy_averages()
+        with db_session() as db:
+            summaries = db.query(MatchupSummary).all()
+        totals = {}
+        for summary in summaries:
+            for name, score_sum, cooperation_sum in (
+                (summary.strategy1_name, summary.normalized_score1_sum, summary.cooperation1_sum),
+                (summary.strategy2_name, summary.normalized_score2_sum, summary.cooperation2_sum)
+            ):
+                total = totals.setdefault(name, [0, 0.0, 0.0])
+                total[0] += summary.game_count
+                total[1] += score_sum
+                total[2] += cooperation_sum
+        return {
+            name: {
+                'avg_score_per_round': score_sum / games,
+                'avg_cooperation_rate': cooperation_sum / games,
+                'total_games': games
+            }
+            for name, (games, score_sum, cooperation_sum) in totals.items() if games
+        }
+
+    def rebuild_matchup_summary(self) -> int:
+        """
+        Recompute matchup_summary from the games table in one aggregate pass.
+
+        Returns:
+            int: Number of pairings written
+        """
+        self.flush()
+        with db_session() as db:
+            rebuild_matchup_summary(db)
+        _bump_data_version()
+        with db_session() as db:
+            return db.query(MatchupSummary).count()
 
     def clear_all_stats(self):
         """
         Clears all historical game data from the database.
         """
+        with self._lock:
+            self._pending_games = []
+            self._pending_stats = {}
+            self._pending_since = None
+        if self.results_store is not None:
+            self.results_store.clear()
         with db_session() as session:
             session.query(Game).delete()
+            session.query(MatchupSummary).delete()
             session.query(StrategyPerformance).delete()
-            session.commit()
\ No newline at end of file
+        _bump_data_version()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strategy statistics maintenance")
+    parser.add_argument(
+        "command",
+        choices=["rebuild-matchup-summary"],
+        help="rebuild-matchup-summary: recompute per-pairing totals from the games table"
+    )
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "rebuild-matchup-summary":
+        pairings = StrategyStats().rebuild_matchup_summary()
+        print(f"Rebuilt matchup summary for {pairings} pairings")
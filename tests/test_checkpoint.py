@@ -0,0 +1,275 @@
+"""
+Tests of checkpointed tournaments: cancelled runs and jobs resume to the
+results of an uninterrupted run, and a run is owned by one tournament.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+os.environ.setdefault('STRATEGY_CACHE_PATH', ':memory:')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import numpy as np
+
+from checkpoint import CheckpointInUse, TournamentCheckpoint
+from game_logic import PrisonersDilemma
+from jobs import CANCELLED, COMPLETED, INTERRUPTED, RUNNING, JobRunner, TournamentJob
+from strategies import AlwaysCooperate, AlwaysDefect, RandomStrategy, TitForTat, build_strategy
+from tournament import TournamentCancelled, TournamentConfig, run_round_robin
+
+# A job ID in the form JobRunner.submit hands out, for jobs written by the tests
+LOST_JOB_ID = '0123456789ab'
+
+MODES = {
+    'default': {},
+    'exact_memory_one': {'exact_memory_one': True},
+    'adaptive': {'adaptive': True, 'min_games': 10, 'max_games': 60, 'batch_games': 10,
+                 'ci_half_width': 0.2}
+}
+
+
+def tournament_strategies():
+    three_two = build_strategy(('custom', 'Three Two', 'Three Two', 'three two', {
+        "type": "sequence", "pattern": {"cooperate_count": 3, "defect_count": 2}
+    }))
+    return [TitForTat(), AlwaysCooperate(), AlwaysDefect(), RandomStrategy(), three_two]
+
+
+class CheckpointTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'checkpoint.jsonl')
+        self.game = PrisonersDilemma()
+        self.strategies = tournament_strategies()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def assert_same_results(self, first, second):
+        self.assertEqual(first.score_matrix, second.score_matrix)
+        self.assertEqual(first.coop_matrix, second.coop_matrix)
+        self.assertEqual(first.expected, second.expected)
+        self.assertEqual(first.sampling, second.sampling)
+        self.assertEqual(set(first.games), set(second.games))
+        for pairing, games in first.games.items():
+            np.testing.assert_array_equal(games, second.games[pairing])
+
+    def run_cancelled(self, config, label, after=3):
+        """Run a tournament that is cancelled once `after` pairings have finished."""
+        cancel_event = threading.Event()
+        finished = []
+
+        def on_pairing(strategy1_name, strategy2_name, averages):
+            finished.append((strategy1_name, strategy2_name))
+            if len(finished) >= after:
+                cancel_event.set()
+
+        with self.assertRaises(TournamentCancelled):
+            run_round_robin(self.strategies, self.game, config, pairing_callback=on_pairing,
+                            cancel_event=cancel_event, checkpoint_label=label)
+
+    def recorded_entropy(self):
+        with open(self.path) as checkpoint_file:
+            starts = [record for record in map(json.loads, checkpoint_file) if record['type'] == 'start']
+        self.assertEqual(len(starts), 1)
+        return starts[0]['entropy']
+
+
+class TestResume(CheckpointTestCase):
+    def test_cancelled_run_resumes_to_uninterrupted_results(self):
+        for mode, settings in MODES.items():
+            for workers in (1, 2):
+                with self.subTest(mode=mode, workers=workers):
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                    # Unseeded, so the resumed run must reuse the recorded entropy
+                    config = TournamentConfig(num_games=30, workers=workers, checkpoint=self.path,
+                                              **settings)
+                    self.run_cancelled(config, 'run')
+                    entropy = self.recorded_entropy()
+
+                    resumed = run_round_robin(self.strategies, self.game, config,
+                                              checkpoint_label='run')
+                    uninterrupted = run_round_robin(
+                        self.strategies, self.game,
+                        TournamentConfig(num_games=30, workers=workers, seed=entropy, **settings)
+                    )
+                    self.assertGreater(resumed.resumed, 0)
+                    self.assert_same_results(resumed, uninterrupted)
+                    resumed.complete_checkpoint()
+                    self.assertTrue(TournamentCheckpoint.for_run(
+                        self.path, self.strategies, self.game, config, 'run').completed())
+
+    def test_completed_run_is_not_resumed(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        run_round_robin(self.strategies, self.game, config, checkpoint_label='run').complete_checkpoint()
+        again = run_round_robin(self.strategies, self.game, config, checkpoint_label='run')
+        self.assertEqual(again.resumed, 0)
+
+    def test_results_not_yet_saved_can_be_recovered(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        first = run_round_robin(self.strategies, self.game, config, checkpoint_label='run')
+        # The caller stopped before saving the results and completing the run
+        again = run_round_robin(self.strategies, self.game, config, checkpoint_label='run')
+        self.assertEqual(again.resumed, len(self.strategies) * (len(self.strategies) + 1) // 2)
+        self.assert_same_results(first, again)
+        self.assertFalse(TournamentCheckpoint.for_run(
+            self.path, self.strategies, self.game, config, 'run').completed())
+
+    def test_runs_with_distinct_labels_are_independent(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        self.run_cancelled(config, 'first')
+        other = run_round_robin(self.strategies, self.game, config, checkpoint_label='second')
+        self.assertEqual(other.resumed, 0)
+        resumed = run_round_robin(self.strategies, self.game, config, checkpoint_label='first')
+        self.assertGreater(resumed.resumed, 0)
+
+
+class TestExpiry(CheckpointTestCase):
+    def checkpoint(self, label, max_age=3600):
+        return TournamentCheckpoint(self.path, label, max_age=max_age)
+
+    def test_stale_runs_are_dropped(self):
+        abandoned = self.checkpoint('abandoned')
+        abandoned.resume(1)
+        abandoned.release()
+        finished = self.checkpoint('finished')
+        finished.resume(2)
+        finished.complete()
+        recent = self.checkpoint('recent')
+        recent.resume(3)
+        recent.release()
+        live = self.checkpoint('live')
+        live.resume(4)
+
+        with open(self.path) as checkpoint_file:
+            records = [json.loads(line) for line in checkpoint_file]
+        for record in records:
+            if record['run'] != 'recent':
+                record['time'] -= 7200
+        with open(self.path, 'w') as checkpoint_file:
+            checkpoint_file.writelines(json.dumps(record) + '\n' for record in records)
+
+        self.checkpoint('another').complete()
+        with open(self.path) as checkpoint_file:
+            runs = {json.loads(line)['run'] for line in checkpoint_file}
+        self.assertEqual(runs, {'recent', 'live', 'another'})
+        self.assertEqual(live.resume(5)[0], 4)
+        live.release()
+
+
+class TestOwnership(CheckpointTestCase):
+    def test_live_run_is_refused(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        owner = TournamentCheckpoint.for_run(self.path, self.strategies, self.game, config, 'run')
+        owner.resume(1234)
+        with self.assertRaises(CheckpointInUse):
+            run_round_robin(self.strategies, self.game, config, checkpoint_label='run')
+        # Other runs in the same file are not held up
+        run_round_robin(self.strategies, self.game, config, checkpoint_label='other')
+
+        owner.release()
+        result = run_round_robin(self.strategies, self.game, config, checkpoint_label='run')
+        self.assertEqual(result.resumed, 0)
+        self.assertFalse(os.path.exists(owner.lock_path))
+
+    def test_cancelled_run_releases_its_lock(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        self.run_cancelled(config, 'run')
+        owner = TournamentCheckpoint.for_run(self.path, self.strategies, self.game, config, 'run')
+        self.assertFalse(os.path.exists(owner.lock_path))
+        owner.resume(1234)
+        owner.release()
+
+    def test_second_run_is_refused_while_the_first_plays(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        playing = threading.Event()
+        attempted = threading.Event()
+        outcomes = []
+
+        def on_pairing(strategy1_name, strategy2_name, averages):
+            playing.set()
+            attempted.wait(10)
+
+        def run_first():
+            result = run_round_robin(self.strategies, self.game, config, pairing_callback=on_pairing,
+                                     checkpoint_label='run')
+            outcomes.append(result.resumed)
+
+        first = threading.Thread(target=run_first)
+        first.start()
+        self.assertTrue(playing.wait(10))
+        try:
+            with self.assertRaises(CheckpointInUse):
+                run_round_robin(tournament_strategies(), self.game, config, checkpoint_label='run')
+        finally:
+            attempted.set()
+            first.join()
+        self.assertEqual(outcomes, [0])
+
+
+class TestJobResume(CheckpointTestCase):
+    def setUp(self):
+        super().setUp()
+        self.runner = JobRunner(self.game, path=os.path.join(self.root, 'jobs'))
+
+    def test_cancelled_job_resumes_to_uninterrupted_results(self):
+        config = TournamentConfig(num_games=3000, seed=9, checkpoint=self.path)
+        job_id = self.runner.submit(self.strategies, config)
+        deadline = time.time() + 60
+        while (self.runner.get(job_id)['pairings_done'] < 2 and time.time() < deadline):
+            time.sleep(0.001)
+        self.assertTrue(self.runner.cancel(job_id))
+        cancelled = self.runner.wait(job_id)
+        self.assertEqual(cancelled['status'], CANCELLED)
+        self.assertLess(cancelled['pairings_done'], cancelled['pairings_total'])
+
+        resumed_id = self.runner.resume(job_id, tournament_strategies())
+        resumed = self.runner.wait(resumed_id)
+        self.assertEqual(resumed['status'], COMPLETED)
+        self.assertEqual(resumed['checkpoint_label'], job_id)
+        uninterrupted = run_round_robin(self.strategies, self.game,
+                                        TournamentConfig(num_games=3000, seed=9))
+        self.assertEqual(resumed['score_matrix'], uninterrupted.score_matrix)
+        self.assertEqual(resumed['coop_matrix'], uninterrupted.coop_matrix)
+
+    def test_jobs_get_their_own_runs(self):
+        config = TournamentConfig(num_games=20, checkpoint=self.path)
+        first = self.runner.submit(self.strategies, config)
+        second = self.runner.submit(self.strategies, config)
+        self.assertNotEqual(self.runner.wait(first)['checkpoint_label'],
+                            self.runner.wait(second)['checkpoint_label'])
+
+    def test_job_saved_while_running_is_interrupted(self):
+        job = TournamentJob(LOST_JOB_ID, self.strategies, TournamentConfig(num_games=20, seed=3),
+                            checkpoint_label=LOST_JOB_ID, status=RUNNING)
+        self.runner._save(job)
+        restarted = JobRunner(self.game, path=self.runner.path)
+        self.assertEqual(restarted.get(LOST_JOB_ID)['status'], INTERRUPTED)
+
+        resumed_id = restarted.resume(LOST_JOB_ID, tournament_strategies())
+        self.assertEqual(restarted.wait(resumed_id)['status'], COMPLETED)
+
+    def test_only_stopped_jobs_resume(self):
+        job_id = self.runner.submit(self.strategies, TournamentConfig(num_games=20))
+        self.runner.wait(job_id)
+        with self.assertRaises(ValueError):
+            self.runner.resume(job_id, self.strategies)
+        with self.assertRaises(ValueError):
+            self.runner.resume('unknown', self.strategies)
+
+    def test_missing_strategies_are_reported(self):
+        job = TournamentJob(LOST_JOB_ID, self.strategies, TournamentConfig(num_games=20),
+                            status=CANCELLED)
+        self.runner._save(job)
+        with self.assertRaises(ValueError):
+            self.runner.resume(LOST_JOB_ID, self.strategies[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests that deterministic pairings scored from their detected play cycle match
+playing every round.
+"""
+
+import os
+import unittest
+
+os.environ.setdefault('STRATEGY_CACHE_PATH', ':memory:')
+
+import numpy as np
+
+from game_logic import GameCycle, PrisonersDilemma
+from strategies import AlwaysCooperate, AlwaysDefect, TitForTat, build_strategy
+
+MAX_ROUNDS = 1000
+
+# Interpreted patterns covering periodic, reactive and constant play
+PATTERNS = {
+    'Three Two': {"type": "sequence", "pattern": {"cooperate_count": 3, "defect_count": 2}},
+    'Alternate': {"type": "sequence", "pattern": {"cooperate_count": 1, "defect_count": 1}},
+    'Slow Defector': {"type": "sequence", "pattern": {"cooperate_count": 7, "defect_count": 4}},
+    'Patient Copycat': {"type": "conditional",
+                        "pattern": {"condition": "last_opponent_move", "initial_cooperation": 4}},
+    'Copycat': {"type": "conditional",
+                "pattern": {"condition": "last_opponent_move", "initial_cooperation": 0}},
+    'Pattern Defector': {"type": "simple", "pattern": {"action": "defect"}}
+}
+
+
+def deterministic_strategies():
+    """Fresh instances of every deterministic built-in and interpreted strategy."""
+    strategies = [TitForTat(), AlwaysCooperate(), AlwaysDefect()]
+    for name, pattern in PATTERNS.items():
+        strategies.append(build_strategy(('custom', name, name, name.lower(), pattern)))
+    return strategies
+
+
+def play_rounds(game, strategy1, strategy2, rounds):
+    """Per-round payoffs and moves of a game played round by round."""
+    payoffs = np.zeros((rounds, 2))
+    moves = np.zeros((rounds, 2), dtype=bool)
+    for round_index in range(rounds):
+        payoffs[round_index] = game.play_round(strategy1, strategy2)
+        moves[round_index] = strategy1.history.last, strategy2.history.last
+    return payoffs, moves
+
+
+class TestGameCycle(unittest.TestCase):
+    def setUp(self):
+        self.game = PrisonersDilemma()
+        self.game.cache_matchups = False
+        self.strategies = deterministic_strategies()
+
+    def test_cycle_totals_match_full_play_at_every_length(self):
+        lengths = np.arange(1, MAX_ROUNDS + 1)
+        for template1 in self.strategies:
+            for template2 in self.strategies:
+                with self.subTest(strategy1=template1.name, strategy2=template2.name):
+                    cycle = self.game.find_cycle(type(template1)(), type(template2)(), MAX_ROUNDS)
+                    self.assertIsNotNone(cycle)
+                    payoffs, moves = play_rounds(self.game, type(template1)(), type(template2)(),
+                                                 MAX_ROUNDS)
+                    totals = cycle.totals(lengths)
+                    np.testing.assert_array_equal(totals['final_score1'], np.cumsum(payoffs[:, 0]))
+                    np.testing.assert_array_equal(totals['final_score2'], np.cumsum(payoffs[:, 1]))
+                    np.testing.assert_allclose(totals['cooperation_rate1'],
+                                               np.cumsum(moves[:, 0]) / lengths)
+                    np.testing.assert_allclose(totals['cooperation_rate2'],
+                                               np.cumsum(moves[:, 1]) / lengths)
+                    np.testing.assert_array_equal(totals['total_rounds'], lengths)
+
+    def test_cycle_is_found_before_the_cap(self):
+        for template1 in self.strategies:
+            for template2 in self.strategies:
+                with self.subTest(strategy1=template1.name, strategy2=template2.name):
+                    cycle = self.game.find_cycle(type(template1)(), type(template2)(), MAX_ROUNDS)
+                    self.assertGreater(cycle.period, 0)
+                    self.assertLess(cycle.start + cycle.period, 100)
+
+    def test_round_trip_through_dict(self):
+        cycle = self.game.find_cycle(type(self.strategies[3])(), TitForTat(), MAX_ROUNDS)
+        restored = GameCycle.from_dict(cycle.to_dict())
+        lengths = np.arange(1, MAX_ROUNDS + 1)
+        for name, values in cycle.totals(lengths).items():
+            np.testing.assert_array_equal(restored.totals(lengths)[name], values)
+
+    def test_summary_only_game_matches_full_game(self):
+        for template1 in self.strategies:
+            for template2 in self.strategies:
+                for rounds in (1, 2, 5, 37, 1000):
+                    with self.subTest(strategy1=template1.name, strategy2=template2.name,
+                                      rounds=rounds):
+                        summary = self.game.run_tournament(type(template1)(), type(template2)(),
+                                                           summary_only=True, num_rounds=rounds)
+                        full = self.game.run_tournament(type(template1)(), type(template2)(),
+                                                        num_rounds=rounds)
+                        for name, value in summary.items():
+                            self.assertAlmostEqual(value, full[name], places=9)
+
+    def test_summary_only_batch_matches_played_batch(self):
+        for cache_matchups in (False, True):
+            self.game.cache_matchups = cache_matchups
+            for template1 in self.strategies:
+                for template2 in self.strategies:
+                    with self.subTest(strategy1=template1.name, strategy2=template2.name,
+                                      cache_matchups=cache_matchups):
+                        summary = self.game.run_batch(template1, template2, 200,
+                                                      np.random.default_rng(7), summary_only=True)
+                        played = self.game.run_batch(type(template1)(), type(template2)(), 200,
+                                                     np.random.default_rng(7))
+                        for name, values in summary.items():
+                            np.testing.assert_allclose(values, played[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Tests of interpretation cache keys: equivalent descriptions share a key and
+descriptions that mean different things do not.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from interpretation_cache import _KEY_VERSION, InterpretationCache, canonicalize
+
+
+class TestCanonicalize(unittest.TestCase):
+    def test_equivalent_descriptions_share_a_key(self):
+        self.assertEqual(canonicalize("Cooperate ten rounds, then defect ten rounds"),
+                         canonicalize("cooperate 10 moves then defect 10 moves"))
+        self.assertEqual(canonicalize("Copy the opponent's last move"),
+                         canonicalize("copy opponent last move"))
+
+    def test_whose_move_is_copied_is_kept(self):
+        self.assertNotEqual(canonicalize("copy my last move"), canonicalize("copy their last move"))
+        self.assertNotEqual(canonicalize("repeat his last move"), canonicalize("repeat my last move"))
+
+    def test_order_of_events_is_kept(self):
+        self.assertNotEqual(canonicalize("cooperate after defecting"),
+                            canonicalize("cooperate then defect"))
+
+
+class TestKeyVersion(unittest.TestCase):
+    def test_entries_under_older_keys_are_discarded(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'cache.db')
+            InterpretationCache(path).put("copy my last move", {"type": "simple"})
+            with sqlite3.connect(path) as conn:
+                conn.execute(f"PRAGMA user_version = {_KEY_VERSION - 1}")
+
+            cache = InterpretationCache(path)
+            self.assertIsNone(cache.get("copy my last move"))
+            cache.put("copy my last move", {"type": "simple"})
+            self.assertEqual(InterpretationCache(path).get("copy my last move"), {"type": "simple"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests of the background tournament queue: job IDs, progress shared through
+the job files, and process pools started from job threads.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('STRATEGY_CACHE_PATH', ':memory:')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from game_logic import PrisonersDilemma
+from jobs import COMPLETED, FINISHED, RUNNING, JobRunner
+from strategies import AlwaysCooperate, AlwaysDefect, RandomStrategy, TitForTat
+from tournament import TournamentConfig, _pool_context
+
+
+def job_strategies():
+    return [TitForTat(), AlwaysCooperate(), AlwaysDefect(), RandomStrategy()]
+
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'jobs')
+        self.runner = JobRunner(PrisonersDilemma(), path=self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_only_job_ids_name_job_files(self):
+        outside = os.path.join(self.root, 'outside.json')
+        with open(outside, 'w') as outside_file:
+            outside_file.write('{"status": "cancelled"}')
+        for job_id in ('../outside', '../../etc/passwd', '', 'ABCDEF012345', '0123456789ab/'):
+            with self.subTest(job_id=job_id):
+                self.assertIsNone(self.runner.get(job_id))
+                with self.assertRaises(ValueError):
+                    self.runner.resume(job_id, job_strategies())
+
+    def test_progress_is_visible_to_other_runners(self):
+        other = JobRunner(PrisonersDilemma(), path=self.path)
+        with mock.patch('jobs.PROGRESS_SAVE_SECONDS', 0):
+            job_id = self.runner.submit(job_strategies(), TournamentConfig(num_games=3000))
+            seen = None
+            deadline = time.time() + 60
+            while time.time() < deadline:
+                state = other.get(job_id)
+                if state is not None and (state['pairings_done'] or state['status'] in FINISHED):
+                    seen = state
+                    break
+                time.sleep(0.001)
+            self.runner.cancel(job_id)
+            self.runner.wait(job_id)
+        self.assertIsNotNone(seen)
+        self.assertEqual(seen['status'], RUNNING)
+        self.assertGreater(seen['pairings_done'], 0)
+
+    def test_pooled_job_completes(self):
+        job_id = self.runner.submit(job_strategies(), TournamentConfig(num_games=30, workers=2, seed=4))
+        self.assertEqual(self.runner.wait(job_id, timeout=120)['status'], COMPLETED)
+
+    def test_pools_off_the_main_thread_do_not_fork(self):
+        self.assertIsNone(_pool_context())
+        contexts = []
+        thread = threading.Thread(target=lambda: contexts.append(_pool_context()))
+        thread.start()
+        thread.join()
+        self.assertIn(contexts[0].get_start_method(), ('forkserver', 'spawn'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests that exact Markov-chain evaluation of memory-one pairings agrees with
+simulated games.
+"""
+
+import os
+import unittest
+
+os.environ.setdefault('STRATEGY_CACHE_PATH', ':memory:')
+
+import numpy as np
+
+from game_logic import PrisonersDilemma
+from markov import MemoryOne, expected_game, length_distribution, transition_matrix
+from strategies import AlwaysCooperate, AlwaysDefect, RandomStrategy, TitForTat, build_strategy
+
+GAMES = 20000
+BATCH_GAMES = 2000
+# Allowed distance of the simulated mean from the exact value, in standard errors
+STANDARD_ERRORS = 4.5
+
+FIELDS = ('final_score1', 'final_score2', 'cooperation_rate1', 'cooperation_rate2', 'total_rounds')
+
+
+def memory_one_strategies():
+    """Fresh instances of every strategy with a memory-one description."""
+    copycat = build_strategy(('custom', 'Copycat', 'Copycat', 'copycat', {
+        "type": "conditional", "pattern": {"condition": "last_opponent_move", "initial_cooperation": 1}
+    }))
+    return [TitForTat(), AlwaysCooperate(), AlwaysDefect(), RandomStrategy(), copycat]
+
+
+def simulate(game, strategy1, strategy2, seed):
+    """Per-game summaries of GAMES simulated games of one pairing."""
+    rng = np.random.default_rng(seed)
+    batches = [game.run_batch(strategy1, strategy2, BATCH_GAMES, rng, summary_only=True)
+               for _ in range(GAMES // BATCH_GAMES)]
+    return {name: np.concatenate([batch[name] for batch in batches]).astype(float)
+            for name in FIELDS}
+
+
+class TestExpectedGame(unittest.TestCase):
+    def setUp(self):
+        self.game = PrisonersDilemma()
+        self.game.cache_matchups = False
+        self.strategies = memory_one_strategies()
+
+    def test_exact_results_agree_with_monte_carlo(self):
+        for index1, strategy1 in enumerate(self.strategies):
+            for index2, strategy2 in enumerate(self.strategies):
+                with self.subTest(strategy1=strategy1.name, strategy2=strategy2.name):
+                    exact = expected_game(self.game, strategy1.memory_one(), strategy2.memory_one())
+                    simulated = simulate(self.game, strategy1, strategy2, [index1, index2])
+                    for name in FIELDS:
+                        values = simulated[name]
+                        standard_error = values.std(ddof=1) / np.sqrt(len(values))
+                        self.assertLessEqual(abs(values.mean() - exact[name]),
+                                             STANDARD_ERRORS * standard_error + 1e-9, name)
+
+    def test_deterministic_pairs_match_length_weighted_cycles(self):
+        lengths = np.arange(1, self.game.MAX_ITERATIONS + 1)
+        weights = length_distribution(self.game.END_PROBABILITY, self.game.MAX_ITERATIONS)
+        deterministic = [s for s in self.strategies if s.state() is not None]
+        for strategy1 in deterministic:
+            for strategy2 in deterministic:
+                with self.subTest(strategy1=strategy1.name, strategy2=strategy2.name):
+                    exact = expected_game(self.game, strategy1.memory_one(), strategy2.memory_one())
+                    cycle = self.game.find_cycle(type(strategy1)(), type(strategy2)(),
+                                                 self.game.MAX_ITERATIONS)
+                    totals = cycle.totals(lengths)
+                    for name in FIELDS:
+                        self.assertAlmostEqual(exact[name], float(weights @ totals[name]), places=9)
+
+    def test_length_distribution_matches_capped_geometric(self):
+        weights = length_distribution(self.game.END_PROBABILITY, self.game.MAX_ITERATIONS)
+        self.assertAlmostEqual(weights.sum(), 1.0, places=12)
+        lengths = self.game.sample_game_lengths(200000, np.random.default_rng(3))
+        expected_mean = weights @ np.arange(1, self.game.MAX_ITERATIONS + 1)
+        standard_error = lengths.std(ddof=1) / np.sqrt(len(lengths))
+        self.assertLessEqual(abs(lengths.mean() - expected_mean), STANDARD_ERRORS * standard_error)
+
+    def test_transition_rows_are_distributions(self):
+        strategies = [s.memory_one() for s in self.strategies] + [
+            MemoryOne(0.9, (0.8, 0.1, 0.6, 0.3))
+        ]
+        for strategy1 in strategies:
+            for strategy2 in strategies:
+                transitions = transition_matrix(strategy1, strategy2)
+                np.testing.assert_allclose(transitions.sum(axis=1), 1.0)
+                self.assertTrue((transitions >= 0).all())
+
+    def test_swapping_players_swaps_results(self):
+        generous = MemoryOne(0.9, (1.0, 0.3, 1.0, 0.1))
+        for strategy in self.strategies:
+            with self.subTest(strategy=strategy.name):
+                forward = expected_game(self.game, generous, strategy.memory_one())
+                backward = expected_game(self.game, strategy.memory_one(), generous)
+                self.assertAlmostEqual(forward['final_score1'], backward['final_score2'], places=9)
+                self.assertAlmostEqual(forward['cooperation_rate1'], backward['cooperation_rate2'],
+                                       places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests that profiled runs on different threads keep separate profilers.
+"""
+
+import threading
+import unittest
+
+import profiling
+
+
+class TestProfilerIsolation(unittest.TestCase):
+    def test_overlapping_runs_on_threads_leave_no_active_profiler(self):
+        a_entered = threading.Event()
+        b_entered = threading.Event()
+        a_exited = threading.Event()
+        seen = {}
+
+        def run_a():
+            with profiling.profile_tournament() as profiler:
+                seen['a'] = profiler
+                a_entered.set()
+                b_entered.wait()
+                profiling.count('games')
+            a_exited.set()
+            seen['a_after'] = profiling.active()
+
+        def run_b():
+            a_entered.wait()
+            with profiling.profile_tournament() as profiler:
+                seen['b'] = profiler
+                seen['b_active'] = profiling.active()
+                b_entered.set()
+                a_exited.wait()
+                seen['b_after_a'] = profiling.active()
+            seen['b_after'] = profiling.active()
+
+        threads = [threading.Thread(target=run_a), threading.Thread(target=run_b)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIs(seen['b_active'], seen['b'])
+        self.assertIs(seen['b_after_a'], seen['b'])
+        self.assertIsNone(seen['a_after'])
+        self.assertIsNone(seen['b_after'])
+        self.assertIsNone(profiling.active())
+        self.assertEqual(seen['a'].counters, {'games': 1})
+        self.assertEqual(seen['b'].counters, {})
+
+    def test_disabled_profiling_is_inactive(self):
+        with profiling.profile_tournament(enabled=False) as profiler:
+            self.assertIsNone(profiler)
+            self.assertIsNone(profiling.active())
+            self.assertIs(profiling.phase('pairing'), profiling._NULL_PHASE)
+
+
+if __name__ == '__main__':
+    unittest.main()
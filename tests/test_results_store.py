@@ -0,0 +1,95 @@
+"""
+Tests of ResultsStore compaction.
+"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from results_store import ResultsStore, pa
+
+
+def game_rows(count, strategy2_name='B'):
+    return [{
+        'strategy1_name': 'A',
+        'strategy2_name': strategy2_name,
+        'score1': float(i % 5),
+        'score2': 1.0,
+        'total_rounds': 10,
+        'cooperation_rate1': 0.5,
+        'cooperation_rate2': 0.25,
+        'timestamp': datetime.utcnow()
+    } for i in range(count)]
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class TestCompaction(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = ResultsStore(self.root, batch_size=100, compact_after=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_small_flushes_are_merged(self):
+        for _ in range(50):
+            self.store.append(game_rows(7))
+            self.store.flush()
+
+        self.assertEqual(self.store.game_count(), 350)
+        # Full files plus fewer than compact_after small ones
+        self.assertLessEqual(len(self.store.files()), 350 // 100 + 4)
+        self.assertEqual(self.store.pairwise_matrix()['count']['A']['B'], 350)
+
+    def test_compact_keeps_every_game(self):
+        for strategy2_name in ('B', 'C', 'D'):
+            self.store.append(game_rows(10, strategy2_name))
+            self.store.flush()
+        before = self.store.pairwise_matrix()
+
+        self.store.compact()
+
+        self.assertEqual(len(self.store.files()), 1)
+        self.assertEqual(self.store.pairwise_matrix(), before)
+        self.assertEqual(self.store.strategy_averages()['A']['total_games'], 30)
+
+    def test_interrupted_compaction_is_finished(self):
+        for _ in range(2):
+            self.store.append(game_rows(10))
+            self.store.flush()
+        partition = glob.glob(os.path.join(self.root, 'date=*'))[0]
+        replaced = self.store.files()
+        merged = os.path.join(partition, 'part-merged.arrow')
+        table = pa.concat_tables([pa.ipc.open_file(pa.memory_map(path)).read_all()
+                                  for path in replaced]).unify_dictionaries().combine_chunks()
+        self.store._write_file(merged, table)
+        with open(os.path.join(partition, '.compact-0.json'), 'w') as manifest_file:
+            json.dump({'merged': 'part-merged.arrow',
+                       'replaced': [os.path.basename(path) for path in replaced]}, manifest_file)
+
+        # Replaced files still on disk are not read twice
+        self.assertEqual(self.store.game_count(), 20)
+        self.store.compact()
+        self.assertEqual(self.store.game_count(), 20)
+        self.assertFalse(any(os.path.exists(path) for path in replaced))
+        self.assertEqual(glob.glob(os.path.join(partition, '.compact-*.json')), [])
+
+    def test_abandoned_compaction_keeps_its_sources(self):
+        self.store.append(game_rows(10))
+        self.store.flush()
+        partition = glob.glob(os.path.join(self.root, 'date=*'))[0]
+        replaced = [os.path.basename(path) for path in self.store.files()]
+        with open(os.path.join(partition, '.compact-0.json'), 'w') as manifest_file:
+            json.dump({'merged': 'part-missing.arrow', 'replaced': replaced}, manifest_file)
+
+        self.assertEqual(self.store.game_count(), 10)
+        self.store.compact()
+        self.assertEqual(self.store.game_count(), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
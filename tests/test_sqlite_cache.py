@@ -0,0 +1,105 @@
+"""
+Tests of the SQLite-backed LRU cache behind the interpretation and matchup
+caches.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from matchup_cache import MatchupCache
+from sqlite_cache import SQLiteLRUCache
+
+
+def use_in_child(cache):
+    """Fork target: the cache must work although the parent's lock is held."""
+    cache.put('child', {'value': 2})
+    assert cache.get('child') == {'value': 2}
+    assert cache.get('parent') == {'value': 1}
+
+
+class TestSQLiteLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.root.name, 'cache.db')
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SQLiteLRUCache('entries', max_entries=2)
+        cache.put('a', {'value': 1})
+        cache.put('b', {'value': 2})
+        cache.get('a')
+        cache.put('c', {'value': 3})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'value': 1})
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_stored_entries_are_bounded(self):
+        cache = SQLiteLRUCache('entries', self.path, max_entries=3)
+        for index in range(10):
+            cache.put(str(index), {'value': index})
+        self.assertEqual(cache.stats()['size'], 3)
+        reopened = SQLiteLRUCache('entries', self.path, max_entries=3)
+        self.assertEqual([reopened.get(str(index)) for index in (6, 7, 8, 9)],
+                         [None, {'value': 7}, {'value': 8}, {'value': 9}])
+
+    def test_entries_outlive_the_process_cache(self):
+        SQLiteLRUCache('entries', self.path).put('a', {'value': 1})
+        cache = SQLiteLRUCache('entries', self.path)
+        self.assertEqual(cache.get('a'), {'value': 1})
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_stale_entries_are_missing(self):
+        cache = SQLiteLRUCache('entries', self.path, ttl_seconds=0.05)
+        cache.put('a', {'value': 1})
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(SQLiteLRUCache('entries', self.path, ttl_seconds=0.05).get('a'))
+
+    def test_older_table_layout_is_replaced(self):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, result TEXT, last_used REAL)")
+            conn.execute("INSERT INTO entries VALUES ('a', '{}', 0)")
+        cache = SQLiteLRUCache('entries', self.path)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', {'value': 1})
+        self.assertEqual(SQLiteLRUCache('entries', self.path).get('a'), {'value': 1})
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_forked_child_does_not_inherit_the_lock(self):
+        for path in (None, self.path):
+            with self.subTest(path=path):
+                cache = MatchupCache(path=path)
+                cache.put('parent', {'value': 1})
+                held = threading.Event()
+                release = threading.Event()
+
+                def hold_lock():
+                    with cache._lock:
+                        held.set()
+                        release.wait(30)
+
+                holder = threading.Thread(target=hold_lock)
+                holder.start()
+                held.wait(10)
+                try:
+                    child = multiprocessing.get_context('fork').Process(target=use_in_child, args=(cache,))
+                    child.start()
+                    child.join(20)
+                    if child.is_alive():
+                        child.kill()
+                        child.join()
+                    self.assertEqual(child.exitcode, 0)
+                finally:
+                    release.set()
+                    holder.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Tests that concurrent interpretations of equivalent strategy texts are merged
+into a single model call, against a local stand-in for the chat-completions
+API reached through OPENAI_BASE_URL.
+"""
+
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from interpretation_cache import InterpretationCache
+from strategy_interpreter import StrategyInterpreter
+
+# Not matched by the offline parser, so every interpretation needs the model
+STRATEGY_TEXT = "play like a grudging diplomat"
+EQUIVALENT_TEXTS = [
+    "play like a grudging diplomat",
+    "Play like the grudging diplomat!",
+    "  play  like a grudging   diplomat. "
+]
+INTERPRETATION = {"type": "simple", "pattern": {"action": "defect"}}
+
+
+class StubChatCompletions(BaseHTTPRequestHandler):
+    """Answers every chat-completions request with INTERPRETATION, after a delay."""
+    requests = 0
+    delay = 0.3
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with StubChatCompletions.lock:
+            StubChatCompletions.requests += 1
+        time.sleep(self.delay)  # Keep the request in flight while others arrive
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-3.5-turbo",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(INTERPRETATION)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestInterpretationMerging(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubChatCompletions)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.environ = dict(os.environ)
+        os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{cls.server.server_port}/v1"
+        os.environ['OPENAI_API_KEY'] = 'test'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        os.environ.clear()
+        os.environ.update(cls.environ)
+
+    def setUp(self):
+        StubChatCompletions.requests = 0
+        StrategyInterpreter._instance = None
+        StrategyInterpreter._cache = InterpretationCache(':memory:')
+        StrategyInterpreter._inflight.clear()
+        StrategyInterpreter._prewarm_started.clear()
+        self.interpreter = StrategyInterpreter()
+
+    def test_concurrent_identical_submissions_make_one_request(self):
+        count = 8
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def submit(index):
+            barrier.wait()
+            results[index] = self.interpreter.interpret_strategy(STRATEGY_TEXT)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(StubChatCompletions.requests, 1)
+        self.assertEqual(results, [INTERPRETATION] * count)
+
+    def test_prewarm_merges_equivalent_texts(self):
+        results = self.interpreter.prewarm(EQUIVALENT_TEXTS, max_workers=len(EQUIVALENT_TEXTS))
+
+        self.assertEqual(StubChatCompletions.requests, 1)
+        self.assertEqual(set(results), set(EQUIVALENT_TEXTS))
+        self.assertTrue(all(result == INTERPRETATION for result in results.values()))
+
+    def test_late_miss_after_leader_finished_uses_cache(self):
+        self.interpreter.interpret_strategy(STRATEGY_TEXT)
+
+        # A caller whose first cache check ran just before the leader cached its result
+        cache_get = self.interpreter._cache.get
+        misses = [None]
+        self.interpreter._cache.get = lambda text: misses.pop() if misses else cache_get(text)
+        try:
+            result = self.interpreter.interpret_strategy(STRATEGY_TEXT)
+        finally:
+            del self.interpreter._cache.get
+
+        self.assertEqual(StubChatCompletions.requests, 1)
+        self.assertEqual(result, INTERPRETATION)
+
+
+    def test_each_request_counts_one_cache_lookup(self):
+        self.interpreter.interpret_strategy(STRATEGY_TEXT)
+        stats = self.interpreter.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 1))
+
+        self.interpreter.interpret_strategy(STRATEGY_TEXT)
+        stats = self.interpreter.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
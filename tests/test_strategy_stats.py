@@ -0,0 +1,73 @@
+"""
+Tests of StrategyStats write-behind flushes to the columnar results store.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('STRATEGY_CACHE_PATH', ':memory:')
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from models import StrategyPerformance, db_session, init_db
+from results_store import ResultsStore, pa
+from strategy_stats import StrategyStats
+
+GAME = {
+    'final_score1': 30.0,
+    'final_score2': 20.0,
+    'total_rounds': 10,
+    'cooperation_rate1': 0.5,
+    'cooperation_rate2': 0.25
+}
+
+
+def total_games(strategy_name):
+    with db_session() as db:
+        performance = (db.query(StrategyPerformance)
+                       .filter(StrategyPerformance.strategy_name == strategy_name).first())
+        return performance.total_games if performance else 0
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class TestWriteBehindStore(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        self.root = tempfile.mkdtemp()
+        self.store = ResultsStore(self.root)
+        self.stats = StrategyStats(write_behind=True, flush_every=10 ** 6,
+                                   flush_interval_ms=10 ** 9, results_store=self.store)
+        self.names = (f"Row {id(self)}", f"Column {id(self)}")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_failed_store_write_is_not_applied_twice(self):
+        self.stats.record_games(*self.names, [GAME])
+        with mock.patch.object(self.store, '_write_file', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.stats.flush()
+        self.assertEqual(total_games(self.names[0]), 0)
+        self.assertEqual(self.stats.write_behind_stats()['queue_depth'], 1)
+
+        self.stats.flush()
+        self.assertEqual(self.store.game_count(), 1)
+        for name in self.names:
+            self.assertEqual(total_games(name), 1)
+        self.assertEqual(self.stats.write_behind_stats()['games_flushed'], 1)
+
+    def test_failed_stats_update_keeps_games_stored_once(self):
+        self.stats.record_games(*self.names, [GAME])
+        with mock.patch.object(self.stats, '_upsert_performance', side_effect=OSError("locked")):
+            with self.assertRaises(OSError):
+                self.stats.flush()
+        self.stats.flush()
+        self.assertEqual(self.store.game_count(), 1)
+        for name in self.names:
+            self.assertEqual(total_games(name), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
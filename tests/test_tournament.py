@@ -0,0 +1,109 @@
+"""
+Tests of round-robin tournaments: mirrored pairings and identical results
+from serial and pooled runs.
+"""
+
+import os
+import unittest
+
+os.environ.setdefault('STRATEGY_CACHE_PATH', ':memory:')
+
+import numpy as np
+
+from game_logic import PrisonersDilemma
+from strategies import AlwaysCooperate, AlwaysDefect, RandomStrategy, TitForTat, build_strategy
+from tournament import MIRRORED, TournamentConfig, mirror_results, run_round_robin
+
+# Settings each mode is run with, on top of a fixed seed and game count
+MODES = {
+    'default': {},
+    'asymmetric': {'symmetric': False},
+    'common_random_numbers': {'common_random_numbers': True},
+    'exact_memory_one': {'exact_memory_one': True},
+    'adaptive': {'adaptive': True, 'min_games': 10, 'max_games': 60, 'batch_games': 10,
+                 'ci_half_width': 0.2}
+}
+
+
+def tournament_strategies():
+    three_two = build_strategy(('custom', 'Three Two', 'Three Two', 'three two', {
+        "type": "sequence", "pattern": {"cooperate_count": 3, "defect_count": 2}
+    }))
+    return [TitForTat(), AlwaysCooperate(), AlwaysDefect(), RandomStrategy(), three_two]
+
+
+class TestRoundRobin(unittest.TestCase):
+    def setUp(self):
+        self.game = PrisonersDilemma()
+        self.strategies = tournament_strategies()
+        self.names = [s.name for s in self.strategies]
+
+    def run_mode(self, mode, workers):
+        config = TournamentConfig(num_games=30, workers=workers, seed=11, **MODES[mode])
+        return run_round_robin(self.strategies, self.game, config)
+
+    def assert_same_results(self, first, second):
+        self.assertEqual(first.score_matrix, second.score_matrix)
+        self.assertEqual(first.coop_matrix, second.coop_matrix)
+        self.assertEqual(first.expected, second.expected)
+        self.assertEqual(first.sampling, second.sampling)
+        self.assertEqual(set(first.games), set(second.games))
+        for pairing, games in first.games.items():
+            np.testing.assert_array_equal(games, second.games[pairing])
+
+    def test_serial_and_pooled_runs_are_identical(self):
+        for mode in MODES:
+            with self.subTest(mode=mode):
+                self.assert_same_results(self.run_mode(mode, 1), self.run_mode(mode, 2))
+
+    def test_seeded_runs_are_reproducible(self):
+        for mode in MODES:
+            with self.subTest(mode=mode):
+                self.assert_same_results(self.run_mode(mode, 1), self.run_mode(mode, 1))
+
+    def test_every_ordered_pairing_is_covered(self):
+        for mode in MODES:
+            with self.subTest(mode=mode):
+                result = self.run_mode(mode, 1)
+                covered = set(result.games) | set(result.expected)
+                self.assertEqual(covered, {(s1, s2) for s1 in self.names for s2 in self.names})
+                self.assertFalse(set(result.games) & set(result.expected))
+
+    def test_reverse_orientation_mirrors_the_played_one(self):
+        result = self.run_mode('default', 1)
+        for index1, s1 in enumerate(self.names):
+            for s2 in self.names[index1 + 1:]:
+                with self.subTest(strategy1=s1, strategy2=s2):
+                    forward, backward = result.games[(s1, s2)], result.games[(s2, s1)]
+                    np.testing.assert_array_equal(backward, forward[:, MIRRORED])
+                    self.assertAlmostEqual(result.score_matrix[s2][s1], backward[:, 0].mean())
+                    self.assertAlmostEqual(result.coop_matrix[s2][s1], backward[:, 2].mean() * 100)
+                    self.assertEqual(result.sampling[(s2, s1)]['games'], len(forward))
+
+    def test_exact_results_are_mirrored(self):
+        result = self.run_mode('exact_memory_one', 1)
+        for (s1, s2), results in result.expected.items():
+            with self.subTest(strategy1=s1, strategy2=s2):
+                self.assertEqual(result.expected[(s2, s1)], mirror_results(results))
+                self.assertEqual(result.score_matrix[s1][s2], results['final_score1'])
+                self.assertEqual(result.coop_matrix[s1][s2], results['cooperation_rate1'] * 100)
+
+    def test_mirrored_averages_match_played_averages(self):
+        # Deterministic pairings play identically in either orientation
+        deterministic = [name for name, s in zip(self.names, self.strategies) if s.state() is not None]
+        symmetric = run_round_robin(self.strategies, self.game,
+                                    TournamentConfig(num_games=30, seed=5, common_random_numbers=True))
+        asymmetric = run_round_robin(self.strategies, self.game,
+                                     TournamentConfig(num_games=30, seed=5, common_random_numbers=True,
+                                                      symmetric=False))
+        for s1 in deterministic:
+            for s2 in deterministic:
+                with self.subTest(strategy1=s1, strategy2=s2):
+                    self.assertAlmostEqual(symmetric.score_matrix[s1][s2],
+                                           asymmetric.score_matrix[s1][s2])
+                    self.assertAlmostEqual(symmetric.coop_matrix[s1][s2],
+                                           asymmetric.coop_matrix[s1][s2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,488 @@
+"""
+tournament.py
+
+This module runs round-robin tournaments between a set of strategies, either
+serially or split across a pool of worker processes.
+
+Key features:
+- One batch of games per unordered pairing, mirrored to fill both
+  orientations (A vs B and B vs A) of the matrices
+- Process-pool execution with a configurable worker count
+- Compact per-game summaries returned through shared memory instead of
+  pickled per-round lists
+- Reproducible seeding, so serial and pooled runs give identical matrices
+- Optional common random numbers: every pairing plays the same game-length
+  schedule and random stream, so score differences between pairings come
+  from the strategies rather than from sampling noise
+- Optional exact evaluation of memory-one pairings (see markov.py), with
+  Monte Carlo games only for pairings it cannot express
+- Optional adaptive sampling: each pairing plays batches of games until the
+  confidence interval of its per-round score is narrow enough, so games go
+  to high-variance pairings instead of deterministic ones
+
+Each pairing produces a (num_games, len(GAME_FIELDS)) array of per-game
+summaries; the score and cooperation matrices are aggregated from those.
+A running tournament can report each finished pairing and be cancelled
+between pairings (see jobs.py), and with config.checkpoint set it records
+each finished pairing so that a restarted run skips them (see checkpoint.py).
+The run stays resumable until the caller has saved the results and called
+TournamentResult.complete_checkpoint().
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from statistics import NormalDist
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import profiling
+from game_logic import PrisonersDilemma, supports_batch
+from checkpoint import TournamentCheckpoint
+from markov import expected_game
+from strategies import Strategy, build_strategy, strategy_spec
+
+# Columns of a per-game summary row
+GAME_FIELDS = (
+    'final_score1',
+    'final_score2',
+    'cooperation_rate1',
+    'cooperation_rate2',
+    'total_rounds'
+)
+SCORE1, SCORE2, COOP1, COOP2, ROUNDS = range(len(GAME_FIELDS))
+# Column order that turns a row-player summary into the column player's view
+MIRRORED = [SCORE2, SCORE1, COOP2, COOP1, ROUNDS]
+
+
+@dataclass
+class TournamentConfig:
+    num_games: int = 100  # Games played per pairing
+    workers: int = 1  # Worker processes; 1 runs serially in this process
+    seed: Optional[int] = None  # Base seed; None draws a fresh one
+    common_random_numbers: bool = False  # Share one seed across all pairings
+    exact_memory_one: bool = False  # Compute memory-one pairings exactly instead of playing them
+    symmetric: bool = True  # Play A vs B once and mirror it for B vs A
+    # Adaptive sampling: play batch_games at a time until the confidence
+    # interval half-width of both players' score per round is at most
+    # ci_half_width, after at least min_games and at most max_games games.
+    # num_games is ignored while adaptive is set.
+    adaptive: bool = False
+    ci_half_width: float = 0.05
+    confidence: float = 0.95
+    min_games: int = 20
+    max_games: int = 1000
+    batch_games: int = 20
+    # JSON Lines file finished pairings are checkpointed to, so an interrupted
+    # run resumes where it stopped (see checkpoint.py); None disables it
+    checkpoint: Optional[str] = None
+
+    @property
+    def games_capacity(self) -> int:
+        """Most games any one pairing can play under this configuration."""
+        return self.max_games if self.adaptive else self.num_games
+
+    @property
+    def z_score(self) -> float:
+        return NormalDist().inv_cdf(0.5 + self.confidence / 2)
+
+
+@dataclass
+class TournamentResult:
+    strategy_names: List[str]
+    score_matrix: Dict[str, Dict[str, float]]
+    coop_matrix: Dict[str, Dict[str, float]]
+    # Per-game summaries for each simulated (strategy1, strategy2) pairing, in play order
+    games: Dict[Tuple[str, str], np.ndarray] = field(default_factory=dict)
+    # Expected game results for pairings evaluated exactly (no games played)
+    expected: Dict[Tuple[str, str], Dict[str, float]] = field(default_factory=dict)
+    # Games played and achieved confidence-interval half-width of the row
+    # player's score per round, for each simulated pairing
+    sampling: Dict[Tuple[str, str], Dict[str, float]] = field(default_factory=dict)
+    # Pairings restored from a checkpoint rather than played in this run
+    resumed: int = 0
+    # The checkpointed run, left unfinished until complete_checkpoint()
+    checkpoint: Optional[TournamentCheckpoint] = field(default=None, repr=False)
+
+    def complete_checkpoint(self):
+        """
+        Mark the checkpointed run finished. Call this once the results are
+        saved: until then an interruption leaves the run resumable.
+        """
+        if self.checkpoint is not None:
+            self.checkpoint.complete()
+
+
+class TournamentCancelled(Exception):
+    """Raised by run_round_robin when its cancel_event is set."""
+
+
+class RunningStats:
+    """Running mean and variance (Welford's method, merged a batch at a time)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared deviations from the mean
+
+    def add(self, values: np.ndarray):
+        if not len(values):
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.count + len(values)
+        delta = batch_mean - self.mean
+        self.mean += delta * len(values) / total
+        self._m2 += batch_m2 + delta ** 2 * self.count * len(values) / total
+        self.count = total
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else math.inf
+
+    def half_width(self, z_score: float) -> float:
+        """Confidence-interval half-width of the mean."""
+        if self.count < 2:
+            return math.inf
+        return z_score * math.sqrt(self.variance / self.count)
+
+
+def default_workers() -> int:
+    """Worker count from TOURNAMENT_WORKERS, else one per CPU core."""
+    return int(os.getenv('TOURNAMENT_WORKERS', os.cpu_count() or 1))
+
+
+def play_pairing(game: PrisonersDilemma, spec1: Tuple, spec2: Tuple, num_games: int,
+                 seed: np.random.SeedSequence) -> np.ndarray:
+    """
+    Plays num_games games of one pairing and returns their per-game summaries.
+
+    Args:
+        game: Game rules to play under
+        spec1: strategy_spec of the row strategy
+        spec2: strategy_spec of the column strategy
+        num_games: Number of games to play
+        seed: Seed for this pairing's random streams
+
+    Returns:
+        np.ndarray: (num_games, len(GAME_FIELDS)) float array
+    """
+    strategy1, strategy2, rng = _pairing_players(spec1, spec2, seed)
+    return _play_games(game, strategy1, strategy2, num_games, rng)
+
+
+def play_pairing_adaptive(game: PrisonersDilemma, spec1: Tuple, spec2: Tuple,
+                          config: TournamentConfig, seed: np.random.SeedSequence) -> np.ndarray:
+    """
+    Plays batches of games of one pairing until its scores are precise enough.
+
+    Stops once the confidence-interval half-width of both players' score per
+    round is at most config.ci_half_width (after config.min_games games), or
+    after config.max_games games.
+
+    Returns:
+        np.ndarray: (games_played, len(GAME_FIELDS)) float array
+    """
+    strategy1, strategy2, rng = _pairing_players(spec1, spec2, seed)
+    z_score = config.z_score
+    stats1, stats2 = RunningStats(), RunningStats()
+    batches = []
+    played = 0
+    while played < config.max_games:
+        batch_games = max(config.batch_games, config.min_games - played, 1)
+        batch = _play_games(game, strategy1, strategy2, min(batch_games, config.max_games - played), rng)
+        batches.append(batch)
+        played += len(batch)
+        stats1.add(batch[:, SCORE1] / batch[:, ROUNDS])
+        stats2.add(batch[:, SCORE2] / batch[:, ROUNDS])
+        if (played >= config.min_games
+                and max(stats1.half_width(z_score), stats2.half_width(z_score)) <= config.ci_half_width):
+            break
+    profiling.count('adaptive_games', played)
+    return np.concatenate(batches)
+
+
+def _pairing_players(spec1: Tuple, spec2: Tuple, seed: np.random.SeedSequence
+                     ) -> Tuple[Strategy, Strategy, np.random.Generator]:
+    strategy1 = build_strategy(spec1)
+    strategy2 = build_strategy(spec2)
+    if not (supports_batch(strategy1) and supports_batch(strategy2)):
+        # The round-by-round fallback draws from the module-level generator
+        random.seed(int(seed.generate_state(1)[0]))
+    return strategy1, strategy2, np.random.default_rng(seed)
+
+
+def _play_games(game: PrisonersDilemma, strategy1: Strategy, strategy2: Strategy,
+                num_games: int, rng: np.random.Generator) -> np.ndarray:
+    results = game.run_batch(strategy1, strategy2, num_games, rng, summary_only=True)
+    return np.column_stack([results[name] for name in GAME_FIELDS]).astype(np.float64)
+
+
+def _play_configured(game: PrisonersDilemma, spec1: Tuple, spec2: Tuple,
+                     config: TournamentConfig, seed: np.random.SeedSequence) -> np.ndarray:
+    if config.adaptive:
+        return play_pairing_adaptive(game, spec1, spec2, config, seed)
+    return play_pairing(game, spec1, spec2, config.num_games, seed)
+
+
+def _pool_context():
+    """
+    multiprocessing context for a tournament's process pool. Forking while
+    other threads run can leave the child holding copies of their locks, so
+    pools created off the main thread (background jobs, Streamlit script
+    runs) start their workers with forkserver, or spawn, instead.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return None
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _pairing_worker(shm_name: str, shape: Tuple[int, ...], pair_index: int,
+                    game: PrisonersDilemma, spec1: Tuple, spec2: Tuple, config: TournamentConfig,
+                    seed: np.random.SeedSequence, profile: bool
+                    ) -> Tuple[int, int, Optional[Dict]]:
+    """
+    Process-pool entry point: writes one pairing's summaries into shared memory.
+
+    Returns the pairing index, the number of games played and, when
+    profiling, a snapshot of the worker's samples for the parent to merge.
+    """
+    with profiling.profile_tournament(profile) as profiler:
+        with profiling.phase('pairing'):
+            summaries = _play_configured(game, spec1, spec2, config, seed)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        buffer[pair_index, :len(summaries)] = summaries
+        del buffer  # Release the view before closing the mapping
+    finally:
+        shm.close()
+    return pair_index, len(summaries), profiler.snapshot() if profiler else None
+
+
+def run_round_robin(strategies: List[Strategy], game: PrisonersDilemma,
+                    config: Optional[TournamentConfig] = None,
+                    progress_callback: Optional[Callable[[int, int, str, str], None]] = None,
+                    pairing_callback: Optional[Callable[[str, str, Dict[str, float]], None]] = None,
+                    cancel_event: Optional[threading.Event] = None,
+                    checkpoint_label: str = ''
+                    ) -> TournamentResult:
+    """
+    Plays every (strategy1, strategy2) pairing, including self-play.
+
+    With config.symmetric, each unordered pairing is played once and its
+    games are mirrored for the reverse orientation, so the matrices and the
+    per-game summaries still cover every ordered pairing.
+
+    Args:
+        strategies: Participating strategies
+        game: Game rules to play under
+        config: Tournament settings; defaults to TournamentConfig()
+        progress_callback: Called as (pairings_done, total_pairings, name1, name2)
+            each time a pairing finishes
+        pairing_callback: Called as (name1, name2, averages) each time a
+            pairing finishes, with averages as from summarize_games (or the
+            expected results of an exact pairing, with 'games' 0); only the
+            played orientation is reported
+        cancel_event: When set, no further pairings are started and
+            TournamentCancelled is raised once running ones finish
+        checkpoint_label: Distinguishes otherwise identical runs sharing
+            config.checkpoint (see checkpoint.run_key); a run resumes the
+            interrupted run with the same label
+
+    Returns:
+        TournamentResult: Average-score and cooperation-rate (%) matrices plus
+            the per-game summaries of every simulated pairing and the expected
+            results of every exactly evaluated one; call its
+            complete_checkpoint() once they are saved
+
+    Raises:
+        CheckpointInUse: Another live tournament owns the checkpointed run
+    """
+    config = config or TournamentConfig()
+    specs = [strategy_spec(s) for s in strategies]
+    strategy_names = [s.name for s in strategies]
+    pairings = [
+        (i, j)
+        for i in range(len(strategies))
+        for j in (range(i, len(strategies)) if config.symmetric else range(len(strategies)))
+    ]
+    entropy = np.random.SeedSequence(config.seed).entropy
+    checkpoint = None
+    finished = {}
+    if config.checkpoint:
+        checkpoint = TournamentCheckpoint.for_run(config.checkpoint, strategies, game, config,
+                                                  checkpoint_label)
+        entropy, finished = checkpoint.resume(entropy)
+    try:
+        if config.common_random_numbers:
+            # Game lengths are the first draw of each pairing's generator, so a
+            # shared seed gives every pairing the same length schedule
+            seeds = np.random.SeedSequence(entropy).spawn(1) * len(pairings)
+        else:
+            seeds = np.random.SeedSequence(entropy).spawn(len(pairings))
+
+        done = 0
+
+        def report(pair_index: int, averages: Dict[str, float]):
+            nonlocal done
+            done += 1
+            i, j = pairings[pair_index]
+            if pairing_callback:
+                pairing_callback(strategy_names[i], strategy_names[j], averages)
+            if progress_callback:
+                progress_callback(done, len(pairings), strategy_names[i], strategy_names[j])
+
+        def finish(pair_index: int, pair_games: Optional[np.ndarray] = None,
+                   results: Optional[Dict[str, float]] = None):
+            """Checkpoint and report a pairing that has just been played or evaluated."""
+            averages = summarize_games(pair_games) if results is None else dict(results, games=0)
+            if checkpoint is not None:
+                i, j = pairings[pair_index]
+                checkpoint.add(pair_index, strategy_names[i], strategy_names[j], seeds[pair_index],
+                               averages, games=pair_games, expected=results)
+            report(pair_index, averages)
+
+        def check_cancelled():
+            if cancel_event is not None and cancel_event.is_set():
+                raise TournamentCancelled("tournament cancelled")
+
+        # Pairings finished before an interruption are taken from the checkpoint
+        expected = {}
+        restored = {}
+        for pair_index, record in finished.items():
+            if 'expected' in record:
+                expected[pair_index] = record['expected']
+            else:
+                restored[pair_index] = np.array(record['games'], dtype=np.float64).reshape(
+                    -1, len(GAME_FIELDS))
+            report(pair_index, record['averages'])
+
+        if config.exact_memory_one:
+            descriptions = [s.memory_one() for s in strategies]
+            for pair_index, (i, j) in enumerate(pairings):
+                if pair_index in finished:
+                    continue
+                if descriptions[i] is not None and descriptions[j] is not None:
+                    with profiling.phase('exact_pairing'):
+                        expected[pair_index] = expected_game(game, descriptions[i], descriptions[j])
+                    finish(pair_index, results=expected[pair_index])
+        simulated = [pair_index for pair_index in range(len(pairings)) if pair_index not in expected]
+        to_play = [pair_index for pair_index in simulated if pair_index not in restored]
+        shape = (len(pairings), config.games_capacity, len(GAME_FIELDS))
+        counts = np.zeros(len(pairings), dtype=int)  # Games played per pairing
+
+        if config.workers <= 1 or len(to_play) <= 1:
+            summaries = np.empty(shape)
+            for pair_index in to_play:
+                check_cancelled()
+                i, j = pairings[pair_index]
+                with profiling.phase('pairing'):
+                    pair_games = _play_configured(game, specs[i], specs[j], config, seeds[pair_index])
+                summaries[pair_index, :len(pair_games)] = pair_games
+                counts[pair_index] = len(pair_games)
+                finish(pair_index, pair_games)
+        else:
+            profiler = profiling.active()
+            shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+            buffer = None
+            try:
+                buffer = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+                with ProcessPoolExecutor(max_workers=config.workers,
+                                         mp_context=_pool_context()) as pool:
+                    futures = [
+                        pool.submit(_pairing_worker, shm.name, shape, pair_index, game,
+                                    specs[pairings[pair_index][0]], specs[pairings[pair_index][1]],
+                                    config, seeds[pair_index], profiler is not None)
+                        for pair_index in to_play
+                    ]
+                    for future in as_completed(futures):
+                        pair_index, counts[pair_index], snapshot = future.result()
+                        if snapshot:
+                            profiler.merge(snapshot)
+                        finish(pair_index, buffer[pair_index, :counts[pair_index]])
+                        if cancel_event is not None and cancel_event.is_set():
+                            for pending in futures:
+                                pending.cancel()
+                            check_cancelled()
+                summaries = buffer.copy()
+            finally:
+                buffer = None  # Release the view before closing the mapping
+                shm.close()
+                shm.unlink()
+        for pair_index, pair_games in restored.items():
+            summaries[pair_index, :len(pair_games)] = pair_games
+            counts[pair_index] = len(pair_games)
+
+        score_matrix = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
+        coop_matrix = {s1: {s2: 0 for s2 in strategy_names} for s1 in strategy_names}
+        games = {}
+        sampling = {}
+        z_score = config.z_score
+        for pair_index in simulated:
+            i, j = pairings[pair_index]
+            played = summaries[pair_index, :counts[pair_index]]
+            orientations = [(i, j, played)]
+            if config.symmetric and i != j:
+                orientations.append((j, i, played[:, MIRRORED]))
+            for row, column, pair_games in orientations:
+                s1, s2 = strategy_names[row], strategy_names[column]
+                score_matrix[s1][s2] = float(pair_games[:, SCORE1].sum()) / len(pair_games)
+                coop_matrix[s1][s2] = (float(pair_games[:, COOP1].sum()) / len(pair_games)) * 100
+                games[(s1, s2)] = pair_games
+                per_round = RunningStats()
+                per_round.add(pair_games[:, SCORE1] / pair_games[:, ROUNDS])
+                sampling[(s1, s2)] = {
+                    'games': len(pair_games),
+                    'ci_half_width': per_round.half_width(z_score)
+                }
+        expected_results = {}
+        for pair_index, results in expected.items():
+            i, j = pairings[pair_index]
+            orientations = [(i, j, results)]
+            if config.symmetric and i != j:
+                orientations.append((j, i, mirror_results(results)))
+            for row, column, pair_results in orientations:
+                s1, s2 = strategy_names[row], strategy_names[column]
+                score_matrix[s1][s2] = pair_results['final_score1']
+                coop_matrix[s1][s2] = pair_results['cooperation_rate1'] * 100
+                expected_results[(s1, s2)] = pair_results
+
+        return TournamentResult(strategy_names, score_matrix, coop_matrix, games, expected_results,
+                                sampling, resumed=len(finished), checkpoint=checkpoint)
+    finally:
+        if checkpoint is not None:
+            # Finished, cancelled or failed, the run is free to resume until
+            # its results are saved and it is completed
+            checkpoint.release()
+
+
+def mirror_results(results: Dict) -> Dict:
+    """Swap the two players of a game result dict."""
+    mirrored = dict(results)
+    for first, second in (('final_score1', 'final_score2'),
+                          ('cooperation_rate1', 'cooperation_rate2')):
+        mirrored[first], mirrored[second] = results[second], results[first]
+    return mirrored
+
+
+def summarize_games(summaries: np.ndarray) -> Dict[str, float]:
+    """Mean of each GAME_FIELDS column over a pairing's games, plus the game count."""
+    averages = {name: float(summaries[:, column].mean()) for column, name in enumerate(GAME_FIELDS)}
+    averages['games'] = len(summaries)
+    return averages
+
+
+def iter_game_results(summaries: np.ndarray) -> Iterator[Dict]:
+    """Turn per-game summary rows back into result dicts for StrategyStats."""
+    for row in summaries:
+        results = dict(zip(GAME_FIELDS, row.tolist()))
+        results['total_rounds'] = int(results['total_rounds'])
+        yield results
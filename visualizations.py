@@ -1,5 +1,7 @@
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.subplots import make_subplots
+import numpy as np
 import pandas as pd
 from typing import List, Dict
 
@@ -75,4 +77,62 @@ def create_historical_performance_plot(avg_scores: Dict[str, float]):
         yaxis_title='Average Score (per 100 rounds)'
     )
 
-    return fig
\ No newline at end of file
+    return fig
+
+def create_tournament_heatmap(strategy_names: List[str], score_matrix: Dict[str, Dict[str, float]],
+                              coop_matrix: Dict[str, Dict[str, float]], title: str):
+    score_data = np.array([[score_matrix[s1][s2] for s2 in strategy_names] for s1 in strategy_names])
+    coop_data = np.array([[coop_matrix[s1][s2] for s2 in strategy_names] for s1 in strategy_names])
+
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('Average Scores', 'Cooperation Rates (%)'),
+        horizontal_spacing=0.15
+    )
+
+    # Add score heatmap
+    fig.add_trace(
+        go.Heatmap(
+            z=score_data,
+            x=strategy_names,
+            y=strategy_names,
+            hoverongaps=False,
+            text=np.round(score_data, 1),
+            texttemplate='%{text}',
+            textfont={"size": 10},
+            colorscale='RdYlGn',
+            colorbar=dict(title='Score', x=0.45),
+            name='Scores'
+        ),
+        row=1, col=1
+    )
+
+    # Add cooperation rate heatmap
+    fig.add_trace(
+        go.Heatmap(
+            z=coop_data,
+            x=strategy_names,
+            y=strategy_names,
+            hoverongaps=False,
+            text=np.round(coop_data, 1),
+            texttemplate='%{text}%',
+            textfont={"size": 10},
+            colorscale='Blues',
+            colorbar=dict(title='Cooperation %', x=1.0),
+            name='Cooperation'
+        ),
+        row=1, col=2
+    )
+
+    fig.update_layout(
+        title=title,
+        width=1200,
+        height=600,
+    )
+
+    # Update axes for both subplots
+    for i in [1, 2]:
+        fig.update_xaxes(title='Opponent Strategy', side='bottom', tickangle=45, row=1, col=i)
+        fig.update_yaxes(title='Player Strategy' if i == 1 else None, row=1, col=i)
+
+    return fig